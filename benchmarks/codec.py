@@ -0,0 +1,116 @@
+"""
+Compares the generated codecs with dataclasses.asdict() and dacite.
+
+Usage:
+    python benchmarks/codec.py [--number N]
+
+Prints one JSON object per conversion with the time per call and the peak
+memory allocated per call of both implementations, and one with the size
+of slotted and regular TestRun instances.
+"""
+import argparse
+import base64
+import dataclasses
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+import dacite
+
+from visual_regression_tracker import codec
+from visual_regression_tracker.types import \
+    Build, IgnoreArea, TestRun, TestRunResponse, TestRunStatus, _IMAGE_FIELDS
+
+
+def asdict(obj):
+    return dataclasses.asdict(obj, dict_factory=lambda kvs: {k: v for k, v in kvs if v is not None})
+
+
+def asdict_without_image(test):
+    return asdict(dataclasses.replace(test, imageBase64=None, imageBytes=None, imagePath=None))
+
+
+def allocated(fn, number: int) -> float:
+    """Average peak of the memory allocated during a call, including memory freed before it returns."""
+    total = 0
+    tracemalloc.start()
+    for _ in range(number):
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - start
+    tracemalloc.stop()
+    return total / number
+
+
+def compare(name: str, baseline, generated, number: int) -> dict:
+    assert baseline() == generated()
+    baselineSeconds = min(timeit.repeat(baseline, number=number, repeat=5)) / number
+    generatedSeconds = min(timeit.repeat(generated, number=number, repeat=5)) / number
+    return {
+        'benchmark': name,
+        'baseline_seconds': baselineSeconds,
+        'generated_seconds': generatedSeconds,
+        'speedup': baselineSeconds / generatedSeconds,
+        'baseline_allocated_bytes': allocated(baseline, number),
+        'generated_allocated_bytes': allocated(generated, number),
+    }
+
+
+def instance_sizes(number: int) -> dict:
+    Regular = dataclasses.make_dataclass(
+        'Regular', [(f.name, f.type, dataclasses.field(default=None)) for f in dataclasses.fields(TestRun)])
+    tracemalloc.start()
+    sizes = []
+    for cls in (Regular, TestRun):
+        start, _ = tracemalloc.get_traced_memory()
+        instances = [cls(name='name', os='os') for _ in range(number)]
+        end, _ = tracemalloc.get_traced_memory()
+        sizes.append((end - start) / number)
+        del instances
+    tracemalloc.stop()
+    return {
+        'benchmark': 'instance TestRun',
+        'baseline_allocated_bytes': sizes[0],
+        'generated_allocated_bytes': sizes[1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=10000)
+    args = parser.parse_args()
+
+    test = TestRun(
+        name='name',
+        imageBase64=base64.b64encode(os.urandom(4 * 1024 * 1024)).decode('ascii'),
+        os='os', browser='chromium', viewport='1920x1080', device='desktop',
+        diffTollerancePercent=0.5,
+        ignoreAreas=[IgnoreArea(i, i, 100, 100) for i in range(5)],
+    )
+    response = {
+        'id': 'id', 'imageName': 'image.png', 'diffName': 'diff.png', 'baselineName': 'baseline.png',
+        'url': 'url', 'merge': False, 'status': TestRunStatus.UNRESOLVED,
+        'pixelMisMatchCount': 12, 'diffPercent': 0.12, 'diffTollerancePercent': 0,
+    }
+    build = {'id': 'id', 'projectId': 'projectId'}
+
+    for result in [
+        compare('encode TestRun', lambda: asdict(test), lambda: codec.encoder(TestRun)(test), args.number),
+        compare('encode TestRun fields', lambda: asdict_without_image(test),
+                lambda: codec.encoder(TestRun, _IMAGE_FIELDS)(test), args.number),
+        compare('decode TestRunResponse', lambda: dacite.from_dict(TestRunResponse, response),
+                lambda: codec.decoder(TestRunResponse)(response), args.number),
+        compare('decode Build', lambda: dacite.from_dict(Build, build),
+                lambda: codec.decoder(Build)(build), args.number),
+        instance_sizes(args.number),
+    ]:
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+In-process stand-in for the Visual Regression Tracker API.
+
+Implements just enough of the API for the SDK to run against it: starting
+and stopping builds and creating test runs, as JSON or multipart upload.
+Every test run is reported as OK.
+
+Speaks HTTP/1.1, or HTTP/2 over plain TCP (h2c with prior knowledge), which
+requires h2.
+
+Usage:
+    with FakeVrtServer() as server:
+        config = Config(apiUrl=server.url, ...)
+"""
+import http.server
+import itertools
+import json
+import socket
+import socketserver
+import threading
+import time
+
+
+class FakeVrtServer:
+    def __init__(self, latency: float = 0.0, status: str = 'ok', protocol: str = 'http1'):
+        """
+        :param latency: Seconds to wait before answering each request.
+        :param status: Status to report for every test run.
+        :param protocol: http1 or http2.
+        """
+        self.latency = latency
+        self.status = status
+        self.requests = 0
+        self.bytesReceived = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        if protocol == 'http1':
+            self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _handler(self))
+        elif protocol == 'http2':
+            self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _h2_handler(self))
+        else:
+            raise ValueError(f'Unknown protocol {protocol!r}')
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    def _handle(self, method: str, path: str, body: bytes) -> tuple:
+        """Answers a request, returns the status and the JSON body of the response."""
+        id = self._received(len(body))
+        if self.latency:
+            time.sleep(self.latency)
+        if method == 'POST':
+            if path == '/builds':
+                return 201, {'id': 'build', 'projectId': 'project'}
+            if path == '/test-runs':
+                return 201, self._testRun(id, json.loads(body).get('name'))
+            if path == '/test-runs/multipart':
+                return 201, self._testRun(id, None)
+        elif method == 'PATCH' and path.startswith('/builds/'):
+            return 200, {}
+        return 404, {}
+
+    def _received(self, size: int) -> int:
+        with self._lock:
+            self.requests += 1
+            self.bytesReceived += size
+        return next(self._ids)
+
+    def _testRun(self, id: int, name: str) -> dict:
+        return {
+            'id': str(id),
+            'imageName': f'{id}.png',
+            'baselineName': f'{name}.png',
+            'url': f'{self.url}/test/{id}',
+            'merge': False,
+            'status': self.status,
+            'diffPercent': 0,
+            'diffTollerancePercent': 0,
+        }
+
+
+def _handler(server: FakeVrtServer):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self._respond(*server._handle('POST', self.path, self._read()))
+
+        def do_PATCH(self):
+            self._respond(*server._handle('PATCH', self.path, self._read()))
+
+        def _read(self) -> bytes:
+            return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        def _respond(self, status: int, body: dict):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _h2_handler(server: FakeVrtServer):
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+
+    maxWindow = 2 ** 31 - 1
+
+    class Handler(socketserver.BaseRequestHandler):
+        """Serves one HTTP/2 connection, answering each stream in a thread of its own."""
+
+        def handle(self):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connection = h2.connection.H2Connection(
+                h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+            self._lock = threading.Lock()
+            streams = {}
+            with self._lock:
+                # Large windows, so that uploads are not throttled by flow control.
+                self._connection.initiate_connection()
+                self._connection.update_settings({h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: maxWindow})
+                self._connection.increment_flow_control_window(maxWindow - 65535)
+                self._flush()
+            while True:
+                data = self.request.recv(65536)
+                if not data:
+                    return
+                with self._lock:
+                    for event in self._connection.receive_data(data):
+                        if isinstance(event, h2.events.RequestReceived):
+                            streams[event.stream_id] = (dict(event.headers), bytearray())
+                        elif isinstance(event, h2.events.DataReceived):
+                            streams[event.stream_id][1].extend(event.data)
+                            self._connection.acknowledge_received_data(
+                                event.flow_controlled_length, event.stream_id)
+                        elif isinstance(event, h2.events.StreamEnded):
+                            headers, body = streams.pop(event.stream_id)
+                            threading.Thread(
+                                target=self._respond, args=(event.stream_id, headers, bytes(body)), daemon=True,
+                            ).start()
+                        elif isinstance(event, h2.events.StreamReset):
+                            streams.pop(event.stream_id, None)
+                        elif isinstance(event, h2.events.ConnectionTerminated):
+                            return
+                    self._flush()
+
+        def _respond(self, streamId: int, headers: dict, body: bytes):
+            status, body = server._handle(headers[':method'], headers[':path'], body)
+            data = json.dumps(body).encode('utf-8')
+            with self._lock:
+                try:
+                    self._connection.send_headers(streamId, [
+                        (':status', str(status)),
+                        ('content-type', 'application/json'),
+                        ('content-length', str(len(data))),
+                    ])
+                    self._connection.send_data(streamId, data, end_stream=True)
+                    self._flush()
+                except (h2.exceptions.StreamClosedError, OSError):
+                    pass
+
+        def _flush(self):
+            self.request.sendall(self._connection.data_to_send())
+
+    return Handler
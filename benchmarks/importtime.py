@@ -0,0 +1,55 @@
+"""
+Measures the import time of the package with `python -X importtime`.
+
+Usage:
+    python benchmarks/importtime.py [--repeat N] [--top N] [MODULE ...]
+
+Prints one JSON object per module with the best cumulative import time of
+its runs in microseconds, and the imports that took the most time on their own.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULES = ('visual_regression_tracker', 'visual_regression_tracker.playwright')
+
+
+def importtime(module: str) -> dict:
+    """Imports module in a new interpreter, returns the (self, cumulative) microseconds per imported module."""
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True, env={**os.environ, 'PYTHONPATH': os.getcwd()},
+    ).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selfTime, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(selfTime), int(cumulative))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('modules', nargs='*', default=list(MODULES))
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [importtime(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda times: times[module][1])
+        top = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        print(json.dumps({
+            'module': module,
+            'cumulative_us': best[module][1],
+            'imported_modules': len(best),
+            'slowest': {name: selfTime for name, (selfTime, _) in top},
+        }))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Benchmarks the local pre-diff on full-HD and full-page screenshot sizes.
+
+Usage:
+    python benchmarks/prediff.py [--repeat N]
+
+Prints one JSON object per image size.
+"""
+import argparse
+import io
+import json
+import time
+
+import numpy
+from PIL import Image
+
+from visual_regression_tracker import IgnoreArea, TestRun
+from visual_regression_tracker.prediff import decode, diff_percent, predict
+
+SIZES = {
+    'full-hd': (1920, 1080),
+    'full-page': (1920, 15000),
+}
+
+
+def encode(array: numpy.ndarray) -> bytes:
+    output = io.BytesIO()
+    Image.fromarray(array).save(output, format='PNG')
+    return output.getvalue()
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(0)
+    for label, (width, height) in SIZES.items():
+        baseline = rng.integers(0, 256, (height, width, 4), dtype=numpy.uint8)
+        image = baseline.copy()
+        image[100:200, 100:400] = 0
+        ignoreAreas = [IgnoreArea(0, 0, 300, 50), IgnoreArea(1000, 500, 200, 200)]
+        encodedImage, encodedBaseline = encode(image), encode(baseline)
+        test = TestRun(imageBytes=encodedImage, ignoreAreas=ignoreAreas)
+
+        print(json.dumps({
+            'size': label,
+            'width': width,
+            'height': height,
+            'diff_percent_seconds': measure(lambda: diff_percent(image, baseline, ignoreAreas), args.repeat),
+            'decode_seconds': measure(lambda: decode(encodedImage), args.repeat),
+            'predict_seconds': measure(lambda: predict(test, encodedBaseline), args.repeat),
+        }))
+
+
+if __name__ == '__main__':
+    main()
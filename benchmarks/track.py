@@ -0,0 +1,182 @@
+"""
+Benchmarks track() against an in-process stand-in VRT server.
+
+Usage:
+    python benchmarks/track.py [--runs N] [--repeat N] [--sizes ...] [--concurrency ...]
+                               [--latency SECONDS] [--multipart] [--transport ...] [--output FILE]
+
+Measures, per image size, the cost of encoding a test run as JSON and, per
+image size, transport and concurrency level, the throughput and latency
+percentiles of track() as well as the peak memory allocated while tracking.
+The http2 transport is measured against the server speaking HTTP/2, and
+requires the http2 extra.
+
+Prints one JSON object per measurement, and appends them to --output if
+given, so that results can be compared between releases.
+"""
+import argparse
+import base64
+import collections
+import concurrent.futures
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from fakeserver import FakeVrtServer
+
+from visual_regression_tracker import Config, TestRun, VisualRegressionTracker
+from visual_regression_tracker.visualRegressionTracker import _test_run_data
+
+SIZES = {
+    'thumbnail': 64 * 1024,
+    'full-hd': 1024 * 1024,
+    'full-page': 8 * 1024 * 1024,
+}
+CONCURRENCY = (1, 4, 16)
+TRANSPORTS = ('http1', 'http2')
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def tracker(server: FakeVrtServer, concurrency: int, multipart: bool, transport: str) -> VisualRegressionTracker:
+    return VisualRegressionTracker(Config(
+        apiUrl=server.url,
+        ciBuildId='benchmark',
+        branchName='master',
+        project='benchmark',
+        apiKey='benchmark',
+        httpPoolSize=max(concurrency, 10),
+        maxConcurrency=concurrency,
+        multipartUpload=multipart,
+        transport=transport,
+    ))
+
+
+def track_all(vrt: VisualRegressionTracker, tests: list, concurrency: int) -> list:
+    """Tracks all tests from concurrency threads, returns the latency of every track()."""
+    def timed(test):
+        start = time.perf_counter()
+        vrt.track(test)
+        return time.perf_counter() - start
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(timed, tests))
+
+
+def encode_benchmark(label: str, image: bytes, repeat: int) -> dict:
+    test = TestRun(name='benchmark', imageBytes=image)
+    config = Config(branchName='master')
+    body = _test_run_data(test, config, 'build', 'project')
+    return {
+        'benchmark': 'encode',
+        'size': label,
+        'bytes': len(image),
+        'base64_seconds': measure(lambda: base64.b64encode(image), repeat),
+        'test_run_data_seconds': measure(lambda: _test_run_data(test, config, 'build', 'project'), repeat),
+        'stream_body_seconds': measure(lambda: collections.deque(body, maxlen=0), repeat),
+    }
+
+
+def track_benchmark(
+        server: FakeVrtServer, transport: str, label: str, image: bytes, concurrency: int, args) -> dict:
+    tests = [TestRun(name=f'benchmark {i}', imageBytes=image) for i in range(args.runs)]
+
+    with tracker(server, concurrency, args.multipart, transport) as vrt:
+        track_all(vrt, tests[:concurrency], concurrency)  # warm up connections
+        start = time.perf_counter()
+        latencies = track_all(vrt, tests, concurrency)
+        seconds = time.perf_counter() - start
+
+    with tracker(server, concurrency, args.multipart, transport) as vrt:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        track_all(vrt, tests, concurrency)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'benchmark': 'track',
+        'size': label,
+        'bytes': len(image),
+        'concurrency': concurrency,
+        'multipart': args.multipart,
+        'transport': transport,
+        'latency': args.latency,
+        'runs': args.runs,
+        'seconds': seconds,
+        'runs_per_second': args.runs / seconds,
+        'megabytes_per_second': args.runs * len(image) / seconds / 1024 / 1024,
+        'latency_mean_seconds': statistics.mean(latencies),
+        'latency_p50_seconds': percentile(latencies, 50),
+        'latency_p90_seconds': percentile(latencies, 90),
+        'latency_p99_seconds': percentile(latencies, 99),
+        'peak_memory_bytes': peak,
+    }
+
+
+def version() -> str:
+    try:
+        return importlib.metadata.version('visual_regression_tracker')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50, help='test runs to track per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions of encode measurements')
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=list(SIZES))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=list(CONCURRENCY))
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in seconds')
+    parser.add_argument('--multipart', action='store_true', help='upload images as multipart/form-data')
+    parser.add_argument('--transport', nargs='+', choices=TRANSPORTS, default=['http1'])
+    parser.add_argument('--output', help='file to append results to, as JSON lines')
+    args = parser.parse_args()
+
+    environment = {
+        'version': version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+    output = open(args.output, 'a') if args.output else None
+
+    def report(result: dict):
+        line = json.dumps({**result, **environment})
+        print(line)
+        if output is not None:
+            output.write(line + '\n')
+            output.flush()
+
+    try:
+        for label in args.sizes:
+            image = os.urandom(SIZES[label])
+            report(encode_benchmark(label, image, args.repeat))
+            for transport in args.transport:
+                with FakeVrtServer(latency=args.latency, protocol=transport) as server:
+                    for concurrency in args.concurrency:
+                        report(track_benchmark(server, transport, label, image, concurrency, args))
+    finally:
+        if output is not None:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
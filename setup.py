@@ -12,12 +12,35 @@ setup(
     url='https://github.com/Visual-Regression-Tracker/'
         'Visual-Regression-Tracker',
     packages=['visual_regression_tracker'],
+    entry_points={
+        'console_scripts': [
+            'vrt=visual_regression_tracker.cli:main',
+        ],
+    },
     python_requires='>=3.6',
     install_requires=['requests', 'dacite', 'dataclasses;python_version<"3.7"'],
     extras_require={
         # Playwright provides browser automation, requires python3.7 and above.
         "playwright": [
             "playwright",
+            "httpx",
+        ],
+        # Non-blocking client for AsyncVisualRegressionTracker.
+        "async": [
+            "httpx",
+        ],
+        # Image decoding and comparison for Config.enableLocalDiff.
+        "prediff": [
+            "numpy",
+            "Pillow",
+        ],
+        # Local cropping for PlaywrightMixin.trackElements.
+        "crop": [
+            "Pillow",
+        ],
+        # Multiplexed uploads for Config.transport = 'http2'.
+        "http2": [
+            "httpx[http2]",
         ],
     },
 )
@@ -1,4 +1,35 @@
+import struct
+import zlib
+
 import nest_asyncio
+import pytest
+
+from visual_regression_tracker import png
 
 # resolve "Cannot run the event loop while another loop is running" in async tests
-nest_asyncio.apply()
\ No newline at end of file
+nest_asyncio.apply()
+
+
+def make_png(width=64, height=64, level=0, idatChunks=1):
+    rows = b''.join(b'\x00' + bytes((x * y) % 256 for x in range(width) for _ in range(3)) for y in range(height))
+    data = zlib.compress(rows, level)
+    size = -(-len(data) // idatChunks)
+    return png.SIGNATURE \
+        + png.write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) \
+        + png.write_chunk(b'tEXt', b'Software\x00test') \
+        + b''.join(png.write_chunk(b'IDAT', data[i:i + size]) for i in range(0, len(data), size)) \
+        + png.write_chunk(b'IEND', b'')
+
+
+def image_data(data):
+    return zlib.decompress(b''.join(payload for chunkType, payload in png.read_chunks(data) if chunkType == b'IDAT'))
+
+
+@pytest.fixture
+def png_factory():
+    yield make_png
+
+
+@pytest.fixture
+def png_image_data():
+    yield image_data
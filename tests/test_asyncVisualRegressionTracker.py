@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import threading
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+
+from visual_regression_tracker import \
+    Config, TestRun, TestRunStatus, \
+    ServerError, CircuitOpenError, TestRunError, VisualRegressionTrackerError
+from visual_regression_tracker.asyncVisualRegressionTracker import \
+    AsyncVisualRegressionTracker, _send_async
+from visual_regression_tracker.retry import CircuitBreaker
+
+CONFIG = Config(
+    apiUrl='http://localhost:4200',
+    ciBuildId='CI Build Id',
+    branchName='develop',
+    project='Default project',
+    apiKey='CPKVK4JNK24NVNPNGVFQ853HXXEG',
+    enableSoftAssert=False,
+)
+
+TEST_RUN_RESPONSE = {
+    'id': 'testRunId',
+    'imageName': 'imageName',
+    'url': 'url',
+    'status': 'ok',
+}
+
+
+@pytest.fixture
+def requests_log():
+    yield []
+
+
+@pytest.fixture
+def responses():
+    yield {}
+
+
+@pytest.fixture
+def avrt(requests_log, responses):
+    def handler(request: httpx.Request):
+        requests_log.append(request)
+        status, body = responses.get(
+            (request.method, request.url.path),
+            (200, {}),
+        )
+        return httpx.Response(status, json=body)
+
+    avrt = AsyncVisualRegressionTracker(CONFIG)
+    avrt._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    yield avrt
+
+
+@pytest.mark.asyncio
+async def test__start__should_start_build(avrt, requests_log, responses):
+    responses[('POST', '/builds')] = (201, {'id': '1312', 'projectId': 'asd'})
+
+    await avrt.start()
+
+    assert avrt.buildId == '1312'
+    assert avrt.projectId == 'asd'
+    request = requests_log[0]
+    assert request.headers['apiKey'] == CONFIG.apiKey
+    assert request.headers['project'] == CONFIG.project
+    assert json.loads(request.content) == {
+        'ciBuildId': CONFIG.ciBuildId,
+        'branchName': CONFIG.branchName,
+        'project': CONFIG.project,
+    }
+
+
+@pytest.mark.asyncio
+async def test__stop__should_stop_build(avrt, requests_log):
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    await avrt.stop()
+
+    assert [(r.method, r.url.path) for r in requests_log] == [('PATCH', '/builds/1312')]
+    assert avrt.buildId is None
+    assert avrt.projectId is None
+    assert avrt._client is None
+
+
+@pytest.mark.asyncio
+async def test__stop__should_throw_not_started(avrt):
+    with pytest.raises(VisualRegressionTrackerError,
+                       match='Visual Regression Tracker has not been started'):
+        await avrt.stop()
+
+
+@pytest.mark.asyncio
+async def test__contextmanager__starts_and_stops_build(avrt, requests_log, responses):
+    responses[('POST', '/builds')] = (201, {'id': '1312', 'projectId': 'asd'})
+
+    async with avrt as actual:
+        assert actual is avrt
+        assert avrt.buildId == '1312'
+
+    assert [(r.method, r.url.path) for r in requests_log] == [
+        ('POST', '/builds'),
+        ('PATCH', '/builds/1312'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test__track__should_track_success(avrt, requests_log, responses):
+    responses[('POST', '/test-runs')] = (201, TEST_RUN_RESPONSE)
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    result = await avrt.track(TestRun(name='name', imageBase64='image'))
+
+    assert result.testRunResponse.status == TestRunStatus.OK
+    assert result.imageUrl == f'{CONFIG.apiUrl}/imageName'
+    assert json.loads(requests_log[0].content) == {
+        'name': 'name',
+        'imageBase64': 'image',
+        'buildId': '1312',
+        'projectId': 'asd',
+        'branchName': CONFIG.branchName,
+    }
+
+
+@pytest.mark.asyncio
+async def test__track__should_raise_exception(avrt, responses):
+    responses[('POST', '/test-runs')] = (201, {**TEST_RUN_RESPONSE, 'status': 'unresolved'})
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    with pytest.raises(TestRunError, match='Difference found: url'):
+        await avrt.track(TestRun(name='name', imageBase64='image'))
+
+
+@pytest.mark.asyncio
+async def test__track__should_log_error(avrt, responses, caplog):
+    responses[('POST', '/test-runs')] = (201, {**TEST_RUN_RESPONSE, 'status': 'new'})
+    avrt.config = Config(**{**CONFIG.__dict__, 'enableSoftAssert': True})
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    await avrt.track(TestRun(name='name', imageBase64='image'))
+
+    assert caplog.record_tuples == [(
+        "visual_regression_tracker.visualRegressionTracker",
+        logging.ERROR,
+        'No baseline: url'
+    )]
+
+
+@pytest.mark.asyncio
+async def test__track__should_throw_not_started(avrt):
+    with pytest.raises(VisualRegressionTrackerError,
+                       match='Visual Regression Tracker has not been started'):
+        await avrt.track(TestRun(name='name', imageBase64='image'))
+
+
+@pytest.mark.asyncio
+async def test__track__maps_status_code(avrt, responses):
+    responses[('POST', '/test-runs')] = (403, {})
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    with pytest.raises(ServerError, match='Api key not authenticated'):
+        await avrt.track(TestRun(name='name', imageBase64='image'))
+
+
+@pytest.mark.asyncio
+async def test__track__runs_concurrently(avrt, responses):
+    responses[('POST', '/test-runs')] = (201, TEST_RUN_RESPONSE)
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    results = await asyncio.gather(*[
+        avrt.track(TestRun(name=f'name {i}', imageBase64='image'))
+        for i in range(5)
+    ])
+
+    assert len(results) == 5
+
+
+@pytest.mark.asyncio
+async def test__track__should_submit_multipart(avrt, requests_log, responses):
+    responses[('POST', '/test-runs/multipart')] = (201, TEST_RUN_RESPONSE)
+    avrt.config = Config(**{**CONFIG.__dict__, 'multipartUpload': True})
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    await avrt.track(TestRun(name='name', imageBase64='aW1hZ2U='))
+
+    request = requests_log[0]
+    assert request.url.path == '/test-runs/multipart'
+    assert request.headers['content-type'].startswith('multipart/form-data')
+    assert b'name="image"; filename="image.png"' in request.content
+    assert b'\r\n\r\nimage\r\n' in request.content
+
+
+@pytest.mark.asyncio
+async def test__track__multipart_falls_back_to_json(avrt, requests_log, responses):
+    responses[('POST', '/test-runs/multipart')] = (404, {})
+    responses[('POST', '/test-runs')] = (201, TEST_RUN_RESPONSE)
+    avrt.config = Config(**{**CONFIG.__dict__, 'multipartUpload': True})
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    await avrt.track(TestRun(name='name', imageBase64='aW1hZ2U='))
+    await avrt.track(TestRun(name='name', imageBase64='aW1hZ2U='))
+
+    assert [r.url.path for r in requests_log] == ['/test-runs/multipart', '/test-runs', '/test-runs']
+
+
+@pytest.mark.asyncio
+async def test__track__recompresses_png(avrt, requests_log, responses, png_factory, png_image_data):
+    responses[('POST', '/test-runs/multipart')] = (201, TEST_RUN_RESPONSE)
+    avrt.config = Config(**{**CONFIG.__dict__, 'multipartUpload': True, 'pngCompressionLevel': 9})
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+    original = png_factory()
+
+    result = await avrt.track(TestRun(name='name', imageBytes=original))
+
+    assert result.recompression.originalSize == len(original)
+    assert result.recompression.size < len(original)
+    assert len(requests_log[0].content) < len(original)
+
+
+@pytest.mark.asyncio
+async def test__track__retries_rejected_requests(avrt, requests_log, responses, mocker):
+    mocker.patch('asyncio.sleep')
+    statuses = iter([503, 429, 201])
+
+    def handler(request: httpx.Request):
+        requests_log.append(request)
+        return httpx.Response(next(statuses), json=TEST_RUN_RESPONSE)
+
+    avrt._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    result = await avrt.track(TestRun(name='name', imageBase64='image'))
+
+    assert result.testRunResponse.status == TestRunStatus.OK
+    assert len(requests_log) == 3
+    assert len({r.headers['Idempotency-Key'] for r in requests_log}) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('error, reopens', [
+    (httpx.DecodingError('broken'), True),
+    (asyncio.CancelledError(), False),
+])
+async def test__send_async__settles_failed_trial(mocker, error, reopens):
+    monotonic = mocker.patch('time.monotonic', return_value=100)
+    breaker = CircuitBreaker(failureThreshold=1, resetTimeout=30)
+    breaker.failure()
+    monotonic.return_value = 131
+
+    async def send():
+        raise error
+
+    with pytest.raises(type(error)):
+        await _send_async(send, 'post', breaker=breaker)
+
+    if reopens:
+        with pytest.raises(CircuitOpenError):
+            breaker.before()
+    else:
+        breaker.before()
+
+
+@pytest.mark.asyncio
+async def test__track__adapts_concurrency_to_overload(avrt, responses):
+    avrt.config = Config(**{**CONFIG.__dict__, 'adaptiveConcurrency': True, 'maxConcurrency': 8, 'retryMaxAttempts': 1})
+    avrt.limiter = AsyncVisualRegressionTracker(avrt.config).limiter
+    responses[('POST', '/test-runs')] = (201, TEST_RUN_RESPONSE)
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+
+    await asyncio.gather(*[avrt.track(TestRun(name=f'name {i}', imageBase64='image')) for i in range(20)])
+    assert avrt.limiter.limit == 8
+
+    responses[('POST', '/test-runs')] = (503, {})
+    with pytest.raises(ServerError):
+        await avrt.track(TestRun(name='name', imageBase64='image'))
+
+    assert avrt.limiter.limit == 4
+    assert avrt.limiter.inFlight == 0
+
+
+@pytest.mark.asyncio
+async def test__track__notifies_listeners(avrt, responses, mocker):
+    responses[('POST', '/test-runs')] = (201, TEST_RUN_RESPONSE)
+    avrt.buildId = '1312'
+    avrt.projectId = 'asd'
+    listener = mocker.Mock()
+    avrt.addListener(listener)
+    test_run = TestRun(name='name', imageBytes=b'image')
+
+    result = await avrt.track(test_run)
+
+    listener.assert_called_once_with(test_run, result.timings, result)
+    assert set(result.timings.phases) == {'serialize', 'encode', 'request', 'parse'}
+
+
+@pytest.mark.asyncio
+async def test__track__spools_test_runs(requests_log, tmpdir):
+    avrt = AsyncVisualRegressionTracker(Config(**{**CONFIG.__dict__, 'spoolPath': str(tmpdir / 'spool.db')}))
+    avrt._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: requests_log.append(request)))
+
+    async with avrt:
+        result = await avrt.track(TestRun(name='name', imageBytes=b'image'))
+
+    assert result.spooled
+    assert result.testRunResponse is None
+    assert set(result.timings.phases) == {'spool'}
+    assert requests_log == []
+
+
+
+@pytest.mark.asyncio
+async def test__track__accesses_cache_in_threads(avrt, responses, tmpdir, mocker):
+    avrt.config = Config(**{**CONFIG.__dict__, 'cachePath': str(tmpdir / 'cache.db')})
+    avrt.buildId, avrt.projectId = 'build', 'project'
+    responses[('POST', '/test-runs')] = (201, TEST_RUN_RESPONSE)
+    threads = []
+
+    def lookup(cache, test, project, branchName):
+        threads.append(threading.current_thread())
+        return 'key', 'digest', None
+
+    mocker.patch('visual_regression_tracker.asyncVisualRegressionTracker._lookup', side_effect=lookup)
+    put = mocker.patch('visual_regression_tracker.cache.ImageCache.put', side_effect=lambda *args: threads.append(
+        threading.current_thread()))
+
+    await avrt.track(TestRun(name='name', imageBytes=b'image'))
+
+    put.assert_called_once()
+    assert len(threads) == 2
+    assert threading.current_thread() not in threads
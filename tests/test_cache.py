@@ -0,0 +1,118 @@
+import dataclasses
+
+import pytest
+
+from visual_regression_tracker import IgnoreArea, TestRun, TestRunResponse, TestRunStatus
+from visual_regression_tracker.cache import ImageCache, _cache_key, _image_digest, _lookup
+
+RESPONSE = TestRunResponse(
+    id='id',
+    imageName='imageName',
+    url='url',
+    status=TestRunStatus.OK,
+    diffPercent=0.0,
+)
+
+
+@pytest.fixture
+def cache(tmpdir):
+    cache = ImageCache(str(tmpdir.join('cache.db')), maxEntries=2)
+    yield cache
+    cache.close()
+
+
+def test_get__returns_response_for_same_digest(cache):
+    cache.put('key', 'digest', RESPONSE)
+
+    assert cache.get('key', 'digest') == RESPONSE
+    assert cache.get('key', 'other digest') is None
+    assert cache.get('other key', 'digest') is None
+
+
+def test_put__replaces_entry(cache):
+    cache.put('key', 'digest', RESPONSE)
+    cache.put('key', 'new digest', RESPONSE)
+
+    assert cache.get('key', 'digest') is None
+    assert cache.get('key', 'new digest') == RESPONSE
+
+
+def test_put__evicts_least_recently_used(cache, mocker):
+    time = mocker.patch('time.time')
+    time.return_value = 1
+    cache.put('a', 'digest', RESPONSE)
+    time.return_value = 2
+    cache.put('b', 'digest', RESPONSE)
+    time.return_value = 3
+    cache.get('a', 'digest')
+    time.return_value = 4
+    cache.put('c', 'digest', RESPONSE)
+
+    assert cache.get('a', 'digest') == RESPONSE
+    assert cache.get('b', 'digest') is None
+    assert cache.get('c', 'digest') == RESPONSE
+
+
+def test_cache__persists(tmpdir):
+    path = str(tmpdir.join('cache.db'))
+    cache = ImageCache(path)
+    cache.put('key', 'digest', RESPONSE)
+    cache.close()
+
+    cache = ImageCache(path)
+    assert cache.get('key', 'digest') == RESPONSE
+    cache.close()
+
+
+def test_cache_key__includes_agent():
+    test_run = TestRun(name='name', os='os', browser='browser', viewport='800x600', device='device')
+
+    assert _cache_key(test_run, 'project', 'develop') != _cache_key(test_run, 'project', 'main')
+    assert _cache_key(test_run, 'project', 'develop') != \
+        _cache_key(TestRun(name='name', os='os', browser='browser', viewport='1024x768', device='device'),
+                   'project', 'develop')
+
+
+@pytest.mark.parametrize('other', [
+    TestRun(imageBytes=b'other image'),
+    TestRun(imageBytes=b'image', diffTollerancePercent=1),
+    TestRun(imageBytes=b'image', ignoreAreas=[IgnoreArea(1, 2, 3, 4)]),
+])
+def test_image_digest__changes_with_comparison_input(other):
+    assert _image_digest(TestRun(imageBytes=b'image')) != _image_digest(other)
+
+
+def test_image_digest__ignores_image_representation():
+    assert _image_digest(TestRun(imageBytes=b'image')) == _image_digest(TestRun(imageBase64='aW1hZ2U='))
+
+
+@pytest.mark.parametrize('status, expected', [
+    (TestRunStatus.OK, RESPONSE),
+    (TestRunStatus.NEW, None),
+    (TestRunStatus.UNRESOLVED, None),
+])
+def test_lookup__only_returns_approved(cache, status, expected):
+    test_run = TestRun(name='name', imageBytes=b'image')
+    key, digest, _ = _lookup(cache, test_run, 'project', 'develop')
+    cache.put(key, digest, dataclasses.replace(RESPONSE, status=status))
+
+    assert _lookup(cache, test_run, 'project', 'develop')[2] == expected
+
+
+def test_baseline__stored_per_key(cache):
+    assert cache.getBaseline('key') == (None, None)
+
+    cache.put('key', 'digest', RESPONSE)
+    cache.putBaseline('key', 'baseline.png', b'image')
+
+    assert cache.getBaseline('key') == ('baseline.png', b'image')
+    assert cache.getBaseline('other key') == (None, None)
+
+
+def test_baseline__evicted_with_entry(cache):
+    cache.put('a', 'digest', RESPONSE)
+    cache.putBaseline('a', 'baseline.png', b'image')
+    cache.put('b', 'digest', RESPONSE)
+    cache.put('c', 'digest', RESPONSE)
+
+    assert cache.getBaseline('a') == (None, None)
@@ -0,0 +1,148 @@
+import pytest
+
+from visual_regression_tracker import TestRun, VisualRegressionTracker, VisualRegressionTrackerError, ServerError
+from visual_regression_tracker.cli import main, _pattern_regex, _matching_paths
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch, tmpdir):
+    monkeypatch.chdir(tmpdir)
+    monkeypatch.setenv('VRT_APIURL', 'http://localhost:4200')
+    monkeypatch.setenv('VRT_PROJECT', 'Default project')
+    monkeypatch.setenv('VRT_APIKEY', 'CPKVK4JNK24NVNPNGVFQ853HXXEG')
+    monkeypatch.setenv('VRT_BRANCHNAME', 'develop')
+
+
+@pytest.fixture
+def screenshots(tmpdir):
+    directory = tmpdir.mkdir('screenshots')
+    directory.mkdir('chromium').mkdir('1920x1080').join('home.png').write_binary(b'home')
+    directory.join('chromium', '1920x1080').mkdir('account').join('login.png').write_binary(b'login')
+    directory.mkdir('firefox').mkdir('800x600').join('changed.png').write_binary(b'changed')
+    directory.join('chromium', 'notes.txt').write('notes')
+    return str(directory)
+
+
+@pytest.fixture
+def mock_request(mocker):
+    def request(url, method, data, headers, **kwargs):
+        if url.endswith('/builds'):
+            return {'id': '1312', 'projectId': 'asd'}
+        if url.endswith('/test-runs'):
+            data = data.fields
+            return {
+                'id': data['name'], 'imageName': 'imageName', 'url': f'url/{data["name"]}',
+                'status': 'unresolved' if data['name'] == 'changed' else 'ok',
+            }
+        return {}
+
+    yield mocker.patch(
+        'visual_regression_tracker.visualRegressionTracker._http_request', side_effect=request)
+
+
+def uploaded(mock_request):
+    return sorted(
+        (call[0][2].fields['name'], call[0][2].fields.get('browser'), call[0][2].fields.get('viewport'))
+        for call in mock_request.call_args_list if call[0][0].endswith('/test-runs'))
+
+
+@pytest.mark.parametrize('pattern, path, expected', [
+    ('{name}.png', 'home.png', {'name': 'home'}),
+    ('{name}.png', 'account/login.png', {'name': 'account/login'}),
+    ('{name}.png', 'home.jpg', None),
+    ('{browser}/{viewport}/{name}.png', 'chromium/1920x1080/home.png',
+     {'browser': 'chromium', 'viewport': '1920x1080', 'name': 'home'}),
+    ('{browser}/{viewport}/{name}.png', 'chromium/home.png', None),
+    ('{name}-{device}.png', 'home-iPhone X.png', {'name': 'home', 'device': 'iPhone X'}),
+    ('{name} (1).png', 'home (1).png', {'name': 'home'}),
+])
+def test_pattern_regex__matches_paths(pattern, path, expected):
+    match = _pattern_regex(pattern).fullmatch(path)
+
+    assert (match and match.groupdict()) == expected
+
+
+@pytest.mark.parametrize('pattern', ['{browser}.png', '{name}/{unknown}.png', '{name}/{name}.png'])
+def test_pattern_regex__rejects_invalid_patterns(pattern):
+    with pytest.raises(VisualRegressionTrackerError):
+        _pattern_regex(pattern)
+
+
+def test_matching_paths__walks_directory_sorted(screenshots):
+    paths = [path for path, _ in _matching_paths(screenshots, _pattern_regex('{name}.png'))]
+
+    assert [path[len(screenshots) + 1:].replace('\\', '/') for path in paths] == [
+        'chromium/1920x1080/home.png', 'chromium/1920x1080/account/login.png', 'firefox/800x600/changed.png']
+
+
+def test_upload__uploads_matching_files(screenshots, mock_request, capsys):
+    exitCode = main(['upload', screenshots, '--pattern', '{browser}/{viewport}/{name}.png', '--max-concurrency', '2'])
+
+    assert exitCode == 1
+    assert uploaded(mock_request) == [
+        ('account/login', 'chromium', '1920x1080'),
+        ('changed', 'firefox', '800x600'),
+        ('home', 'chromium', '1920x1080'),
+    ]
+    assert mock_request.call_args_list[0][0][0] == 'http://localhost:4200/builds'
+    assert mock_request.call_args_list[-1][0][0] == 'http://localhost:4200/builds/1312'
+    out, err = capsys.readouterr()
+    assert 'Unresolved: changed: url/changed' in out
+    assert 'Uploaded 3 files' in out
+    assert '0 new, 1 unresolved, 0 failed' in out
+    assert '[3/3]' in err
+    assert 'files/s' in err
+
+
+def test_upload__succeeds_without_unresolved(screenshots, mock_request, capsys):
+    exitCode = main(['upload', screenshots, '--pattern', 'chromium/{viewport}/{name}.png', '--quiet'])
+
+    assert exitCode == 0
+    assert uploaded(mock_request) == [('account/login', None, '1920x1080'), ('home', None, '1920x1080')]
+    assert capsys.readouterr().err == ''
+
+
+def test_upload__reports_failed_uploads(screenshots, mock_request, capsys):
+    request = mock_request.side_effect
+
+    def failLogin(url, method, data, headers, **kwargs):
+        if getattr(data, 'fields', data).get('name') == 'account/login':
+            raise ServerError('Request failed')
+        return request(url, method, data, headers, **kwargs)
+
+    mock_request.side_effect = failLogin
+
+    exitCode = main(['upload', screenshots, '--pattern', 'chromium/{viewport}/{name}.png'])
+
+    assert exitCode == 1
+    assert 'Failed: account/login: Request failed' in capsys.readouterr().err
+
+
+def test_upload__fails_without_matching_files(screenshots, mock_request, capsys):
+    exitCode = main(['upload', screenshots, '--pattern', '{name}.jpg'])
+
+    assert exitCode == 2
+    assert 'no files matching' in capsys.readouterr().err
+    mock_request.assert_not_called()
+
+
+def test_upload__fails_with_incomplete_config(screenshots, mock_request, monkeypatch, capsys):
+    monkeypatch.delenv('VRT_APIKEY')
+
+    assert main(['upload', screenshots]) == 2
+    assert 'apiKey' in capsys.readouterr().err
+
+
+def test_replay__uploads_spool(tmpdir, mock_request, monkeypatch, capsys):
+    path = str(tmpdir / 'spool.db')
+    monkeypatch.setenv('VRT_SPOOLPATH', path)
+    with VisualRegressionTracker() as vrt:
+        vrt.track(TestRun(name='home', imageBytes=b'home'))
+        vrt.track(TestRun(name='changed', imageBytes=b'changed'))
+    mock_request.assert_not_called()
+
+    exitCode = main(['replay', path])
+
+    assert exitCode == 1
+    assert uploaded(mock_request) == [('changed', None, None), ('home', None, None)]
+    assert '0 new, 1 unresolved, 0 failed' in capsys.readouterr().out
@@ -0,0 +1,136 @@
+import dataclasses
+import pickle
+import typing
+
+import dacite
+import pytest
+
+from visual_regression_tracker import codec
+from visual_regression_tracker.types import \
+    Build, IgnoreArea, TestRun, TestRunResponse, TestRunStatus
+
+
+@codec.register
+@dataclasses.dataclass
+class Base:
+    name: str = None
+
+
+@codec.register
+@dataclasses.dataclass
+class Nested(Base):
+    area: IgnoreArea = None
+    areas: typing.Optional[typing.List[IgnoreArea]] = None
+    options: dict = None
+
+
+@dataclasses.dataclass
+class Plain:
+    name: str = None
+    areas: typing.List[IgnoreArea] = None
+
+
+def asdict(obj):
+    return dataclasses.asdict(obj, dict_factory=lambda kvs: {k: v for k, v in kvs if v is not None})
+
+
+@pytest.mark.parametrize('obj', [
+    Build(),
+    Build('1', '2'),
+    IgnoreArea(1, 2, 3, 4),
+    TestRun(name='name', imageBase64='image', os='os', diffTollerancePercent=1.5),
+    TestRun(name='name', ignoreAreas=[]),
+    TestRun(name='name', ignoreAreas=[IgnoreArea(1), IgnoreArea(height=2)]),
+    TestRun(name='name', ignoreAreas=(IgnoreArea(1),)),
+    TestRun(name='name', imageBytes=b'image'),
+    TestRunResponse(id='id', status=TestRunStatus.OK, merge=True, diffPercent=0.5),
+    Nested('name', IgnoreArea(1), [IgnoreArea(2)], {'clip': {'x': 1, 'y': None}}),
+    Plain('name', [IgnoreArea(1)]),
+])
+def test_encoder__same_as_asdict(obj):
+    assert codec.encoder(type(obj))(obj) == asdict(obj)
+
+
+def test_encoder__copies_containers():
+    test = TestRun(ignoreAreas=[IgnoreArea(1)])
+
+    data = codec.encoder(TestRun)(test)
+    data['ignoreAreas'].append({})
+
+    assert test.ignoreAreas == [IgnoreArea(1)]
+
+
+def test_encoder__excludes_fields():
+    test = TestRun(name='name', imageBase64='image', imageBytes=b'image', imagePath='path')
+
+    assert codec.encoder(TestRun, ('imageBase64', 'imageBytes', 'imagePath'))(test) == {'name': 'name'}
+
+
+@pytest.mark.parametrize('data, clazz', [
+    ({}, Build),
+    ({'id': '1', 'projectId': '2', 'unknown': 3}, Build),
+    ({'name': 'name', 'ignoreAreas': [{'x': 1, 'height': 2}]}, TestRun),
+    ({'id': 'id', 'status': TestRunStatus.NEW, 'diffName': None, 'merge': True}, TestRunResponse),
+    ({'name': 'name', 'area': {'x': 1}, 'areas': [{'y': 2}], 'options': {'a': 1}}, Nested),
+])
+def test_decoder__same_as_dacite(data, clazz):
+    assert codec.decoder(clazz)(data) == dacite.from_dict(clazz, data)
+
+
+def test_decoder__accepts_none():
+    assert codec.decoder(TestRun)({'name': 'name', 'ignoreAreas': None}) == TestRun(name='name')
+
+
+@pytest.mark.parametrize('data, clazz, path', [
+    ({'id': 1}, Build, 'id'),
+    ({'status': 'ok'}, TestRunResponse, 'status'),
+    ({'merge': 1}, TestRunResponse, 'merge'),
+    ({'diffPercent': '0.5'}, TestRunResponse, 'diffPercent'),
+    ({'imageBytes': 'image'}, TestRun, 'imageBytes'),
+    ({'ignoreAreas': ['area']}, TestRun, 'ignoreAreas'),
+    ({'ignoreAreas': [{'x': 'a'}]}, TestRun, 'ignoreAreas.x'),
+    ({'area': {'height': 1.5}}, Nested, 'area.height'),
+    ({'options': []}, Nested, 'options'),
+])
+def test_decoder__checks_types_like_dacite(data, clazz, path):
+    with pytest.raises(dacite.WrongTypeError) as expected:
+        dacite.from_dict(clazz, data)
+
+    with pytest.raises(dacite.WrongTypeError) as raised:
+        codec.decoder(clazz)(data)
+
+    assert raised.value.field_path == expected.value.field_path == path
+
+
+@pytest.mark.parametrize('data, clazz', [
+    ({'diffPercent': 0, 'pixelMisMatchCount': 1.5}, TestRunResponse),
+    ({'imageBytes': bytearray(b'image'), 'diffTollerancePercent': 1}, TestRun),
+    ({'imagePath': 'path', 'ignoreAreas': [IgnoreArea(1)]}, TestRun),
+])
+def test_decoder__accepts_valid_types_like_dacite(data, clazz):
+    assert codec.decoder(clazz)(data) == dacite.from_dict(clazz, data)
+
+
+def test_decoder__falls_back_to_dacite():
+    with pytest.raises(dacite.WrongTypeError):
+        codec.decoder(Plain)({'name': 1})
+
+
+def test_register__adds_slots():
+    test = TestRun(name='name')
+
+    assert not hasattr(test, '__dict__')
+    assert not hasattr(Nested('name'), '__dict__')
+    assert Nested.__slots__ == ('area', 'areas', 'options')
+    with pytest.raises(AttributeError):
+        test.unknown = 1
+
+
+def test_register__keeps_dataclass_behaviour():
+    test = TestRun(name='name', ignoreAreas=[IgnoreArea(1)])
+
+    assert test == TestRun('name', ignoreAreas=[IgnoreArea(1)])
+    assert repr(test).startswith("TestRun(name='name'")
+    assert dataclasses.replace(test, name='other').name == 'other'
+    assert pickle.loads(pickle.dumps(test)) == test
+    assert TestRun().ignoreAreas is None
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+
+import pytest
+
+from visual_regression_tracker.concurrency import AdaptiveLimiter, AsyncAdaptiveLimiter, AsyncByteBudget, ByteBudget
+
+
+def test_ByteBudget__blocks_until_released():
+    budget = ByteBudget(10)
+    budget.acquire(6)
+    acquired = threading.Event()
+
+    thread = threading.Thread(target=lambda: (budget.acquire(6), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+
+    budget.release(6)
+    assert acquired.wait(1)
+    thread.join()
+    assert budget.inFlight == 6
+
+
+def test_ByteBudget__admits_oversized_alone():
+    budget = ByteBudget(10)
+
+    budget.acquire(100)
+    assert budget.inFlight == 100
+    assert not budget._fits(1)
+
+    budget.release(100)
+    assert budget._fits(100)
+
+
+@pytest.mark.asyncio
+async def test_AsyncByteBudget__waits_until_released():
+    budget = AsyncByteBudget(10)
+    await budget.acquire(6)
+
+    waiting = asyncio.ensure_future(budget.acquire(6))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    await budget.release(6)
+    await asyncio.wait_for(waiting, 1)
+    assert budget.inFlight == 6
+
+
+def test_AdaptiveLimiter__doubles_limit_per_round_trip_until_overloaded():
+    limiter = AdaptiveLimiter(minLimit=1, maxLimit=16)
+
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(0.1)
+
+    assert limiter.limit == 4
+    assert limiter.latency == pytest.approx(0.1)
+
+
+def test_AdaptiveLimiter__backs_off_on_overload_and_then_increases_additively():
+    limiter = AdaptiveLimiter(minLimit=1, maxLimit=16)
+    for _ in range(7):
+        limiter.release(0.1)
+    assert limiter.limit == 8
+
+    limiter.release(None, overloaded=True)
+    assert limiter.limit == 4
+
+    for _ in range(5):
+        limiter.release(0.1)
+    assert limiter.limit == 5
+
+
+def test_AdaptiveLimiter__backs_off_once_per_round_trip(mocker):
+    monotonic = mocker.patch('visual_regression_tracker.concurrency.time.monotonic', return_value=100.0)
+    limiter = AdaptiveLimiter(minLimit=1, maxLimit=16)
+    for _ in range(7):
+        limiter.release(0.5)
+
+    limiter.release(None, overloaded=True)
+    limiter.release(None, overloaded=True)
+    assert limiter.limit == 4
+
+    monotonic.return_value = 101.0
+    limiter.release(None, overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_AdaptiveLimiter__backs_off_when_latency_rises():
+    limiter = AdaptiveLimiter(minLimit=1, maxLimit=16, latencyTolerance=2.0, smoothing=1.0)
+    for _ in range(7):
+        limiter.release(0.1)
+
+    limiter.release(0.3)
+
+    assert limiter.limit == 4
+    assert limiter.latency == pytest.approx(0.3)
+
+
+def test_AdaptiveLimiter__stays_within_bounds():
+    limiter = AdaptiveLimiter(minLimit=2, maxLimit=3)
+    assert limiter.limit == 2
+
+    for _ in range(10):
+        limiter.release(0.1)
+    assert limiter.limit == 3
+
+    limiter._lastDecrease = None
+    limiter.release(None, overloaded=True)
+    assert limiter.limit == 2
+
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(minLimit=4, maxLimit=2)
+
+
+def test_AdaptiveLimiter__blocks_above_limit():
+    limiter = AdaptiveLimiter(minLimit=1, maxLimit=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+
+    limiter.release(0.1)
+    assert acquired.wait(1)
+    thread.join()
+    assert limiter.inFlight == 1
+
+
+@pytest.mark.asyncio
+async def test_AsyncAdaptiveLimiter__waits_above_limit():
+    limiter = AsyncAdaptiveLimiter(minLimit=1, maxLimit=2)
+    await limiter.acquire()
+
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    await limiter.release(0.1)
+    await asyncio.wait_for(waiting, 1)
+    assert (limiter.inFlight, limiter.limit) == (1, 2)
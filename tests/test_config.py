@@ -32,6 +32,9 @@ def config_env():
         'VRT_PROJECT': 'env project',
         'VRT_APIKEY': 'env api key',
         'VRT_ENABLESOFTASSERT': 'False',
+        'VRT_HTTPPOOLSIZE': '4',
+        'VRT_HTTPKEEPALIVE': 'false',
+        'VRT_RETRYBACKOFF': '1.5',
     }
     yield env
 
@@ -54,6 +57,9 @@ def test_config_from_environment(config_env):
     assert cfg.project == 'env project'
     assert cfg.apiKey == 'env api key'
     assert cfg.enableSoftAssert == False
+    assert cfg.httpPoolSize == 4
+    assert cfg.httpKeepAlive == False
+    assert cfg.retryBackoff == 1.5
 
 
 def test_default_uses_path(config_file):
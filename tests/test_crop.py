@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from visual_regression_tracker.crop import crop, tile
+
+
+@pytest.fixture
+def image():
+    image = Image.new('RGB', (20, 10))
+    for x in range(20):
+        for y in range(10):
+            image.putpixel((x, y), (x, y, 0))
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    yield output.getvalue()
+
+
+def decode(data):
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.format == 'PNG'
+        return decoded.size, decoded.convert('RGB').getpixel((0, 0))
+
+
+def test_crop__crops_boxes(image):
+    crops = crop(image, [(0, 0, 5, 5), (3, 4, 20, 10)], maxWorkers=2)
+
+    assert [decode(c) for c in crops] == [((5, 5), (0, 0, 0)), ((17, 6), (3, 4, 0))]
+
+
+def test_crop__clips_boxes_to_image(image):
+    crops = crop(image, [(-5, -5, 5, 5), (15, 8, 30, 30)])
+
+    assert [decode(c) for c in crops] == [((5, 5), (0, 0, 0)), ((5, 2), (15, 8, 0))]
+
+
+def test_crop__rejects_boxes_outside_of_image(image):
+    with pytest.raises(ValueError):
+        crop(image, [(20, 0, 25, 5)])
+
+
+def test_tile__splits_image_into_full_width_tiles(image):
+    tiles = tile(image, 4)
+
+    assert [box for box, _ in tiles] == [(0, 0, 20, 4), (0, 4, 20, 8), (0, 8, 20, 10)]
+    assert [decode(data) for _, data in tiles] == [((20, 4), (0, 0, 0)), ((20, 4), (0, 4, 0)), ((20, 2), (0, 8, 0))]
+
+
+def test_tile__rejects_invalid_tile_height(image):
+    with pytest.raises(ValueError):
+        tile(image, 0)
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from visual_regression_tracker import IgnoreArea
+from visual_regression_tracker.geometry import clip, coalesce
+
+
+def pixels(areas):
+    return {
+        (x, y)
+        for area in areas
+        for x in range(area.x, area.x + area.width)
+        for y in range(area.y, area.y + area.height)
+    }
+
+
+@pytest.mark.parametrize('areas, expected', [
+    ([], []),
+    ([IgnoreArea(1, 2, 3, 4)], [IgnoreArea(1, 2, 3, 4)]),
+    ([IgnoreArea(1, 2, 3, 4), IgnoreArea(1, 2, 3, 4)], [IgnoreArea(1, 2, 3, 4)]),
+    ([IgnoreArea(0, 0, 10, 10), IgnoreArea(2, 2, 3, 3)], [IgnoreArea(0, 0, 10, 10)]),
+    ([IgnoreArea(0, 0, 10, 5), IgnoreArea(0, 5, 10, 5)], [IgnoreArea(0, 0, 10, 10)]),
+    ([IgnoreArea(0, 0, 5, 10), IgnoreArea(3, 0, 7, 10)], [IgnoreArea(0, 0, 10, 10)]),
+    ([IgnoreArea(0, 0, 0, 10), IgnoreArea(1, 1, 1, 1)], [IgnoreArea(1, 1, 1, 1)]),
+    ([IgnoreArea(20, 0, 5, 5), IgnoreArea(0, 0, 5, 5)], [IgnoreArea(0, 0, 5, 5), IgnoreArea(20, 0, 5, 5)]),
+])
+def test_coalesce(areas, expected):
+    assert coalesce(areas) == expected
+
+
+def test_coalesce__keeps_crossing_areas_which_do_not_coalesce():
+    cross = [IgnoreArea(0, 4, 10, 2), IgnoreArea(4, 0, 2, 10)]
+
+    assert coalesce(cross) == [IgnoreArea(4, 0, 2, 10), IgnoreArea(0, 4, 10, 2)]
+
+
+def test_coalesce__covers_same_pixels():
+    generator = random.Random(1312)
+    for _ in range(50):
+        areas = [
+            IgnoreArea(generator.randrange(30), generator.randrange(30), generator.randrange(1, 15), generator.randrange(1, 15))
+            for _ in range(generator.randrange(1, 8))
+        ]
+
+        coalesced = coalesce(areas)
+
+        assert pixels(coalesced) == pixels(areas)
+        assert len(coalesced) <= len(areas)
+
+
+def test_clip__rebases_areas_into_box():
+    areas = [IgnoreArea(0, 0, 10, 10), IgnoreArea(15, 15, 10, 10), IgnoreArea(40, 0, 5, 5)]
+
+    assert clip(areas, (5, 5, 20, 30)) == [IgnoreArea(0, 0, 5, 5), IgnoreArea(10, 10, 5, 10)]
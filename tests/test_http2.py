@@ -0,0 +1,118 @@
+import json
+
+import pytest
+import requests
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('h2')
+
+from visual_regression_tracker import Config, TestRun, VisualRegressionTracker, VisualRegressionTrackerError
+from visual_regression_tracker.asyncVisualRegressionTracker import _create_client
+from visual_regression_tracker.http2 import Http2Session
+from visual_regression_tracker.visualRegressionTracker import \
+    _JsonBody, _http_request, _is_connect_error, _create_session
+
+CONFIG = Config(
+    apiUrl='http://localhost:4200',
+    ciBuildId='CI Build Id',
+    branchName='develop',
+    project='Default project',
+    apiKey='CPKVK4JNK24NVNPNGVFQ853HXXEG',
+    transport='http2',
+)
+
+
+@pytest.fixture
+def session():
+    session = Http2Session(CONFIG)
+    yield session
+    session.close()
+
+
+def mock_server(session, handler):
+    """Answers the requests of the session with handler(request) instead of sending them."""
+    session._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_create_session__selects_transport():
+    session = _create_session(CONFIG)
+    try:
+        assert isinstance(session, Http2Session)
+    finally:
+        session.close()
+    assert isinstance(_create_session(Config(**{**CONFIG.__dict__, 'transport': 'http1'})), requests.Session)
+
+
+def test_create_session__rejects_unknown_transport():
+    with pytest.raises(VisualRegressionTrackerError, match='Unknown transport'):
+        VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'transport': 'spdy'}))._getSession()
+
+
+def test_create_client__enables_http2():
+    client = _create_client(CONFIG)
+
+    assert client._transport._pool._http2
+    assert not client._transport._pool._http1
+
+
+def test_request__streams_json_body(session):
+    received = []
+
+    def handler(request):
+        received.append(request)
+        return httpx.Response(201, json={'id': 'testRunId'})
+
+    mock_server(session, handler)
+    body = _JsonBody({'name': 'name'}, TestRun(name='name', imageBytes=b'image'))
+
+    result = _http_request('http://localhost:4200/test-runs', 'post', body, {'apiKey': 'key'}, session=session)
+
+    assert result == {'id': 'testRunId'}
+    request, = received
+    assert request.headers['Content-Length'] == str(len(body))
+    assert request.headers['Content-Type'] == 'application/json'
+    assert json.loads(request.content) == {'name': 'name', 'imageBase64': 'aW1hZ2U='}
+
+
+def test_request__sends_json_and_files(session):
+    received = []
+
+    def handler(request):
+        received.append(request)
+        return httpx.Response(200, json={})
+
+    mock_server(session, handler)
+
+    session.patch('http://localhost:4200/builds/1', json={'status': 'stopped'})
+    session.post('http://localhost:4200/test-runs/multipart', data={'name': 'name'}, files={'image': b'image'})
+
+    assert json.loads(received[0].content) == {'status': 'stopped'}
+    assert received[1].headers['Content-Type'].startswith('multipart/form-data')
+    assert b'image' in received[1].content
+
+
+@pytest.mark.parametrize('error, expected, connecting', [
+    (httpx.ConnectError('refused'), requests.exceptions.ConnectionError, True),
+    (httpx.ConnectTimeout('timeout'), requests.exceptions.ConnectTimeout, True),
+    (httpx.ReadTimeout('timeout'), requests.exceptions.Timeout, False),
+    (httpx.RemoteProtocolError('disconnected'), requests.exceptions.ConnectionError, False),
+])
+def test_request__raises_exceptions_of_requests(session, error, expected, connecting):
+    def handler(request):
+        raise error
+
+    mock_server(session, handler)
+
+    with pytest.raises(expected) as raised:
+        session.get('http://localhost:4200/image.png')
+
+    assert _is_connect_error(raised.value) == connecting
+
+
+def test_close__is_idempotent():
+    session = Http2Session(CONFIG)
+
+    session.close()
+    session.close()
+
+    assert not session._thread.is_alive()
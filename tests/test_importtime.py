@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing requests eagerly made `import visual_regression_tracker` take over
+# 200ms instead of about 40ms. Timings depend on the machine, so the tests check
+# which modules get imported, see benchmarks/importtime.py for timings.
+LAZY_MODULES = ('requests', 'urllib3', 'dacite', 'json', 'httpx', 'sqlite3', 'numpy', 'PIL', 'playwright')
+
+
+def importtime(code: str):
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+        cwd=PACKAGE_DIR, env={**os.environ, 'PYTHONPATH': PACKAGE_DIR},
+    )
+    times = {}
+    for line in output.stderr.splitlines():
+        if line.startswith('import time:') and 'self [us]' not in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+    return times, output.stdout
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='no module __getattr__')
+def test_import__defers_heavy_dependencies():
+    times, _ = importtime('import visual_regression_tracker')
+
+    assert [module for module in LAZY_MODULES if module in times] == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='no module __getattr__')
+def test_import__leaves_heavy_modules_unloaded():
+    _, stdout = importtime('import sys, visual_regression_tracker\nprint(*sys.modules)')
+
+    assert [module for module in LAZY_MODULES if module in stdout.split()] == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='no module __getattr__')
+def test_import__lazy_exports_on_first_use():
+    _, stdout = importtime(
+        'import sys, visual_regression_tracker as vrt\n'
+        'print("requests" in sys.modules)\n'
+        'print(vrt.VisualRegressionTracker.__module__)\n'
+        'print("requests" in sys.modules)\n'
+        'print("VisualRegressionTracker" in dir(vrt))'
+    )
+
+    assert stdout.split() == ['False', 'visual_regression_tracker.visualRegressionTracker', 'True', 'True']
+
+
+def test_import__unknown_attribute():
+    import visual_regression_tracker
+
+    with pytest.raises(AttributeError):
+        visual_regression_tracker.Unknown
+
+
+def test_import__async_tracker_export():
+    pytest.importorskip('httpx')
+    import visual_regression_tracker
+    from visual_regression_tracker.asyncVisualRegressionTracker import AsyncVisualRegressionTracker
+
+    assert visual_regression_tracker.AsyncVisualRegressionTracker is AsyncVisualRegressionTracker
+
+
+def test_import__playwright_integration_defers_playwright_and_httpx():
+    pytest.importorskip('typing_extensions')
+
+    times, _ = importtime('import visual_regression_tracker.playwright')
+
+    assert 'playwright' not in times
+    assert 'httpx' not in times
@@ -0,0 +1,59 @@
+import logging
+
+import pytest
+
+from visual_regression_tracker.instrumentation import Listeners, Timings
+
+
+def test_timings__phase_adds_up(mocker):
+    mocker.patch('time.perf_counter', side_effect=[1, 3, 10, 14, 20])
+    timings = Timings(started=0)
+
+    with timings.phase('request'):
+        pass
+    with timings.phase('request'):
+        pass
+    timings.finish()
+
+    assert timings.phases == {'request': 6}
+    assert timings.total == 20
+
+
+def test_timings__phase_measures_failures():
+    timings = Timings()
+
+    with pytest.raises(ValueError):
+        with timings.phase('request'):
+            raise ValueError()
+
+    assert 'request' in timings.phases
+
+
+def test_listeners__emit(mocker):
+    listeners = Listeners()
+    first, second = mocker.Mock(), mocker.Mock()
+    listeners.add(first)
+    listeners.add(second)
+    listeners.remove(first)
+
+    listeners.emit('test', 'timings', 'result')
+
+    first.assert_not_called()
+    second.assert_called_once_with('test', 'timings', 'result')
+    assert listeners
+
+
+def test_listeners__empty():
+    assert not Listeners()
+
+
+def test_listeners__logs_failing_listener(mocker, caplog):
+    listeners = Listeners()
+    listeners.add(mocker.Mock(side_effect=ValueError('broken')))
+    second = mocker.Mock()
+    listeners.add(second)
+
+    listeners.emit('test', 'timings')
+
+    second.assert_called_once_with('test', 'timings', None)
+    assert caplog.records[0].levelno == logging.ERROR
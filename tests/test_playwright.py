@@ -1,10 +1,15 @@
 import asyncio
+import io
 import pytest
-import base64
-import binascii
 import visual_regression_tracker
 playwright = pytest.importorskip('playwright')
+import playwright.async_api
+import playwright.sync_api
 import visual_regression_tracker.playwright
+try:
+    import PIL.Image
+except ImportError:  # only needed by trackElements
+    PIL = None
 
 CONFIG = visual_regression_tracker.Config(
     apiUrl='https://server/',
@@ -83,7 +88,7 @@ def test_pvrt_trackPage__default_options(pvrt, sync_page, sync_browserType):
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os is None
     assert testRun.browser == sync_browserType.name
     assert testRun.viewport == '1024x768'
@@ -121,7 +126,7 @@ def test_pvrt_trackPage(pvrt, sync_page, sync_browserType):
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os == 'os'
     assert testRun.browser == sync_browserType.name
     assert testRun.viewport == '1024x768'
@@ -132,6 +137,22 @@ def test_pvrt_trackPage(pvrt, sync_page, sync_browserType):
     ]
 
 
+def test_pvrt_trackPage__uses_screenshot_path(pvrt, sync_page, tmpdir):
+    path = str(tmpdir.join('screenshot.png'))
+
+    pvrt.trackPage(
+        sync_page,
+        'image name',
+        visual_regression_tracker.playwright.PageTrackOptions(
+            screenshotOptions=visual_regression_tracker.playwright.PageScreenshotOptions(path=path),
+        ),
+    )
+
+    testRun = pvrt.track.call_args[0][0]
+    assert testRun.imagePath == path
+    assert testRun.imageBytes is None
+
+
 def test_pvrt_trackElementHandle__throws_if_no_page(pvrt):
     with pytest.raises(Exception):
         pvrt.trackElementHandle(None, 'name')
@@ -144,7 +165,7 @@ def test_pvrt_trackElementHandle__default_options(pvrt, sync_elementHandle, sync
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os is None
     assert testRun.browser == sync_browserType.name
     assert testRun.viewport is None
@@ -181,7 +202,7 @@ def test_pvrt_trackElementHandle(pvrt, sync_elementHandle, sync_browserType):
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os == 'os'
     assert testRun.browser == sync_browserType.name
     assert testRun.viewport == '123x345'
@@ -246,7 +267,7 @@ async def test_pvrt_trackPageAsync__default_options(pvrt, async_page, async_brow
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os is None
     assert testRun.browser == async_browserType.name
     assert testRun.viewport == '1024x768'
@@ -285,7 +306,7 @@ async def test_pvrt_trackPageAsync(pvrt, async_page, async_browserType):
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os == 'os'
     assert testRun.browser == async_browserType.name
     assert testRun.viewport == '1024x768'
@@ -310,7 +331,7 @@ async def test_pvrt_trackElementHandleAsync__default_options(pvrt, async_element
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os is None
     assert testRun.browser == async_browserType.name
     assert testRun.viewport is None
@@ -348,7 +369,7 @@ async def test_pvrt_trackElementHandleAsync(pvrt, async_elementHandle, async_bro
 
     testRun = pvrt.track.call_args[0][0]
     assert testRun.name == 'image name'
-    assert is_base64(testRun.imageBase64) and len(testRun.imageBase64) > 1024
+    assert isinstance(testRun.imageBytes, bytes) and len(testRun.imageBytes) > 1024
     assert testRun.os == 'os'
     assert testRun.browser == async_browserType.name
     assert testRun.viewport == '123x345'
@@ -359,10 +380,498 @@ async def test_pvrt_trackElementHandleAsync(pvrt, async_elementHandle, async_bro
     ]
 
 
-def is_base64(val):
-    try:
-        assert isinstance(val, str)
-        base64.b64decode(val)
-        return True
-    except binascii.Error:
-        return False
+def async_stub(mocker, **kwargs):
+    """Coroutine function calling stub.mock when awaited, as mocker.AsyncMock requires Python 3.8."""
+    mock = mocker.Mock(**kwargs)
+
+    async def stub(*args, **kwargs):
+        return mock(*args, **kwargs)
+
+    stub.mock = mock
+    return stub
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageAsync__awaits_track(async_page, async_browserType, mocker):
+    apvrt = visual_regression_tracker.playwright.AsyncPlaywrightVisualRegressionTracker(async_browserType, CONFIG)
+    apvrt.track = async_stub(mocker, return_value='result')
+
+    result = await apvrt.trackPageAsync(async_page, 'image name')
+
+    apvrt.track.mock.assert_called_once()
+    assert result == 'result'
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackElementHandleAsync__awaits_track(async_elementHandle, async_browserType, mocker):
+    apvrt = visual_regression_tracker.playwright.AsyncPlaywrightVisualRegressionTracker(async_browserType, CONFIG)
+    apvrt.track = async_stub(mocker, return_value='result')
+
+    result = await apvrt.trackElementHandleAsync(async_elementHandle, 'image name')
+
+    apvrt.track.mock.assert_called_once()
+    assert result == 'result'
+
+
+def test_pvrt_trackPage__times_screenshot(pvrt, sync_page):
+    pvrt.trackPage(sync_page, 'image name')
+
+    timings = pvrt.track.call_args[1]['timings']
+    assert timings.phases['screenshot'] > 0
+    assert timings.bytes['screenshot'] == len(pvrt.track.call_args[0][0].imageBytes)
+
+
+class FakeContext:
+    def __init__(self, pages):
+        self.pages = pages
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+        self.pages.open -= 1
+
+
+class FakePage:
+    def __init__(self, pages, contextOptions):
+        self.contextOptions = contextOptions
+        self.viewport_size = contextOptions.get('viewport')
+        self.context = FakeContext(pages)
+
+    async def screenshot(self, **options):
+        await asyncio.sleep(0.01)
+        return b'image'
+
+
+class FakePages:
+    """Page factory for trackPageMatrix, recording the pages it opened."""
+
+    def __init__(self):
+        self.pages = []
+        self.open = 0
+        self.maxOpen = 0
+
+    async def __call__(self, contextOptions):
+        self.open += 1
+        self.maxOpen = max(self.maxOpen, self.open)
+        page = FakePage(self, contextOptions)
+        self.pages.append(page)
+        return page
+
+
+@pytest.fixture
+def matrix_apvrt(mocker):
+    browserType = mocker.Mock()
+    browserType.name = 'chromium'
+    apvrt = visual_regression_tracker.playwright.AsyncPlaywrightVisualRegressionTracker(browserType, CONFIG)
+    apvrt.track = async_stub(mocker, side_effect=lambda test, timings: test)
+    return apvrt
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageMatrix__tracks_every_combination(matrix_apvrt):
+    pages = FakePages()
+    iPhone = {'viewport': {'width': 390, 'height': 844}, 'is_mobile': True}
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        diffTollerancePercent=1,
+        agent=visual_regression_tracker.playwright.Agent(os='linux'),
+    )
+
+    results = await matrix_apvrt.trackPageMatrix(
+        pages, 'home', viewports=['1920x1080', {'width': 800, 'height': 600}], devices={'iPhone': iPhone},
+        options=options)
+
+    assert [(test.name, test.viewport, test.device, test.os, test.diffTollerancePercent) for test in results] == [
+        ('home', '1920x1080', 'iPhone', 'linux', 1),
+        ('home', '800x600', 'iPhone', 'linux', 1),
+    ]
+    assert [page.contextOptions for page in pages.pages] == [
+        {'viewport': {'width': 1920, 'height': 1080}, 'is_mobile': True},
+        {'viewport': {'width': 800, 'height': 600}, 'is_mobile': True},
+    ]
+    assert all(page.context.closed for page in pages.pages)
+    assert pages.maxOpen == 2
+    assert options.agent.device is None
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageMatrix__uses_device_viewports(matrix_apvrt):
+    pages = FakePages()
+    devices = {
+        'iPhone': {'viewport': {'width': 390, 'height': 844}},
+        'Pixel': {'viewport': {'width': 393, 'height': 851}},
+    }
+
+    results = await matrix_apvrt.trackPageMatrix(pages, 'home', devices=devices)
+
+    assert [(test.viewport, test.device) for test in results] == [('390x844', 'iPhone'), ('393x851', 'Pixel')]
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageMatrix__limits_open_pages(matrix_apvrt):
+    pages = FakePages()
+
+    results = await matrix_apvrt.trackPageMatrix(
+        pages, 'home', viewports=[f'{width}x600' for width in range(800, 1400, 100)], maxConcurrency=2)
+
+    assert len(results) == 6
+    assert pages.maxOpen == 2
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageMatrix__aggregates_errors(matrix_apvrt):
+    pages = FakePages()
+
+    def track(test, timings):
+        if test.viewport == '800x600':
+            raise visual_regression_tracker.ServerError('failed')
+        return test
+
+    matrix_apvrt.track.mock.side_effect = track
+
+    with pytest.raises(visual_regression_tracker.AggregateTrackError) as error:
+        await matrix_apvrt.trackPageMatrix(pages, 'home', viewports=['800x600', '1024x768'])
+
+    assert len(error.value.errors) == 1
+    assert all(page.context.closed for page in pages.pages)
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageMatrix__requires_viewports_or_devices(matrix_apvrt):
+    with pytest.raises(ValueError):
+        await matrix_apvrt.trackPageMatrix(FakePages(), 'home')
+
+
+ELEMENT_GEOMETRY = {
+    'devicePixelRatio': 2,
+    'boxes': [
+        {'x': 1, 'y': 2, 'width': 3.5, 'height': 4},
+        {'x': 5, 'y': 0, 'width': 5, 'height': 5},
+    ],
+}
+
+
+@pytest.fixture
+def elements_pvrt(mocker):
+    browserType = mocker.Mock()
+    browserType.name = 'chromium'
+    pvrt = visual_regression_tracker.playwright.PlaywrightVisualRegressionTracker(browserType, CONFIG)
+    pvrt.track = mocker.Mock(side_effect=lambda test, timings: (test, timings))
+    return pvrt
+
+
+class FakeElementsPage:
+    def __init__(self, geometry=ELEMENT_GEOMETRY):
+        self.geometry = geometry
+        self.evaluated = []
+        self.screenshots = []
+
+    def evaluate(self, script, query):
+        self.evaluated.append(query)
+        return self.geometry
+
+    def screenshot(self, **options):
+        self.screenshots.append(options)
+        image = PIL.Image.new('RGB', (40, 20))
+        image.putpixel((10, 0), (255, 0, 0))
+        output = io.BytesIO()
+        image.save(output, format='PNG')
+        return output.getvalue()
+
+
+class FakeAsyncElementsPage(FakeElementsPage):
+    async def evaluate(self, script, query):
+        return super().evaluate(script, query)
+
+    async def screenshot(self, **options):
+        return super().screenshot(**options)
+
+
+def test_pvrt_trackElements__crops_one_screenshot(elements_pvrt):
+    pytest.importorskip('PIL')
+    page = FakeElementsPage()
+    options = visual_regression_tracker.playwright.ElementHandleTrackOptions(
+        diffTollerancePercent=1, agent=visual_regression_tracker.playwright.Agent(viewport='20x10'))
+
+    results = elements_pvrt.trackElements(page, {'header': '#header', 'logo': 'handle'}, options)
+
+    assert page.evaluated == [{'origin': 'document', 'ignore': [], 'elements': ['#header', 'handle']}]
+    assert page.screenshots == [{'full_page': True}]
+    header, headerTimings = results['header']
+    logo, _ = results['logo']
+    assert (header.name, header.viewport, header.diffTollerancePercent) == ('header', '20x10', 1)
+    assert PIL.Image.open(io.BytesIO(header.imageBytes)).size == (7, 8)
+    with PIL.Image.open(io.BytesIO(logo.imageBytes)) as image:
+        assert image.size == (10, 10)
+        assert image.convert('RGB').getpixel((0, 0)) == (255, 0, 0)
+    assert set(headerTimings.phases) == {'screenshot', 'crop'}
+    assert headerTimings.bytes['screenshot'] == len(header.imageBytes)
+
+
+def test_pvrt_trackElements__raises_for_missing_element(elements_pvrt):
+    page = FakeElementsPage({'devicePixelRatio': 1, 'boxes': [None]})
+
+    with pytest.raises(ValueError, match='missing'):
+        elements_pvrt.trackElements(page, {'missing': '#missing'})
+
+
+def test_pvrt_trackElements__aggregates_errors(elements_pvrt):
+    pytest.importorskip('PIL')
+    elements_pvrt.track.side_effect = visual_regression_tracker.ServerError('failed')
+
+    with pytest.raises(visual_regression_tracker.AggregateTrackError) as error:
+        elements_pvrt.trackElements(FakeElementsPage(), {'header': '#header', 'logo': '#logo'})
+
+    assert len(error.value.errors) == 2
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackElementsAsync__crops_one_screenshot(matrix_apvrt):
+    pytest.importorskip('PIL')
+
+    results = await matrix_apvrt.trackElementsAsync(FakeAsyncElementsPage(), {'header': '#header', 'logo': 'handle'})
+
+    assert [test.name for test in results.values()] == ['header', 'logo']
+    assert PIL.Image.open(io.BytesIO(results['logo'].imageBytes)).size == (10, 10)
+
+
+def test_pvrt_trackElements__rebases_ignored_elements(elements_pvrt):
+    pytest.importorskip('PIL')
+    page = FakeElementsPage({**ELEMENT_GEOMETRY, 'ignoreBoxes': [{'x': 0, 'y': 0, 'width': 3, 'height': 3}]})
+    options = visual_regression_tracker.playwright.ElementHandleTrackOptions(
+        ignoreAreas=['.ad', visual_regression_tracker.IgnoreArea(0, 0, 1, 1)])
+
+    results = elements_pvrt.trackElements(page, {'header': '#header', 'logo': '#logo'}, options)
+
+    assert page.evaluated[0]['ignore'] == ['.ad']
+    # The ad covers the pixels (0, 0) to (6, 6), the header starts at (2, 4).
+    assert results['header'][0].ignoreAreas == [visual_regression_tracker.IgnoreArea(0, 0, 4, 2)]
+    assert results['logo'][0].ignoreAreas == [visual_regression_tracker.IgnoreArea(0, 0, 1, 1)]
+
+
+class FakeIgnorePage:
+    viewport_size = {'width': 800, 'height': 600}
+
+    def __init__(self, ignoreBoxes, captured=None):
+        self.ignoreBoxes = ignoreBoxes
+        self.captured = captured
+        self.evaluated = []
+
+    def evaluate(self, script, query):
+        self.evaluated.append(query)
+        return {'devicePixelRatio': 2, 'captured': self.captured, 'boxes': [], 'ignoreBoxes': self.ignoreBoxes}
+
+    def screenshot(self, **options):
+        return b'image'
+
+
+def test_pvrt_trackPage__resolves_ignored_elements(elements_pvrt):
+    page = FakeIgnorePage([
+        {'x': 0, 'y': 0, 'width': 10, 'height': 5},
+        {'x': 5, 'y': 0, 'width': 10, 'height': 5.2},
+    ])
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        ignoreAreas=['.ad', 'handle', visual_regression_tracker.IgnoreArea(100, 100, 10, 10)],
+        screenshotOptions=visual_regression_tracker.playwright.PageScreenshotOptions(full_page=True),
+    )
+
+    test, _ = elements_pvrt.trackPage(page, 'home', options)
+
+    assert page.evaluated == [{'origin': 'document', 'elements': [], 'ignore': ['.ad', 'handle']}]
+    assert test.ignoreAreas == [
+        visual_regression_tracker.IgnoreArea(0, 0, 10, 10),
+        visual_regression_tracker.IgnoreArea(10, 0, 20, 11),
+        visual_regression_tracker.IgnoreArea(100, 100, 10, 10),
+    ]
+
+
+def test_pvrt_trackPage__rebases_ignored_elements_into_clip(elements_pvrt):
+    page = FakeIgnorePage([{'x': 0, 'y': 0, 'width': 10, 'height': 10}])
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        ignoreAreas=['.ad'],
+        screenshotOptions=visual_regression_tracker.playwright.PageScreenshotOptions(
+            clip={'x': 5, 'y': 5, 'width': 100, 'height': 100}),
+    )
+
+    test, _ = elements_pvrt.trackPage(page, 'home', options)
+
+    assert page.evaluated[0]['origin'] == 'viewport'
+    assert test.ignoreAreas == [visual_regression_tracker.IgnoreArea(0, 0, 10, 10)]
+
+
+def test_pvrt_trackPage__clips_ignored_elements_to_viewport(elements_pvrt):
+    page = FakeIgnorePage([{'x': 790, 'y': 590, 'width': 100, 'height': 100}, {'x': 0, 'y': 700, 'width': 10, 'height': 10}])
+    options = visual_regression_tracker.playwright.PageTrackOptions(ignoreAreas=['.ad'])
+
+    test, _ = elements_pvrt.trackPage(page, 'home', options)
+
+    assert test.ignoreAreas == [visual_regression_tracker.IgnoreArea(1580, 1180, 20, 20)]
+
+
+def test_pvrt_trackPage__skips_evaluate_for_literal_ignore_areas(elements_pvrt):
+    page = FakeIgnorePage([])
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        ignoreAreas=[visual_regression_tracker.IgnoreArea(1, 2, 3, 4)])
+
+    test, _ = elements_pvrt.trackPage(page, 'home', options)
+
+    assert page.evaluated == []
+    assert test.ignoreAreas == [visual_regression_tracker.IgnoreArea(1, 2, 3, 4)]
+
+
+def test_pvrt_trackElementHandle__resolves_ignored_elements_relative_to_element(elements_pvrt):
+    elementHandle = FakeIgnorePage(
+        [{'x': 1, 'y': 1, 'width': 2, 'height': 2}, {'x': -10, 'y': 0, 'width': 5, 'height': 5}],
+        captured={'x': 0, 'y': 0, 'width': 50, 'height': 20})
+    options = visual_regression_tracker.playwright.ElementHandleTrackOptions(ignoreAreas=['.ad'])
+
+    test, _ = elements_pvrt.trackElementHandle(elementHandle, 'header', options)
+
+    assert elementHandle.evaluated == [{'origin': None, 'elements': [], 'ignore': ['.ad']}]
+    assert test.ignoreAreas == [visual_regression_tracker.IgnoreArea(2, 2, 4, 4)]
+
+
+class FakeSettlingPage:
+    viewport_size = {'width': 800, 'height': 600}
+
+    def __init__(self, *screenshots):
+        self.screenshots = list(screenshots)
+        self.attempts = 0
+
+    def screenshot(self, **options):
+        self.attempts += 1
+        return self.screenshots.pop(0) if len(self.screenshots) > 1 else self.screenshots[0]
+
+
+class FakeAsyncSettlingPage(FakeSettlingPage):
+    async def screenshot(self, **options):
+        return super().screenshot(**options)
+
+
+@pytest.fixture
+def stable_pvrt(elements_pvrt):
+    elements_pvrt.track.side_effect = lambda test, timings: visual_regression_tracker.types.TestRunResult(None, 'url')
+    return elements_pvrt
+
+
+def test_pvrt_trackPage__captures_until_screenshots_settle(stable_pvrt):
+    page = FakeSettlingPage(b'loading', b'fonts', b'fonts', b'done', b'done', b'done')
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        stableCapture=visual_regression_tracker.playwright.StableCaptureOptions(matches=3, interval=0))
+
+    result = stable_pvrt.trackPage(page, 'home', options)
+
+    assert page.attempts == 6
+    assert stable_pvrt.track.call_args[0][0].imageBytes == b'done'
+    assert (result.stabilization.attempts, result.stabilization.stable) == (6, True)
+    assert result.stabilization.settleTime >= 0
+
+
+def test_pvrt_trackPage__tracks_last_screenshot_after_timeout(stable_pvrt, caplog):
+    screenshots = [str(i).encode() for i in range(1000)]
+    page = FakeSettlingPage(*screenshots)
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        stableCapture=visual_regression_tracker.playwright.StableCaptureOptions(timeout=50, interval=10))
+
+    result = stable_pvrt.trackPage(page, 'home', options)
+
+    assert not result.stabilization.stable
+    assert 1 < result.stabilization.attempts < 1000
+    assert stable_pvrt.track.call_args[0][0].imageBytes == screenshots[result.stabilization.attempts - 1]
+    assert 'did not settle' in caplog.text
+
+
+def test_pvrt_trackPage__captures_once_without_stableCapture(stable_pvrt):
+    page = FakeSettlingPage(b'loading', b'done')
+
+    result = stable_pvrt.trackPage(page, 'home')
+
+    assert page.attempts == 1
+    assert result.stabilization is None
+
+
+def test_pvrt_trackElementHandle__captures_until_screenshots_settle(stable_pvrt):
+    elementHandle = FakeSettlingPage(b'loading', b'done', b'done')
+    options = visual_regression_tracker.playwright.ElementHandleTrackOptions(
+        stableCapture=visual_regression_tracker.playwright.StableCaptureOptions(interval=0))
+
+    result = stable_pvrt.trackElementHandle(elementHandle, 'header', options)
+
+    assert stable_pvrt.track.call_args[0][0].imageBytes == b'done'
+    assert result.stabilization.attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageAsync__captures_until_screenshots_settle(matrix_apvrt):
+    matrix_apvrt.track.mock.side_effect = lambda test, timings: visual_regression_tracker.types.TestRunResult(None, 'url')
+    page = FakeAsyncSettlingPage(b'loading', b'done', b'done')
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        stableCapture=visual_regression_tracker.playwright.StableCaptureOptions(interval=0))
+
+    result = await matrix_apvrt.trackPageAsync(page, 'home', options)
+
+    assert matrix_apvrt.track.mock.call_args[0][0].imageBytes == b'done'
+    assert (result.stabilization.attempts, result.stabilization.stable) == (3, True)
+
+
+class FakeTallPage(FakeElementsPage):
+    viewport_size = {'width': 40, 'height': 10}
+
+    def screenshot(self, **options):
+        image = PIL.Image.new('RGB', (40, 25))
+        image.putpixel((0, 24), (255, 0, 0))
+        output = io.BytesIO()
+        image.save(output, format='PNG')
+        if options.get('path'):
+            with open(options['path'], 'wb') as f:
+                f.write(output.getvalue())
+        return output.getvalue()
+
+
+class FakeAsyncTallPage(FakeTallPage):
+    async def screenshot(self, **options):
+        return super().screenshot(**options)
+
+
+def test_pvrt_trackPage__tracks_tiles(elements_pvrt, tmpdir):
+    pytest.importorskip('PIL')
+    options = visual_regression_tracker.playwright.PageTrackOptions(
+        ignoreAreas=[visual_regression_tracker.IgnoreArea(5, 5, 10, 10)],
+        screenshotOptions=visual_regression_tracker.playwright.PageScreenshotOptions(
+            full_page=True, path=str(tmpdir.join('page.png'))),
+        tileHeight=10,
+    )
+
+    results = elements_pvrt.trackPage(FakeTallPage(), 'home', options)
+
+    tiles = [test for test, _ in results]
+    assert [test.name for test in tiles] == ['home [tile 1]', 'home [tile 2]', 'home [tile 3]']
+    assert [PIL.Image.open(io.BytesIO(test.imageBytes)).size for test in tiles] == [(40, 10), (40, 10), (40, 5)]
+    assert PIL.Image.open(io.BytesIO(tiles[2].imageBytes)).convert('RGB').getpixel((0, 4)) == (255, 0, 0)
+    assert [test.ignoreAreas for test in tiles] == [
+        [visual_regression_tracker.IgnoreArea(5, 5, 10, 5)],
+        [visual_regression_tracker.IgnoreArea(5, 0, 10, 5)],
+        None,
+    ]
+    assert [test.imagePath for test in tiles] == [None, None, None]
+    assert set(results[0][1].phases) == {'screenshot', 'crop'}
+
+
+def test_pvrt_trackPage__aggregates_errors_of_tiles(elements_pvrt):
+    pytest.importorskip('PIL')
+    elements_pvrt.track.side_effect = visual_regression_tracker.ServerError('failed')
+    options = visual_regression_tracker.playwright.PageTrackOptions(tileHeight=10)
+
+    with pytest.raises(visual_regression_tracker.AggregateTrackError) as error:
+        elements_pvrt.trackPage(FakeTallPage(), 'home', options)
+
+    assert len(error.value.errors) == 3
+
+
+@pytest.mark.asyncio
+async def test_apvrt_trackPageAsync__tracks_tiles(matrix_apvrt):
+    pytest.importorskip('PIL')
+    options = visual_regression_tracker.playwright.PageTrackOptions(tileHeight=20)
+
+    results = await matrix_apvrt.trackPageAsync(FakeAsyncTallPage(), 'home', options)
+
+    assert [test.name for test in results] == ['home [tile 1]', 'home [tile 2]']
@@ -0,0 +1,31 @@
+import pytest
+
+from visual_regression_tracker import png
+
+
+def test_is_png(png_factory):
+    assert png.is_png(png_factory())
+    assert png.is_png(memoryview(png_factory()))
+    assert not png.is_png(b'\xff\xd8\xff\xe0 jpeg')
+
+
+@pytest.mark.parametrize('idatChunks', [1, 3])
+def test_recompress__is_pixel_exact_and_smaller(png_factory, png_image_data, idatChunks):
+    original = png_factory(idatChunks=idatChunks)
+
+    compressed = png.recompress(original, 9)
+
+    assert len(compressed) < len(original)
+    assert png_image_data(compressed) == png_image_data(original)
+    assert [chunkType for chunkType, _ in png.read_chunks(compressed)] == [b'IHDR', b'tEXt', b'IDAT', b'IEND']
+
+
+def test_recompress__keeps_smaller_original(png_factory):
+    original = png_factory(level=9)
+
+    assert png.recompress(original, 0) is original
+
+
+def test_read_chunks__rejects_other_formats():
+    with pytest.raises(ValueError, match='Not a PNG image'):
+        list(png.read_chunks(b'\xff\xd8\xff\xe0 jpeg'))
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+Image = pytest.importorskip('PIL.Image')
+
+from visual_regression_tracker import IgnoreArea, TestRun, TestRunStatus
+from visual_regression_tracker.prediff import decode, diff_percent, predict
+
+
+def encode(array):
+    output = io.BytesIO()
+    Image.fromarray(array).save(output, format='PNG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def baseline():
+    yield numpy.zeros((10, 20, 4), dtype=numpy.uint8)
+
+
+@pytest.fixture
+def image(baseline):
+    image = baseline.copy()
+    image[0:2, 0:5] = 255
+    yield image
+
+
+def test_decode__returns_rgba(image):
+    decoded = decode(encode(image[:, :, :3]))
+
+    assert decoded.shape == (10, 20, 4)
+    assert (decoded[:, :, :3] == image[:, :, :3]).all()
+    assert (decoded[:, :, 3] == 255).all()
+
+
+def test_diff_percent__identical(baseline):
+    assert diff_percent(baseline, baseline.copy()) == 0
+
+
+def test_diff_percent__counts_changed_pixels(image, baseline):
+    assert diff_percent(image, baseline) == 5.0
+
+
+def test_diff_percent__any_channel_differs(baseline):
+    image = baseline.copy()
+    image[0, 0, 3] = 1
+
+    assert diff_percent(image, baseline) == 0.5
+
+
+@pytest.mark.parametrize('ignoreAreas, expected', [
+    ([IgnoreArea(0, 0, 5, 2)], 0.0),
+    ([IgnoreArea(0, 0, 5, 1)], 2.5),
+    ([IgnoreArea(0, 0, 2, 2), IgnoreArea(2, 0, 3, 2)], 0.0),
+    ([IgnoreArea(-5, -5, 100, 100)], 0.0),
+    ([IgnoreArea(-3, -1, 5, 2)], 4.0),
+    ([IgnoreArea(10, 5, 5, 5)], 5.0),
+])
+def test_diff_percent__ignores_areas(image, baseline, ignoreAreas, expected):
+    assert diff_percent(image, baseline, ignoreAreas) == expected
+
+
+def test_diff_percent__different_size(baseline):
+    assert diff_percent(baseline[:5], baseline) == 100.0
+
+
+@pytest.mark.parametrize('diffTollerancePercent, expected', [
+    (None, TestRunStatus.UNRESOLVED),
+    (4.9, TestRunStatus.UNRESOLVED),
+    (5, TestRunStatus.OK),
+])
+def test_predict(image, baseline, diffTollerancePercent, expected):
+    test_run = TestRun(imageBytes=encode(image), diffTollerancePercent=diffTollerancePercent)
+
+    localDiff = predict(test_run, encode(baseline))
+
+    assert localDiff.diffPercent == 5.0
+    assert localDiff.status == expected
@@ -0,0 +1,146 @@
+import email.utils
+import time
+
+import pytest
+
+from visual_regression_tracker import CircuitOpenError
+from visual_regression_tracker.retry import CircuitBreaker, RetryPolicy, _idempotency_headers
+
+
+@pytest.mark.parametrize('method, status, sent, expected', [
+    ('post', 429, True, True),
+    ('post', 503, True, True),
+    ('post', 502, True, False),
+    ('post', 504, True, False),
+    ('post', 500, True, False),
+    ('post', None, False, True),
+    ('post', None, True, False),
+    ('patch', 502, True, True),
+    ('patch', 504, True, True),
+    ('patch', 500, True, False),
+    ('patch', 404, True, False),
+    ('patch', None, True, True),
+    ('get', 503, True, True),
+    ('post', 200, True, False),
+])
+def test_shouldRetry(method, status, sent, expected):
+    assert RetryPolicy(maxAttempts=3).shouldRetry(1, method, status, sent) == expected
+
+
+def test_shouldRetry__stops_at_max_attempts():
+    policy = RetryPolicy(maxAttempts=3)
+
+    assert policy.shouldRetry(2, 'post', 503)
+    assert not policy.shouldRetry(3, 'post', 503)
+    assert not RetryPolicy(maxAttempts=1).shouldRetry(1, 'post', 503)
+
+
+@pytest.mark.parametrize('attempt', [1, 2, 3])
+def test_delay__exponential_backoff_with_jitter(attempt):
+    policy = RetryPolicy(backoff=0.5, maxBackoff=30)
+
+    delays = [policy.delay(attempt) for _ in range(50)]
+
+    assert all(0 <= d <= 0.5 * 2 ** (attempt - 1) for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_delay__capped_at_max_backoff():
+    policy = RetryPolicy(backoff=0.5, maxBackoff=2)
+
+    assert all(0 <= policy.delay(10) <= 2 for _ in range(50))
+
+
+@pytest.mark.parametrize('retryAfter, expected', [
+    ('3', 3),
+    ('0', 0),
+    ('120', 30),
+    (email.utils.formatdate(time.time() - 60, usegmt=True), 0),
+])
+def test_delay__honors_retry_after(retryAfter, expected):
+    assert RetryPolicy(maxBackoff=30).delay(1, retryAfter) == expected
+
+
+def test_delay__honors_retry_after_date():
+    retryAfter = email.utils.formatdate(time.time() + 10, usegmt=True)
+
+    assert 8 <= RetryPolicy().delay(1, retryAfter) <= 10
+
+
+def test_delay__ignores_invalid_retry_after():
+    assert 0 <= RetryPolicy(backoff=1).delay(1, 'soon') <= 1
+
+
+def test_idempotency_headers():
+    headers = {'apiKey': 'key'}
+    policy = RetryPolicy(maxAttempts=3)
+
+    assert _idempotency_headers(headers, 'post', None) is headers
+    assert _idempotency_headers(headers, 'post', RetryPolicy(maxAttempts=1)) is headers
+    assert _idempotency_headers(headers, 'patch', policy) is headers
+    assert set(_idempotency_headers(headers, 'post', policy)) == {'apiKey', 'Idempotency-Key'}
+
+
+def test_circuit_breaker__opens_after_threshold():
+    breaker = CircuitBreaker(failureThreshold=2, resetTimeout=30)
+
+    breaker.before()
+    breaker.failure()
+    breaker.before()
+    breaker.failure()
+
+    assert breaker.isOpen
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+
+def test_circuit_breaker__success_resets_failures():
+    breaker = CircuitBreaker(failureThreshold=2)
+
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+
+    assert not breaker.isOpen
+
+
+def test_circuit_breaker__half_open_after_timeout(mocker):
+    monotonic = mocker.patch('time.monotonic', return_value=100)
+    breaker = CircuitBreaker(failureThreshold=1, resetTimeout=30)
+    breaker.failure()
+
+    monotonic.return_value = 131
+    breaker.before()
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+    breaker.failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+    monotonic.return_value = 162
+    breaker.before()
+    breaker.success()
+    breaker.before()
+    assert not breaker.isOpen
+
+
+def test_circuit_breaker__abandoned_trial_lets_next_request_through(mocker):
+    monotonic = mocker.patch('time.monotonic', return_value=100)
+    breaker = CircuitBreaker(failureThreshold=1, resetTimeout=30)
+    breaker.failure()
+
+    monotonic.return_value = 131
+    breaker.before()
+    breaker.abandon()
+
+    breaker.before()
+    assert breaker.isOpen
+
+
+def test_circuit_breaker__disabled():
+    breaker = CircuitBreaker(failureThreshold=0)
+
+    for _ in range(10):
+        breaker.failure()
+        breaker.before()
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+
+import pytest
+
+from visual_regression_tracker.sharedBuild import SharedBuild, _build_key, _shared_build
+
+
+@pytest.fixture
+def path(tmpdir):
+    yield str(tmpdir / 'build.json')
+
+
+def attach(shared: SharedBuild, key: str = 'key', buildId: str = 'build'):
+    created = []
+    with shared.attach(key) as state:
+        if state.buildId is None:
+            state.buildId, state.projectId = buildId, 'project'
+            created.append(buildId)
+    return state.buildId, created
+
+
+def test_attach__first_process_creates_build(path):
+    assert attach(SharedBuild(path), buildId='1') == ('1', ['1'])
+    assert attach(SharedBuild(path), buildId='2') == ('1', [])
+
+
+def test_attach__discards_other_build(path):
+    attach(SharedBuild(path), key='old', buildId='1')
+
+    assert attach(SharedBuild(path), key='new', buildId='2') == ('2', ['2'])
+
+
+def test_attach__not_attached_on_failure(path):
+    shared = SharedBuild(path)
+
+    with pytest.raises(RuntimeError):
+        with shared.attach('key'):
+            raise RuntimeError()
+    with pytest.raises(ValueError):
+        with shared.attach('key'):
+            pass
+
+    assert attach(shared, buildId='1') == ('1', ['1'])
+    assert shared.detach()
+
+
+def test_detach__last_attached_process_stops_build(path):
+    first, second = SharedBuild(path), SharedBuild(path)
+    attach(first)
+    attach(second)
+
+    assert not first.detach()
+    assert second.detach()
+    assert attach(first, buildId='next') == ('next', ['next'])
+
+
+def test_detach__keeps_build_for_workers_of_run(path):
+    first, second = SharedBuild(path, 'run', 'gw0'), SharedBuild(path, 'run', 'gw1')
+    attach(first)
+
+    assert first.detach()
+    assert attach(second) == ('build', [])
+    assert second.detach()
+    assert attach(SharedBuild(path, 'next run', 'gw0'), buildId='next') == ('next', ['next'])
+
+
+def test_detach__worker_stopping_twice_waits_for_other_workers(path):
+    first, second = SharedBuild(path, 'run', 'gw0'), SharedBuild(path, 'run', 'gw1')
+    attach(first)
+    attach(second)
+
+    assert not first.detach()
+    assert attach(first) == ('build', [])
+    assert not first.detach()
+    assert second.detach()
+
+
+def test_detach__worker_never_attaching(path):
+    workers = [SharedBuild(path, 'run', f'gw{i}') for i in range(3)]
+    attach(workers[0])
+    attach(workers[1])
+
+    assert not workers[0].detach()
+    assert workers[1].detach()
+    assert attach(workers[2]) == ('build', [])
+    assert workers[2].detach()
+
+
+def test_detach__counts_attachments_of_one_worker(path):
+    first, second = SharedBuild(path, worker='1'), SharedBuild(path, worker='1')
+    attach(first)
+    attach(second)
+
+    assert not first.detach()
+    assert second.detach()
+
+
+def _attach_in_process(path, queue):
+    queue.put(attach(SharedBuild(path), buildId=str(os.getpid())))
+
+
+def test_attach__creates_one_build_across_processes(path):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_attach_in_process, args=(path, queue)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert len({buildId for buildId, _ in results}) == 1
+    assert sum(len(created) for _, created in results) == 1
+
+
+XDIST_ENVIRONMENT = {'PYTEST_XDIST_TESTRUNUID': 'abc', 'PYTEST_XDIST_WORKER': 'gw1'}
+
+
+@pytest.mark.parametrize('path, environment, expected', [
+    (None, {}, None),
+    ('build.json', {}, ('build.json', None, str(os.getpid()))),
+    (None, XDIST_ENVIRONMENT, ('vrt-build-abc.json', 'abc', 'gw1')),
+    ('build.json', XDIST_ENVIRONMENT, ('build.json', 'abc', 'gw1')),
+])
+def test__shared_build(path, environment, expected):
+    shared = _shared_build(path, environment)
+
+    if expected is None:
+        assert shared is None
+    else:
+        assert (os.path.basename(shared.path), shared.run, shared.worker) == expected
+
+
+def test__build_key():
+    assert _build_key('url', 'project', 'branch', 'ci') != _build_key('url', 'project', 'branch', 'other ci')
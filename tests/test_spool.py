@@ -0,0 +1,189 @@
+import pytest
+
+from visual_regression_tracker import \
+    Config, IgnoreArea, ServerError, TestRun, TestRunResponse, TestRunStatus, VisualRegressionTracker
+from visual_regression_tracker.spool import Spool, SpooledBuild, replay
+
+CONFIG = Config(
+    apiUrl='http://localhost:4200',
+    ciBuildId='CI Build Id',
+    branchName='develop',
+    project='Default project',
+    apiKey='CPKVK4JNK24NVNPNGVFQ853HXXEG',
+)
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('spool.db'))
+
+
+@pytest.fixture
+def spool(path):
+    spool = Spool(path)
+    yield spool
+    spool.close()
+
+
+@pytest.fixture
+def mock_request(mocker):
+    def request(url, method, data, headers, **kwargs):
+        if url.endswith('/builds'):
+            return {'id': '1312', 'projectId': 'asd'}
+        if url.endswith('/test-runs'):
+            data = data.fields
+            return {
+                'id': data['name'], 'imageName': 'imageName', 'url': 'url',
+                'status': 'unresolved' if data['name'] == 'changed' else 'ok',
+            }
+        return {}
+
+    yield mocker.patch(
+        'visual_regression_tracker.visualRegressionTracker._http_request', side_effect=request)
+
+
+def spool_build(path, *tests, finished=True):
+    spool = Spool(path)
+    build = spool.addBuild('CI Build Id', 'feature', 'Spooled project')
+    for test in tests:
+        spool.append(build, test)
+    if finished:
+        spool.finishBuild(build)
+    spool.close()
+
+
+def uploaded_names(mock_request):
+    return [call[0][2].fields['name'] for call in mock_request.call_args_list if call[0][0].endswith('/test-runs')]
+
+
+def test_append__round_trips_test_run(spool, tmpdir):
+    imagePath = tmpdir.join('image.png')
+    imagePath.write_binary(b'file')
+    build = spool.addBuild('CI Build Id', 'develop', 'project')
+
+    spool.append(build, TestRun(name='bytes', imageBytes=b'bytes', ignoreAreas=[IgnoreArea(1, 2, 3, 4)]))
+    spool.append(build, TestRun(name='path', imagePath=str(imagePath)))
+    spool.append(build, TestRun(name='base64', imageBase64='YmFzZTY0'))
+
+    assert [(test.name, test.imageBytes) for _, test in spool.pending(build)] == [
+        ('bytes', b'bytes'), ('path', b'file'), ('base64', b'base64')]
+    assert next(spool.pending(build))[1].ignoreAreas == [IgnoreArea(1, 2, 3, 4)]
+
+
+def test_append__deduplicates_test_runs_of_build(spool):
+    build = spool.addBuild('CI Build Id', 'develop', 'project')
+    other = spool.addBuild('CI Build Id', 'develop', 'project')
+
+    assert spool.append(build, TestRun(name='name', imageBytes=b'image'))
+    assert not spool.append(build, TestRun(name='name', imageBytes=b'image'))
+    assert spool.append(build, TestRun(name='name', imageBytes=b'other'))
+    assert spool.append(build, TestRun(name='name', os='os', imageBytes=b'image'))
+    assert spool.append(other, TestRun(name='name', imageBytes=b'image'))
+
+    assert len(list(spool.pending(build))) == 3
+
+
+def test_markUploaded__removes_pending_test_run(spool):
+    build = spool.addBuild('CI Build Id', 'develop', 'project')
+    spool.append(build, TestRun(name='first', imageBytes=b'image'))
+    spool.append(build, TestRun(name='second', imageBytes=b'image'))
+
+    testRunId, _ = next(spool.pending(build))
+    spool.markUploaded(testRunId, TestRunResponse(id='id', status=TestRunStatus.OK))
+
+    assert [test.name for _, test in spool.pending(build)] == ['second']
+
+
+def test_builds__returns_builds_not_stopped(spool):
+    first = spool.addBuild('1', 'develop', 'project')
+    second = spool.addBuild('2', 'develop', 'project')
+    spool.finishBuild(first)
+    spool.setBuild(first, '1312', 'asd')
+    spool.markStopped(second)
+
+    assert spool.builds() == [SpooledBuild(first, '1', 'develop', 'project', '1312', 'asd', finished=True)]
+
+
+def test_replay__uploads_spooled_build(path, mock_request):
+    spool_build(
+        path,
+        TestRun(name='same', imageBytes=b'image'),
+        TestRun(name='changed', imageBytes=b'image'),
+    )
+
+    result = replay(path, CONFIG)
+
+    assert (result.uploaded, result.new, result.unresolved, result.errors) == (2, 0, 1, [])
+    urls = [call[0][0] for call in mock_request.call_args_list]
+    assert urls[0] == f'{CONFIG.apiUrl}/builds'
+    assert mock_request.call_args_list[0][0][2] == {
+        'ciBuildId': 'CI Build Id', 'branchName': 'feature', 'project': 'Spooled project'}
+    assert mock_request.call_args_list[0][0][3]['project'] == 'Spooled project'
+    assert sorted(uploaded_names(mock_request)) == ['changed', 'same']
+    assert urls[-1] == f'{CONFIG.apiUrl}/builds/1312'
+
+
+def test_replay__skips_uploaded_test_runs(path, mock_request):
+    spool_build(path, TestRun(name='name', imageBytes=b'image'))
+    replay(path, CONFIG)
+    mock_request.reset_mock()
+
+    result = replay(path, CONFIG)
+
+    assert result.uploaded == 0
+    mock_request.assert_not_called()
+
+
+def test_replay__resumes_after_failed_uploads(path, mock_request):
+    spool_build(
+        path,
+        TestRun(name='first', imageBytes=b'image'),
+        TestRun(name='second', imageBytes=b'image'),
+    )
+    request = mock_request.side_effect
+
+    def failSecond(url, method, data, headers, **kwargs):
+        if getattr(data, 'fields', data).get('name') == 'second':
+            raise ServerError('Request failed')
+        return request(url, method, data, headers, **kwargs)
+
+    mock_request.side_effect = failSecond
+    result = replay(path, CONFIG)
+    assert result.uploaded == 1
+    assert len(result.errors) == 1
+    # The build stays open until all of its test runs are uploaded.
+    assert f'{CONFIG.apiUrl}/builds/1312' not in [call[0][0] for call in mock_request.call_args_list]
+
+    mock_request.reset_mock()
+    mock_request.side_effect = request
+    result = replay(path, CONFIG)
+
+    assert (result.uploaded, result.errors) == (1, [])
+    assert uploaded_names(mock_request) == ['second']
+    # The build created by the first replay is reused.
+    assert [call[0][0] for call in mock_request.call_args_list] == [
+        f'{CONFIG.apiUrl}/test-runs', f'{CONFIG.apiUrl}/builds/1312']
+
+
+def test_replay__keeps_unfinished_build_open(path, mock_request):
+    spool_build(path, TestRun(name='name', imageBytes=b'image'), finished=False)
+
+    result = replay(path, CONFIG)
+
+    assert result.uploaded == 1
+    assert [call[0][0] for call in mock_request.call_args_list] == [
+        f'{CONFIG.apiUrl}/builds', f'{CONFIG.apiUrl}/test-runs']
+
+
+def test_replay__uploads_spool_of_tracker(path, mock_request):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'spoolPath': path}))
+    with vrt:
+        result = vrt.track(TestRun(name='name', imageBytes=b'image'))
+    assert result.spooled
+    mock_request.assert_not_called()
+
+    result = replay(path, CONFIG)
+
+    assert result.uploaded == 1
+    assert [call[0][0] for call in mock_request.call_args_list] == [
+        f'{CONFIG.apiUrl}/builds', f'{CONFIG.apiUrl}/test-runs', f'{CONFIG.apiUrl}/builds/1312']
@@ -1,7 +1,8 @@
 import pytest
 
 from visual_regression_tracker.types import \
-    Build, _to_dict, _from_dict, TestRunResponse, TestRunResult, IgnoreArea, TestRun, TestRunStatus
+    Build, _to_dict, _from_dict, TestRunResponse, TestRunResult, IgnoreArea, TestRun, TestRunStatus, \
+    _image_bytes, _has_image
 
 
 @pytest.mark.parametrize('data, clazz, expected', [
@@ -103,3 +104,39 @@ def test__TestRunResult_only_required_images():
     assert result.imageUrl == "http://localhost/imageName"
     assert result.diffUrl is None
     assert result.baselineUrl is None
+
+
+@pytest.fixture
+def image_file(tmpdir):
+    p = tmpdir.join('image.png')
+    p.write_binary(b'image')
+    yield str(p)
+
+
+@pytest.mark.parametrize('test_run', [
+    TestRun(imageBase64='aW1hZ2U='),
+    TestRun(imageBytes=b'image'),
+    TestRun(imageBytes=bytearray(b'image')),
+    TestRun(imageBytes=memoryview(b'image')),
+])
+def test__image_bytes(test_run):
+    assert _has_image(test_run)
+    assert _image_bytes(test_run) == b'image'
+
+
+def test__image_bytes__from_path(image_file):
+    test_run = TestRun(imagePath=image_file)
+
+    assert _has_image(test_run)
+    assert _image_bytes(test_run) == b'image'
+
+
+def test__image_bytes__from_empty_file(tmpdir):
+    p = tmpdir.join('empty.png')
+    p.write_binary(b'')
+
+    assert _image_bytes(TestRun(imagePath=str(p))) == b''
+
+
+def test__has_image__without_image():
+    assert not _has_image(TestRun(name='name'))
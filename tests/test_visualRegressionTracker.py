@@ -1,17 +1,27 @@
+import base64
 import json
 import logging
 import re
+import threading
+import time
+import tracemalloc
 
 import pytest
+import requests
+import urllib3.exceptions
 
 from visual_regression_tracker import \
     Config, IgnoreArea, VisualRegressionTracker, \
     TestRun, TestRunResponse, TestRunStatus, \
-    ServerError, TestRunError, VisualRegressionTrackerError
+    ServerError, CircuitOpenError, TestRunError, AggregateTrackError, VisualRegressionTrackerError
+from visual_regression_tracker.instrumentation import \
+    Timings
+from visual_regression_tracker.retry import \
+    CircuitBreaker, RetryPolicy
 from visual_regression_tracker.types import \
-    _to_dict
+    _to_dict, LocalDiff
 from visual_regression_tracker.visualRegressionTracker import \
-    _http_request
+    _http_request, _JsonBody
 
 CONFIG = Config(
     apiUrl='http://localhost:4200',
@@ -73,7 +83,7 @@ def test__track__should_track_success(vrt, mocker):
 
     test_run_result = vrt.track(test_run)
 
-    vrt._submitTestResult.assert_called_once_with(test_run)
+    vrt._submitTestResult.assert_called_once_with(test_run, mocker.ANY)
     assert test_run_result.testRunResponse == test_run_response
     assert test_run_result.imageUrl == f'{CONFIG.apiUrl}/{test_run_response.imageName}'
     assert test_run_result.diffUrl == f'{CONFIG.apiUrl}/{test_run_response.diffName}'
@@ -146,6 +156,9 @@ def test__start__should_start_build(vrt, mock_request):
             'apiKey': CONFIG.apiKey,
             'project': CONFIG.project
         },
+        session=vrt._session,
+        retry=vrt._retry,
+        breaker=vrt._breaker,
     )
 
     assert vrt.buildId == buildId
@@ -168,6 +181,9 @@ def test__stop__should_stop_build(vrt, mock_request, mocker):
             'apiKey': CONFIG.apiKey,
             'project': CONFIG.project
         },
+        session=mocker.ANY,
+        retry=vrt._retry,
+        breaker=vrt._breaker,
     )
     assert vrt.buildId is None
     assert vrt.projectId is None
@@ -206,7 +222,7 @@ def test__contextmanager__starts_and_stops_build(vrt, mocker):
     vrt.stop.assert_called_once()
 
 
-def test__submitTestResults__should_submit_test_run(vrt, mock_request):
+def test__submitTestResults__should_submit_test_run(vrt, mock_request, mocker):
     testRunResult = TestRunResponse(
         url='url',
         status=TestRunStatus.UNRESOLVED,
@@ -236,30 +252,34 @@ def test__submitTestResults__should_submit_test_run(vrt, mock_request):
     mock_request.assert_called_once_with(
         f'{CONFIG.apiUrl}/test-runs',
         'post',
-        {
-            'name': testRun.name,
-            'imageBase64': testRun.imageBase64,
-            'os': testRun.os,
-            'browser': testRun.browser,
-            'viewport': testRun.viewport,
-            'device': testRun.device,
-            'buildId': buildId,
-            'projectId': projectId,
-            'branchName': CONFIG.branchName,
-            'ignoreAreas': [
-                {
-                    'x': 1,
-                    'y': 2,
-                    'width': 3,
-                    'height': 4,
-                }
-            ]
-        },
+        mocker.ANY,
         {
             'apiKey': CONFIG.apiKey,
             'project': CONFIG.project
         },
+        session=vrt._session,
+        retry=vrt._retry,
+        breaker=vrt._breaker,
     )
+    assert mock_request.call_args[0][2].json() == {
+        'name': testRun.name,
+        'imageBase64': testRun.imageBase64,
+        'os': testRun.os,
+        'browser': testRun.browser,
+        'viewport': testRun.viewport,
+        'device': testRun.device,
+        'buildId': buildId,
+        'projectId': projectId,
+        'branchName': CONFIG.branchName,
+        'ignoreAreas': [
+            {
+                'x': 1,
+                'y': 2,
+                'width': 3,
+                'height': 4,
+            }
+        ]
+    }
 
 
 def test__submitTestResults__should_throw_not_started(vrt, mocker):
@@ -292,6 +312,17 @@ def test__http_request__success(mocker):
     assert actual == expected
 
 
+def test__http_request__uses_session(mocker):
+    session = mocker.Mock()
+    response = session.patch.return_value
+    response.status_code = 200
+    response.json.return_value = {}
+
+    _http_request('url', 'patch', {}, {2: '3'}, session=session)
+
+    session.patch.assert_called_once_with('url', json={}, headers={2: '3'})
+
+
 @pytest.mark.parametrize('status_code,response_body,expected_match', [
     (401, {}, 'Unauthorized'),
     (403, {}, 'Api key not authenticated'),
@@ -311,3 +342,821 @@ def test__http_request__maps_status_code(
         _http_request('url', 'post', {'1': 2}, {2: '3'})
 
     post.assert_called_once_with('url', json={'1': 2}, headers={2: '3'})
+
+
+def test__getSession__reuses_session(vrt):
+    session = vrt._getSession()
+
+    assert vrt._getSession() is session
+    assert session.get_adapter(CONFIG.apiUrl)._pool_maxsize == CONFIG.httpPoolSize
+
+
+def test__getSession__resets_after_fork(vrt, mocker):
+    session = vrt._getSession()
+    mocker.patch('os.getpid', return_value=-1)
+
+    assert vrt._getSession() is not session
+
+
+def test__getSession__disables_keep_alive(mocker):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'httpKeepAlive': False}))
+
+    assert vrt._getSession().headers['Connection'] == 'close'
+
+
+def test__stop__should_close_session(vrt, mock_request, mocker):
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    close = mocker.patch.object(vrt._getSession(), 'close')
+
+    vrt.stop()
+
+    close.assert_called_once()
+    assert vrt._session is None
+
+
+def test__trackNowait__returns_future(vrt, mocker):
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    vrt.track = mocker.Mock(return_value='result')
+    test_run = TestRun(name='name')
+
+    future = vrt.trackNowait(test_run)
+
+    assert future.result() == 'result'
+    vrt.track.assert_called_once_with(test_run)
+
+
+def test__trackNowait__should_throw_not_started(vrt):
+    with pytest.raises(VisualRegressionTrackerError,
+                       match='Visual Regression Tracker has not been started'):
+        vrt.trackNowait(TestRun())
+
+
+def test__stop__drains_background_test_runs(vrt, mock_request, mocker):
+    calls = []
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    vrt.track = mocker.Mock(side_effect=lambda test: calls.append(test.name))
+    mock_request.side_effect = lambda url, *args, **kwargs: calls.append(url)
+
+    for i in range(10):
+        vrt.trackNowait(TestRun(name=str(i)))
+    vrt.stop()
+
+    assert sorted(calls[:-1]) == sorted(str(i) for i in range(10))
+    assert calls[-1] == f'{CONFIG.apiUrl}/builds/build'
+
+
+def test__stop__raises_background_errors(vrt, mock_request, mocker):
+    vrt.config.enableSoftAssert = False
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    error = TestRunError(TestRunStatus.UNRESOLVED, 'Difference found: url')
+    vrt.track = mocker.Mock(side_effect=[error, 'result'])
+
+    vrt.trackNowait(TestRun(name='failing'))
+    vrt.trackNowait(TestRun(name='passing'))
+
+    with pytest.raises(AggregateTrackError, match='Difference found: url') as exc_info:
+        vrt.stop()
+
+    assert exc_info.value.errors == [error]
+    mock_request.assert_called_once()
+    assert vrt.buildId is None
+
+
+def test__stop__skips_retrieved_background_errors(vrt, mock_request, mocker):
+    vrt.config.enableSoftAssert = False
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    error = ServerError('Request failed')
+    vrt.track = mocker.Mock(side_effect=[error, error])
+
+    handled = vrt.trackNowait(TestRun(name='handled'))
+    vrt.trackNowait(TestRun(name='ignored'))
+    with pytest.raises(ServerError):
+        handled.result()
+
+    with pytest.raises(AggregateTrackError) as exc_info:
+        vrt.stop()
+
+    assert exc_info.value.errors == [error]
+
+
+def test__stop__logs_background_server_errors_with_soft_assert(mock_request, mocker, caplog):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'enableSoftAssert': True}))
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    vrt.track = mocker.Mock(side_effect=ServerError('Request failed'))
+
+    future = vrt.trackNowait(TestRun(name='failing'))
+    vrt.stop()
+
+    assert isinstance(future.exception(), ServerError)
+    assert caplog.record_tuples == [(
+        "visual_regression_tracker.visualRegressionTracker",
+        logging.ERROR,
+        'Background test run failed: Request failed'
+    )]
+
+
+def test__stop__logs_background_errors_with_soft_assert(mock_request, caplog):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'enableSoftAssert': True}))
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    vrt._submitTestResult = lambda test, timings: TestRunResponse(url='url', status=TestRunStatus.NEW)
+
+    vrt.trackNowait(TestRun(name='new'))
+    vrt.stop()
+
+    assert caplog.record_tuples == [(
+        "visual_regression_tracker.visualRegressionTracker",
+        logging.ERROR,
+        'No baseline: url'
+    )]
+
+
+def test__trackMany__returns_results_in_input_order(vrt, mocker):
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    vrt.track = mocker.Mock(side_effect=lambda test: f'result {test.name}')
+
+    results = vrt.trackMany((TestRun(name=str(i)) for i in range(20)), maxConcurrency=3)
+
+    assert results == [f'result {i}' for i in range(20)]
+    assert vrt.track.call_count == 20
+
+
+def test__trackMany__raises_collected_errors(vrt, mocker):
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    error = TestRunError(TestRunStatus.UNRESOLVED, 'Difference found: url')
+
+    def track(test):
+        if test.name == '1':
+            raise error
+        return 'result'
+    vrt.track = mocker.Mock(side_effect=track)
+
+    with pytest.raises(AggregateTrackError) as exc_info:
+        vrt.trackMany([TestRun(name=str(i)) for i in range(3)])
+
+    assert exc_info.value.errors == [error]
+    assert vrt.track.call_count == 3
+
+
+def test__trackMany__should_throw_not_started(vrt):
+    with pytest.raises(VisualRegressionTrackerError,
+                       match='Visual Regression Tracker has not been started'):
+        vrt.trackMany([TestRun()])
+
+
+def test__trackManyAsCompleted__yields_all_results(vrt, mocker):
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    vrt.track = mocker.Mock(side_effect=lambda test: f'result {test.name}')
+    tests = [TestRun(name=str(i)) for i in range(10)]
+
+    results = list(vrt.trackManyAsCompleted(iter(tests), maxConcurrency=4))
+
+    assert sorted(results, key=lambda r: int(r[0].name)) == [
+        (test, f'result {test.name}') for test in tests
+    ]
+
+
+def test__trackManyAsCompleted__bounds_tests_in_flight(vrt, mocker):
+    vrt.buildId = 'build'
+    vrt.projectId = 'project'
+    vrt.track = mocker.Mock(return_value='result')
+    pulled = []
+
+    def tests():
+        for i in range(10):
+            pulled.append(i)
+            yield TestRun(name=str(i))
+
+    iterator = vrt.trackManyAsCompleted(tests(), maxConcurrency=2)
+    next(iterator)
+
+    assert len(pulled) <= 3
+    iterator.close()
+
+
+@pytest.fixture
+def multipart_vrt():
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'multipartUpload': True}))
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    yield vrt
+
+
+def test__submitTestResults__should_submit_multipart(multipart_vrt, mock_request):
+    mock_request.return_value = {'url': 'url', 'status': 'ok'}
+    testRun = TestRun(
+        name='name',
+        imageBase64=base64.b64encode(b'image').decode('ascii'),
+        browser='browser',
+        diffTollerancePercent=0.5,
+        ignoreAreas=[IgnoreArea(1, 2, 3, 4)]
+    )
+
+    result = multipart_vrt._submitTestResult(testRun)
+
+    assert result == TestRunResponse(url='url', status=TestRunStatus.OK)
+    mock_request.assert_called_once_with(
+        f'{CONFIG.apiUrl}/test-runs/multipart',
+        'post',
+        {
+            'name': 'name',
+            'browser': 'browser',
+            'diffTollerancePercent': '0.5',
+            'ignoreAreas': '[{"x": 1, "y": 2, "width": 3, "height": 4}]',
+            'buildId': '1312',
+            'projectId': 'asd',
+            'branchName': CONFIG.branchName,
+        },
+        {
+            'apiKey': CONFIG.apiKey,
+            'project': CONFIG.project
+        },
+        session=multipart_vrt._session,
+        retry=multipart_vrt._retry,
+        breaker=multipart_vrt._breaker,
+        files={'image': ('image.png', b'image', 'image/png')},
+    )
+
+
+def test__submitTestResults__multipart_falls_back_to_json(multipart_vrt, mock_request, caplog):
+    mock_request.side_effect = [
+        ServerError('Project not found', status=404),
+        {'url': 'url', 'status': 'ok'},
+        {'url': 'url', 'status': 'ok'},
+    ]
+    testRun = TestRun(name='name', imageBase64='aW1hZ2U=')
+
+    multipart_vrt._submitTestResult(testRun)
+    multipart_vrt._submitTestResult(testRun)
+
+    urls = [call[0][0] for call in mock_request.call_args_list]
+    assert urls == [
+        f'{CONFIG.apiUrl}/test-runs/multipart',
+        f'{CONFIG.apiUrl}/test-runs',
+        f'{CONFIG.apiUrl}/test-runs',
+    ]
+    assert 'falling back to JSON' in caplog.text
+
+
+def test__submitTestResults__multipart_raises_other_errors(multipart_vrt, mock_request):
+    mock_request.side_effect = ServerError('Unauthorized', status=401)
+
+    with pytest.raises(ServerError, match='Unauthorized'):
+        multipart_vrt._submitTestResult(TestRun(name='name', imageBase64='aW1hZ2U='))
+
+    assert multipart_vrt._multipartSupported
+
+
+def test__http_request__sends_files(mocker):
+    post = mocker.patch('requests.post')
+    response = post.return_value = mocker.Mock()
+    response.status_code = 201
+    response.json.return_value = {}
+    files = {'image': ('image.png', b'image', 'image/png')}
+
+    _http_request('url', 'post', {'1': '2'}, {2: '3'}, files=files)
+
+    post.assert_called_once_with('url', data={'1': '2'}, files=files, headers={2: '3'})
+
+
+def test__submitTestResults__encodes_image_bytes(vrt, mock_request):
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    mock_request.return_value = {'url': 'url', 'status': 'ok'}
+
+    vrt._submitTestResult(TestRun(name='name', imageBytes=memoryview(b'image')))
+
+    data = mock_request.call_args[0][2]
+    assert data.json() == {
+        'name': 'name',
+        'imageBase64': 'aW1hZ2U=',
+        'buildId': '1312',
+        'projectId': 'asd',
+        'branchName': CONFIG.branchName,
+    }
+
+
+def test__submitTestResults__multipart_reads_image_path(multipart_vrt, mock_request, tmpdir):
+    p = tmpdir.join('image.png')
+    p.write_binary(b'image')
+    mock_request.return_value = {'url': 'url', 'status': 'ok'}
+
+    multipart_vrt._submitTestResult(TestRun(name='name', imagePath=str(p)))
+
+    assert mock_request.call_args[1]['files'] == {'image': ('image.png', b'image', 'image/png')}
+
+
+def test__track__skips_upload_of_cached_image(tmpdir, mocker):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'cachePath': str(tmpdir.join('cache.db'))}))
+    response = TestRunResponse(url='url', imageName='imageName', status=TestRunStatus.OK)
+    vrt._submitTestResult = mocker.Mock(return_value=response)
+    test_run = TestRun(name='name', imageBytes=b'image')
+
+    first = vrt.track(test_run)
+    second = vrt.track(test_run)
+    vrt.track(TestRun(name='name', imageBytes=b'changed image'))
+
+    assert not first.cached
+    assert second.cached
+    assert second.testRunResponse == response
+    assert second.imageUrl == f'{CONFIG.apiUrl}/imageName'
+    assert vrt._submitTestResult.call_count == 2
+
+
+def test__track__uploads_unapproved_cached_image(tmpdir, mocker):
+    vrt = VisualRegressionTracker(Config(**{
+        **CONFIG.__dict__,
+        'cachePath': str(tmpdir.join('cache.db')),
+        'enableSoftAssert': True,
+    }))
+    vrt._submitTestResult = mocker.Mock(return_value=TestRunResponse(url='url', status=TestRunStatus.NEW))
+    test_run = TestRun(name='name', imageBytes=b'image')
+
+    vrt.track(test_run)
+    vrt.track(test_run)
+
+    assert vrt._submitTestResult.call_count == 2
+
+
+@pytest.fixture
+def local_diff_vrt(tmpdir, mocker):
+    mocker.patch('visual_regression_tracker.cache._image_digest', side_effect=lambda test: str(test.imageBytes))
+    vrt = VisualRegressionTracker(Config(**{
+        **CONFIG.__dict__,
+        'cachePath': str(tmpdir.join('cache.db')),
+        'enableLocalDiff': True,
+        'enableSoftAssert': True,
+    }))
+    yield vrt
+
+
+def test__track__downloads_changed_baseline(local_diff_vrt, mocker):
+    get = mocker.patch('visual_regression_tracker.visualRegressionTracker._http_get', return_value=b'baseline')
+    local_diff_vrt._submitTestResult = mocker.Mock(side_effect=[
+        TestRunResponse(url='url', status=TestRunStatus.NEW),
+        TestRunResponse(url='url', status=TestRunStatus.OK, baselineName='baseline.png'),
+        TestRunResponse(url='url', status=TestRunStatus.OK, baselineName='baseline.png'),
+    ])
+    mocker.patch('visual_regression_tracker.visualRegressionTracker._predict', return_value=(None, None))
+
+    for image in (b'1', b'2', b'3'):
+        local_diff_vrt.track(TestRun(name='name', imageBytes=image))
+
+    get.assert_called_once_with(
+        f'{CONFIG.apiUrl}/baseline.png',
+        local_diff_vrt.headers,
+        session=mocker.ANY,
+        retry=local_diff_vrt._retry,
+        breaker=local_diff_vrt._breaker,
+    )
+
+
+def test__track__logs_failed_baseline_download(local_diff_vrt, mocker, caplog):
+    mocker.patch('visual_regression_tracker.visualRegressionTracker._http_get', side_effect=ServerError('Failed'))
+    response = TestRunResponse(url='url', status=TestRunStatus.OK, baselineName='baseline.png')
+    local_diff_vrt._submitTestResult = mocker.Mock(return_value=response)
+
+    result = local_diff_vrt.track(TestRun(name='name', imageBytes=b'image'))
+
+    assert result.testRunResponse is response
+    assert 'Failed to download baseline baseline.png for the local diff: Failed' in caplog.text
+
+
+@pytest.mark.parametrize('status, cached', [
+    (TestRunStatus.OK, True),
+    (TestRunStatus.UNRESOLVED, False),
+])
+def test__track__uses_local_diff(local_diff_vrt, mocker, status, cached):
+    localDiff = LocalDiff(diffPercent=0.5, status=status)
+    lastResponse = TestRunResponse(url='url', status=TestRunStatus.OK)
+    predict = mocker.patch(
+        'visual_regression_tracker.visualRegressionTracker._predict',
+        return_value=(localDiff, lastResponse if cached else None))
+    local_diff_vrt._submitTestResult = mocker.Mock(return_value=TestRunResponse(url='url', status=status))
+
+    result = local_diff_vrt.track(TestRun(name='name'))
+
+    predict.assert_called_once()
+    assert result.localDiff == localDiff
+    assert result.cached == cached
+    assert local_diff_vrt._submitTestResult.call_count == (0 if cached else 1)
+
+
+def test__track__recompresses_png(mocker, png_factory, png_image_data):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'pngCompressionLevel': 9}))
+    vrt._submitTestResult = mocker.Mock(return_value=TestRunResponse(url='url', status=TestRunStatus.OK))
+    original = png_factory()
+
+    result = vrt.track(TestRun(name='name', imageBase64=base64.b64encode(original).decode('ascii')))
+
+    submitted = vrt._submitTestResult.call_args[0][0]
+    assert submitted.name == 'name'
+    assert submitted.imageBase64 is None
+    assert png_image_data(submitted.imageBytes) == png_image_data(original)
+    assert result.recompression.originalSize == len(original)
+    assert result.recompression.size == len(submitted.imageBytes) < len(original)
+    assert result.recompression.seconds > 0
+
+
+@pytest.mark.parametrize('level, image', [
+    (None, b'\x89PNG\r\n\x1a\n'),
+    (9, b'\xff\xd8\xff\xe0 jpeg'),
+])
+def test__track__skips_recompression(mocker, level, image):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'pngCompressionLevel': level}))
+    vrt._submitTestResult = mocker.Mock(return_value=TestRunResponse(url='url', status=TestRunStatus.OK))
+    test_run = TestRun(name='name', imageBytes=image)
+
+    result = vrt.track(test_run)
+
+    vrt._submitTestResult.assert_called_once_with(test_run, mocker.ANY)
+    assert result.recompression is None
+
+
+def mock_response(mocker, status_code, body=None, headers=None):
+    response = mocker.Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    if isinstance(body, Exception):
+        response.json.side_effect = body
+        response.text = 'Bad Gateway'
+    else:
+        response.json.return_value = body
+    return response
+
+
+@pytest.fixture
+def no_sleep(mocker):
+    yield mocker.patch('time.sleep')
+
+
+def test__http_request__retries_rejected_post(mocker, no_sleep):
+    post = mocker.patch('requests.post', side_effect=[
+        mock_response(mocker, 503, {}, {'Retry-After': '2'}),
+        mock_response(mocker, 429, {}),
+        mock_response(mocker, 201, {'id': '1'}),
+    ])
+
+    actual = _http_request('url', 'post', {'1': 2}, {2: '3'}, retry=RetryPolicy(maxAttempts=3))
+
+    assert actual == {'id': '1'}
+    assert post.call_count == 3
+    keys = {call[1]['headers']['Idempotency-Key'] for call in post.call_args_list}
+    assert len(keys) == 1
+    assert no_sleep.call_args_list[0] == mocker.call(2.0)
+
+
+@pytest.mark.parametrize('status_code', [500, 502, 504])
+def test__http_request__does_not_retry_post_that_may_be_processed(mocker, no_sleep, status_code):
+    post = mocker.patch('requests.post', return_value=mock_response(mocker, status_code, {}))
+
+    with pytest.raises(ServerError) as exc_info:
+        _http_request('url', 'post', {}, {}, retry=RetryPolicy(maxAttempts=3))
+
+    assert exc_info.value.status == status_code
+    post.assert_called_once()
+
+
+def test__http_request__retries_idempotent_patch(mocker, no_sleep):
+    patch = mocker.patch('requests.patch', side_effect=[
+        mock_response(mocker, 502, ValueError('no json')),
+        requests.exceptions.ReadTimeout('timeout'),
+        mock_response(mocker, 200, {}),
+    ])
+
+    _http_request('url', 'patch', {}, {}, retry=RetryPolicy(maxAttempts=3))
+
+    assert patch.call_count == 3
+    assert 'Idempotency-Key' not in patch.call_args[1]['headers']
+
+
+def test__http_request__retries_post_not_sent(mocker, no_sleep):
+    post = mocker.patch('requests.post', side_effect=[
+        requests.exceptions.ConnectTimeout('timeout'),
+        requests.exceptions.ConnectionError(
+            urllib3.exceptions.MaxRetryError(None, 'url', urllib3.exceptions.NewConnectionError(None, 'refused'))),
+        mock_response(mocker, 201, {}),
+    ])
+
+    _http_request('url', 'post', {}, {}, retry=RetryPolicy(maxAttempts=3))
+
+    assert post.call_count == 3
+
+
+def test__http_request__does_not_retry_post_after_disconnect(mocker, no_sleep):
+    post = mocker.patch('requests.post', side_effect=requests.exceptions.ConnectionError('Connection aborted.'))
+
+    with pytest.raises(ServerError, match='Connection aborted'):
+        _http_request('url', 'post', {}, {}, retry=RetryPolicy(maxAttempts=3))
+
+    post.assert_called_once()
+
+
+def test__http_request__gives_up_after_max_attempts(mocker, no_sleep):
+    post = mocker.patch('requests.post', return_value=mock_response(mocker, 503, ValueError('no json')))
+
+    with pytest.raises(ServerError, match='Bad Gateway'):
+        _http_request('url', 'post', {}, {}, retry=RetryPolicy(maxAttempts=3))
+
+    assert post.call_count == 3
+
+
+def test__http_request__raises_on_invalid_json(mocker):
+    mocker.patch('requests.post', return_value=mock_response(mocker, 200, ValueError('no json')))
+
+    with pytest.raises(ServerError, match='Invalid response from server: Bad Gateway'):
+        _http_request('url', 'post', {}, {})
+
+
+def test__http_request__fails_fast_when_circuit_is_open(mocker, no_sleep):
+    post = mocker.patch('requests.post', return_value=mock_response(mocker, 503, {}))
+    breaker = CircuitBreaker(failureThreshold=2)
+
+    with pytest.raises(CircuitOpenError):
+        _http_request('url', 'post', {}, {}, retry=RetryPolicy(maxAttempts=5), breaker=breaker)
+    with pytest.raises(CircuitOpenError):
+        _http_request('url', 'post', {}, {}, breaker=breaker)
+
+    assert post.call_count == 2
+
+
+def test__http_request__trial_failing_otherwise_reopens_circuit(mocker, no_sleep):
+    monotonic = mocker.patch('time.monotonic', return_value=100)
+    post = mocker.patch('requests.post', side_effect=requests.exceptions.ConnectionError('refused'))
+    breaker = CircuitBreaker(failureThreshold=1, resetTimeout=30)
+    with pytest.raises(ServerError):
+        _http_request('url', 'post', {}, {}, breaker=breaker)
+
+    monotonic.return_value = 131
+    post.side_effect = requests.exceptions.ChunkedEncodingError('broken')
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        _http_request('url', 'post', {}, {}, breaker=breaker)
+    with pytest.raises(CircuitOpenError):
+        _http_request('url', 'post', {}, {}, breaker=breaker)
+
+    monotonic.return_value = 162
+    post.side_effect = None
+    post.return_value = mock_response(mocker, 201, {'id': 'id'})
+    assert _http_request('url', 'post', {}, {}, breaker=breaker) == {'id': 'id'}
+    assert not breaker.isOpen
+
+
+def test__track__attaches_timings(vrt, mock_request):
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    mock_request.return_value = {'url': 'url', 'status': 'ok', 'imageName': 'imageName'}
+
+    result = vrt.track(TestRun(name='name', imageBytes=b'image'))
+
+    assert set(result.timings.phases) == {'serialize', 'encode', 'request', 'parse'}
+    assert result.timings.bytes == {'upload': len('aW1hZ2U=')}
+    assert result.timings.total >= sum(result.timings.phases.values())
+
+
+def test__track__adds_to_given_timings(vrt, mock_request):
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    mock_request.return_value = {'url': 'url', 'status': 'ok', 'imageName': 'imageName'}
+    timings = Timings(phases={'screenshot': 1.5})
+
+    result = vrt.track(TestRun(name='name', imageBase64='image'), timings=timings)
+
+    assert result.timings is timings
+    assert timings.phases['screenshot'] == 1.5
+    assert 'request' in timings.phases
+
+
+def test__track__notifies_listeners(vrt, mock_request, mocker):
+    vrt.config.enableSoftAssert = False
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    listener = mocker.Mock()
+    vrt.addListener(listener)
+    test_run = TestRun(name='name', imageBase64='image')
+
+    mock_request.return_value = {'url': 'url', 'status': 'ok', 'imageName': 'imageName'}
+    result = vrt.track(test_run)
+    mock_request.return_value = {'url': 'url', 'status': 'unresolved', 'imageName': 'imageName'}
+    with pytest.raises(TestRunError):
+        vrt.track(test_run)
+    vrt.removeListener(listener)
+    mock_request.return_value = {'url': 'url', 'status': 'ok', 'imageName': 'imageName'}
+    vrt.track(test_run)
+
+    assert listener.call_args_list == [
+        mocker.call(test_run, result.timings, result),
+        mocker.call(test_run, mocker.ANY, None),
+    ]
+    assert 'request' in listener.call_args[0][1].phases
+
+
+def test__track__times_cache_hits(mocker, tmpdir):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'cachePath': str(tmpdir / 'cache.db')}))
+    vrt._submitTestResult = mocker.Mock(return_value=TestRunResponse(url='url', status=TestRunStatus.OK))
+
+    vrt.track(TestRun(name='name', imageBytes=b'image'))
+    result = vrt.track(TestRun(name='name', imageBytes=b'image'))
+
+    assert result.cached
+    assert set(result.timings.phases) == {'cache'}
+
+
+def test__start__shares_build(mock_request, tmpdir):
+    config = Config(**{**CONFIG.__dict__, 'shareBuild': True, 'sharedBuildPath': str(tmpdir / 'build.json')})
+    first, second = VisualRegressionTracker(config), VisualRegressionTracker(config)
+    mock_request.return_value = {'id': '1312', 'projectId': 'asd'}
+
+    first.start()
+    second.start()
+    assert (second.buildId, second.projectId) == ('1312', 'asd')
+    assert [call[0][0] for call in mock_request.call_args_list] == [f'{CONFIG.apiUrl}/builds']
+
+    first.stop()
+    assert mock_request.call_count == 1
+    second.stop()
+    assert mock_request.call_args[0][0] == f'{CONFIG.apiUrl}/builds/1312'
+
+
+def test__track__spools_test_runs(mock_request, tmpdir):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'spoolPath': str(tmpdir / 'spool.db')}))
+
+    with vrt:
+        result = vrt.track(TestRun(name='name', imageBytes=b'image'))
+        future = vrt.trackNowait(TestRun(name='other', imageBytes=b'image'))
+
+    assert result.spooled
+    assert result.testRunResponse is None
+    assert set(result.timings.phases) == {'spool'}
+    assert future.result().spooled
+    mock_request.assert_not_called()
+    with pytest.raises(VisualRegressionTrackerError):
+        vrt.track(TestRun(name='name', imageBytes=b'image'))
+
+
+@pytest.mark.parametrize('image', [
+    {'imageBytes': bytes(range(256)) * 1000},
+    {'imageBytes': memoryview(b'image')},
+    {'imageBase64': 'aW1hZ2U='},
+    {'imageBytes': b''},
+])
+def test__JsonBody__streams_json_document(image):
+    test = TestRun(name='name', **image)
+    expected = {'name': 'name', 'imageBase64': base64.b64encode(bytes(image.get('imageBytes', b'image'))).decode()}
+
+    body = _JsonBody({'name': 'name'}, test)
+
+    assert json.loads(b''.join(body)) == expected
+    assert b''.join(body) == bytes(body)
+    assert len(body) == len(bytes(body))
+    assert max(len(chunk) for chunk in body) <= _JsonBody.CHUNK_SIZE * 4 // 3
+
+
+@pytest.mark.parametrize('imageBase64', [
+    base64.encodebytes(bytes(range(256)) * 100).decode(),
+    'not "base64" \\ é',
+])
+def test__JsonBody__escapes_image_base64(imageBase64):
+    body = _JsonBody({'name': 'name'}, TestRun(name='name', imageBase64=imageBase64))
+
+    assert body.json() == {'name': 'name', 'imageBase64': imageBase64}
+    assert len(body) == len(bytes(body))
+
+
+def test__JsonBody__reads_image_path(tmpdir):
+    p = tmpdir.join('image.png')
+    p.write_binary(b'image')
+
+    body = _JsonBody({}, TestRun(imagePath=str(p)))
+
+    assert body.json() == {'imageBase64': 'aW1hZ2U='}
+    assert len(body) == len(bytes(body))
+
+
+def test__JsonBody__without_image():
+    body = _JsonBody({'name': 'name', 'ignoreAreas': [{'x': 1}]})
+
+    assert body.json() == {'name': 'name', 'ignoreAreas': [{'x': 1}]}
+    assert len(body) == len(bytes(body))
+
+
+def test__http_request__streams_json_body(mocker):
+    post = mocker.patch('requests.post')
+    response = post.return_value = mocker.Mock()
+    response.status_code = 201
+    response.json.return_value = {}
+    body = _JsonBody({'1': 2})
+
+    _http_request('url', 'post', body, {2: '3'})
+
+    post.assert_called_once_with('url', data=body, headers={2: '3', 'Content-Type': 'application/json'})
+
+
+class DrainingAdapter(requests.adapters.BaseAdapter):
+    """Reads request bodies like a connection would, without a server."""
+
+    def send(self, request, **kwargs):
+        for _ in request.body:
+            pass
+        response = requests.Response()
+        response.status_code = 201
+        response._content = json.dumps({'url': 'url', 'status': 'ok'}).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def test__track__bounds_peak_memory(vrt):
+    image = bytes(16 * 1024 * 1024)
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    vrt._getSession().mount('http://', DrainingAdapter())
+    test = TestRun(name='name', imageBytes=image)
+
+    tracemalloc.start()
+    try:
+        vrt.track(test)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Without streaming, the base64 string and the JSON document of the image
+    # were in memory at the same time, about four times the image size.
+    assert peak < 2 * 1024 * 1024
+
+
+def test__track__limits_bytes_in_flight(mocker):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'maxBytesInFlight': 10, 'maxConcurrency': 4}))
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    inFlight = []
+    maxInFlight = []
+    lock = threading.Lock()
+
+    def submit(test, timings):
+        with lock:
+            inFlight.append(test)
+            maxInFlight.append(len(inFlight))
+        time.sleep(0.01)
+        with lock:
+            inFlight.remove(test)
+        return TestRunResponse(url='url', status=TestRunStatus.OK)
+
+    vrt._submitTestResult = submit
+
+    results = vrt.trackMany([TestRun(name=f'name {i}', imageBytes=b'image') for i in range(8)])
+
+    assert max(maxInFlight) == 2
+    assert all('backpressure' in result.timings.phases for result in results)
+
+
+def test__track__adapts_concurrency_to_overload(mocker):
+    vrt = VisualRegressionTracker(Config(**{
+        **CONFIG.__dict__, 'adaptiveConcurrency': True, 'minConcurrency': 1, 'maxConcurrency': 8,
+        'retryMaxAttempts': 1,
+    }))
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    overloaded = threading.Event()
+
+    def request(url, method, data, headers, **kwargs):
+        if overloaded.is_set():
+            raise ServerError('Too many requests', status=429)
+        return {'id': 'id', 'imageName': 'imageName', 'status': 'ok'}
+
+    mocker.patch('visual_regression_tracker.visualRegressionTracker._http_request', side_effect=request)
+
+    vrt.trackMany([TestRun(name=f'name {i}', imageBytes=b'image') for i in range(7)], maxConcurrency=1)
+    assert vrt.limiter.limit == 8
+    assert vrt.limiter.latency is not None
+
+    overloaded.set()
+    with pytest.raises(ServerError):
+        vrt.track(TestRun(name='name', imageBytes=b'image'))
+
+    assert vrt.limiter.limit == 4
+    assert vrt.limiter.inFlight == 0
+
+
+def test__track__does_not_adapt_concurrency_to_invalid_requests(mocker):
+    vrt = VisualRegressionTracker(Config(**{**CONFIG.__dict__, 'adaptiveConcurrency': True, 'maxConcurrency': 8}))
+    vrt.buildId = '1312'
+    vrt.projectId = 'asd'
+    vrt.limiter._limit = 4.0
+    mocker.patch(
+        'visual_regression_tracker.visualRegressionTracker._http_request',
+        side_effect=ServerError('Bad request', status=400))
+
+    with pytest.raises(ServerError):
+        vrt.track(TestRun(name='name', imageBytes=b'image'))
+
+    assert vrt.limiter.limit == 4
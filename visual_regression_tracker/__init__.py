@@ -15,17 +15,51 @@ Basic usage:
     with VisualRegressionTracker(config) as vrt:
         vrt.track(TestRun(
             name='Image name',
-            imageBase64=image,
+            imageBytes=image,
         ))
 """
 
+import importlib
+import sys
+
 from .types import Build, IgnoreArea, TestRun, TestRunResponse, TestRunStatus
-from .exceptions import VisualRegressionTrackerError, ServerError, TestRunError, MissingConfigurationError
+from .exceptions import \
+    VisualRegressionTrackerError, ServerError, CircuitOpenError, TestRunError, AggregateTrackError, \
+    MissingConfigurationError
 from .config import Config
-from .visualRegressionTracker import VisualRegressionTracker
+from .instrumentation import Timings
 
 __all__ = [
     'Config', 'Build', 'IgnoreArea', 'TestRun', 'TestRunResponse', 'TestRunStatus',
-    'VisualRegressionTrackerError', 'ServerError', 'TestRunError', 'MissingConfigurationError',
-    'VisualRegressionTracker',
+    'VisualRegressionTrackerError', 'ServerError', 'CircuitOpenError', 'TestRunError', 'AggregateTrackError',
+    'MissingConfigurationError', 'Timings',
+    'VisualRegressionTracker', 'AsyncVisualRegressionTracker',
 ]
+
+# Trackers are imported on first use, so that importing the package does not
+# pay for importing requests or httpx.
+_LAZY_EXPORTS = {
+    'VisualRegressionTracker': '.visualRegressionTracker',
+    'AsyncVisualRegressionTracker': '.asyncVisualRegressionTracker',
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ before Python 3.7
+    from .visualRegressionTracker import VisualRegressionTracker
+    try:
+        from .asyncVisualRegressionTracker import AsyncVisualRegressionTracker
+    except ImportError:  # httpx is optional, like on first use with later versions
+        pass
@@ -0,0 +1,448 @@
+import asyncio
+import time
+import typing
+
+import httpx
+
+from .types import \
+    Build, TestRun, TestRunResponse, TestRunResult, Recompression, \
+    _from_dict, _has_image, _image_bytes, _image_size
+from .exceptions import ServerError, VisualRegressionTrackerError
+from .config import Config
+from .cache import ImageCache, _lookup, _predict
+from .concurrency import AsyncAdaptiveLimiter, AsyncByteBudget, _run_blocking
+from . import png
+from .instrumentation import Listeners, Timings
+from .sharedBuild import _build_key, _shared_build
+from .spool import Spool
+from .retry import CircuitBreaker, RetryPolicy, _is_server_failure, _idempotency_headers
+from .visualRegressionTracker import \
+    MULTIPART_UNSUPPORTED_STATUSES, \
+    _build_data, _test_run_data, _test_run_multipart, _parse_test_run_response, \
+    _track_result, _check_response, _log_multipart_fallback, _log_baseline_failure, \
+    _with_image, _log_recompression, _json_body, _JsonBody, _is_overload
+
+
+class AsyncVisualRegressionTracker:
+    config: Config = None
+    buildId: str = None
+    projectId: str = None
+    headers: dict = None
+    limiter: AsyncAdaptiveLimiter = None
+
+    def __init__(self, config: Config = None):
+        """
+        Creates a new AsyncVisualRegressionTracker
+
+        Same as VisualRegressionTracker, but all requests to the backend are
+        awaitable and share a non-blocking connection pool.
+
+        :param config: The configuration to use.
+        """
+        self.config = config or Config.default()
+        self.headers = {
+            'apiKey': self.config.apiKey,
+            'project': self.config.project
+        }
+        self.config.check_complete()
+        self._retry = RetryPolicy(
+            maxAttempts=self.config.retryMaxAttempts,
+            backoff=self.config.retryBackoff,
+            maxBackoff=self.config.retryMaxBackoff,
+        )
+        self._breaker = CircuitBreaker(
+            failureThreshold=self.config.circuitBreakerThreshold,
+            resetTimeout=self.config.circuitBreakerResetTimeout,
+        )
+        self._client = None
+        self._multipartSupported = True
+        self._cache = None
+        self._listeners = Listeners()
+        self._sharedBuild = _shared_build(self.config.sharedBuildPath) if self.config.shareBuild else None
+        self._spool = None
+        self._spoolBuild = None
+        self._byteBudget = AsyncByteBudget(self.config.maxBytesInFlight) if self.config.maxBytesInFlight else None
+        self.limiter = AsyncAdaptiveLimiter(
+            self.config.minConcurrency, self.config.maxConcurrency) if self.config.adaptiveConcurrency else None
+
+    def addListener(self, listener: typing.Callable):
+        """
+        Registers a callback that is notified after every track call.
+
+        :param listener: Called with the TestRun, its Timings and the
+            TestRunResult, or None if tracking failed.
+        """
+        self._listeners.add(listener)
+
+    def removeListener(self, listener: typing.Callable):
+        self._listeners.remove(listener)
+
+    def _isStarted(self):
+        return self._spoolBuild is not None or (self.buildId is not None and self.projectId is not None)
+
+    def _getClient(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = _create_client(self.config)
+        return self._client
+
+    def _getCache(self) -> ImageCache:
+        """Returns the local image cache, or None if it is disabled."""
+        if self._cache is None and self.config.cachePath:
+            self._cache = ImageCache(self.config.cachePath, self.config.cacheMaxEntries)
+        return self._cache
+
+    def _closeCache(self):
+        if self._cache is not None:
+            self._cache.close()
+        self._cache = None
+
+    def _closeSpool(self):
+        if self._spool is not None:
+            self._spool.close()
+        self._spool = None
+        self._spoolBuild = None
+        self._byteBudget = AsyncByteBudget(self.config.maxBytesInFlight) if self.config.maxBytesInFlight else None
+
+    async def _recompress(self, test: TestRun):
+        """
+        Re-compresses a PNG image with Config.pngCompressionLevel in a thread, as zlib releases the GIL.
+
+        The event loop keeps running meanwhile, so other pages can be captured.
+        """
+        if self.config.pngCompressionLevel is None or not _has_image(test):
+            return test, None
+        image = await _run_blocking(_image_bytes, test)
+        if not png.is_png(image):
+            return test, None
+
+        start = time.perf_counter()
+        compressed = await _run_blocking(png.recompress, image, self.config.pngCompressionLevel)
+        recompression = Recompression(len(image), len(compressed), time.perf_counter() - start)
+        _log_recompression(test, recompression)
+        return _with_image(test, compressed), recompression
+
+    async def _closeClient(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+
+    async def start(self):
+        # Files and SQLite databases are accessed in threads, like in track().
+        if self.config.spoolPath:
+            # Offline, the build is created on the server by replay().
+            self._spool = await _run_blocking(Spool, self.config.spoolPath)
+            self._spoolBuild = await _run_blocking(
+                self._spool.addBuild, self.config.ciBuildId, self.config.branchName, self.config.project)
+            return
+
+        if self._sharedBuild is None:
+            build = await self._createBuild()
+            self.buildId = build.id
+            self.projectId = build.projectId
+            return
+
+        key = _build_key(self.config.apiUrl, self.config.project, self.config.branchName, self.config.ciBuildId)
+        # Entered by hand, as waiting for the lock on the state file blocks.
+        attach = self._sharedBuild.attach(key)
+        state = await _run_blocking(attach.__enter__)
+        try:
+            if state.buildId is None:
+                build = await self._createBuild()
+                state.buildId = build.id
+                state.projectId = build.projectId
+        except BaseException as e:
+            if not await _run_blocking(attach.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await _run_blocking(attach.__exit__, None, None, None)
+        self.buildId = state.buildId
+        self.projectId = state.projectId
+
+    async def _createBuild(self) -> Build:
+        result = await _http_request_async(
+            f'{self.config.apiUrl}/builds',
+            'post',
+            _build_data(self.config),
+            self.headers,
+            client=self._getClient(),
+            retry=self._retry,
+            breaker=self._breaker,
+        )
+        return _from_dict(result, Build)
+
+    async def stop(self):
+        if not self._isStarted():
+            raise VisualRegressionTrackerError(
+                "Visual Regression Tracker has not been started")
+
+        try:
+            if self._spoolBuild is not None:
+                await _run_blocking(self._spool.finishBuild, self._spoolBuild)
+            # Only the last process stops a shared build.
+            elif self._sharedBuild is None or await _run_blocking(self._sharedBuild.detach):
+                await _http_request_async(
+                    f'{self.config.apiUrl}/builds/{self.buildId}',
+                    'patch',
+                    data={},
+                    headers=self.headers,
+                    client=self._getClient(),
+                    retry=self._retry,
+                    breaker=self._breaker,
+                )
+        finally:
+            await self._closeClient()
+            self._closeCache()
+            self._closeSpool()
+        self.buildId = None
+        self.projectId = None
+
+    async def __aenter__(self):
+        """Start the build."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        """Stop the build."""
+        await self.stop()
+
+    async def _submitTestResult(self, test: TestRun, timings: Timings = None) -> TestRunResponse:
+        if not self._isStarted():
+            raise VisualRegressionTrackerError(
+                "Visual Regression Tracker has not been started")
+        timings = timings or Timings()
+
+        if self.config.multipartUpload and self._multipartSupported:
+            fields, files = await _run_blocking(
+                _test_run_multipart, test, self.config, self.buildId, self.projectId, timings)
+            try:
+                with timings.phase('request'):
+                    result = await _http_request_async(
+                        f'{self.config.apiUrl}/test-runs/multipart',
+                        'post',
+                        fields,
+                        self.headers,
+                        client=self._getClient(),
+                        retry=self._retry,
+                        breaker=self._breaker,
+                        files=files,
+                    )
+            except ServerError as e:
+                if e.status not in MULTIPART_UNSUPPORTED_STATUSES:
+                    raise
+                _log_multipart_fallback(e)
+                self._multipartSupported = False
+            else:
+                with timings.phase('parse'):
+                    return _parse_test_run_response(result)
+
+        data = _test_run_data(test, self.config, self.buildId, self.projectId, timings)
+        with timings.phase('request'):
+            result = await _http_request_async(
+                f'{self.config.apiUrl}/test-runs',
+                'post',
+                data,
+                self.headers,
+                client=self._getClient(),
+                retry=self._retry,
+                breaker=self._breaker,
+            )
+        with timings.phase('parse'):
+            return _parse_test_run_response(result)
+
+    async def track(self, test: TestRun, timings: Timings = None) -> TestRunResult:
+        """
+        Tracks a test run.
+
+        :param test: The test run to track.
+        :param timings: Timings to add the phases of this call to, e.g. with
+            the time spent taking the screenshot.
+        :return: The TestRunResult, with the Timings of this call.
+        """
+        timings = timings or Timings()
+        result = None
+        try:
+            result = await self._track(test, timings)
+            return result
+        finally:
+            timings.finish()
+            self._listeners.emit(test, timings, result)
+
+    async def _track(self, test: TestRun, timings: Timings) -> TestRunResult:
+        if self._spoolBuild is not None:
+            with timings.phase('spool'):
+                await _run_blocking(self._spool.append, self._spoolBuild, test)
+            result = TestRunResult(None, self.config.apiUrl, spooled=True)
+            result.timings = timings
+            return result
+
+        cache = self._getCache()
+        localDiff = None
+        if cache is not None:
+            with timings.phase('cache'):
+                key, digest, cached = await _run_blocking(
+                    _lookup, cache, test, self.config.project, self.config.branchName)
+            if cached is None and self.config.enableLocalDiff:
+                with timings.phase('localDiff'):
+                    localDiff, cached = await _run_blocking(_predict, cache, key, test)
+            if cached is not None:
+                result = TestRunResult(cached, self.config.apiUrl, cached=True)
+                result.localDiff = localDiff
+                result.timings = timings
+                return result
+
+        # Holds the size of the image in the Config.maxBytesInFlight budget.
+        size = _image_size(test) if self._byteBudget is not None and _has_image(test) else 0
+        if size:
+            with timings.phase('backpressure'):
+                await self._byteBudget.acquire(size)
+        try:
+            submitted, recompression = await self._recompress(test)
+            if recompression is not None:
+                timings.phases['recompress'] = recompression.seconds
+            response = await self._submitTestResultLimited(submitted, timings)
+            del submitted
+        finally:
+            if size:
+                await self._byteBudget.release(size)
+        if cache is not None:
+            await _run_blocking(cache.put, key, digest, response)
+            if self.config.enableLocalDiff:
+                with timings.phase('baseline'):
+                    await self._updateBaseline(cache, key, response)
+        result = _track_result(response, self.config)
+        result.localDiff = localDiff
+        result.recompression = recompression
+        result.timings = timings
+        return result
+
+    async def _submitTestResultLimited(self, test: TestRun, timings: Timings) -> TestRunResponse:
+        """Submits a test run within the adaptive concurrency limit, and reports the request's outcome to it."""
+        if self.limiter is None:
+            return await self._submitTestResult(test, timings)
+        with timings.phase('backpressure'):
+            await self.limiter.acquire()
+        latency, overloaded = None, False
+        try:
+            before = timings.phases.get('request', 0.0)
+            response = await self._submitTestResult(test, timings)
+            latency = timings.phases.get('request', 0.0) - before
+            return response
+        except ServerError as e:
+            overloaded = _is_overload(e)
+            raise
+        finally:
+            await self.limiter.release(latency, overloaded)
+
+    async def _updateBaseline(self, cache: ImageCache, key: str, response: TestRunResponse):
+        """Downloads the test run's baseline into the cache when it changed, logging failed downloads."""
+        if not response.baselineName:
+            return
+        baselineName, _ = await _run_blocking(cache.getBaseline, key)
+        if baselineName != response.baselineName:
+            try:
+                image = await _http_get_async(
+                    f'{self.config.apiUrl}/{response.baselineName}',
+                    self.headers,
+                    client=self._getClient(),
+                    retry=self._retry,
+                    breaker=self._breaker,
+                )
+            except ServerError as e:
+                _log_baseline_failure(response, e)
+                return
+            await _run_blocking(cache.putBaseline, key, response.baselineName, image)
+
+
+def _create_client(config: Config) -> httpx.AsyncClient:
+    if config.transport not in ('http1', 'http2'):
+        raise VisualRegressionTrackerError(f'Unknown transport {config.transport!r}, expected http1 or http2')
+    limits = httpx.Limits(
+        max_connections=config.httpPoolSize,
+        max_keepalive_connections=config.httpPoolSize if config.httpKeepAlive else 0,
+    )
+    http2 = config.transport == 'http2'
+    # Like Http2Session, plain http:// servers are spoken to with HTTP/2 directly.
+    http1 = not (http2 and config.apiUrl.startswith('http://'))
+    return httpx.AsyncClient(limits=limits, timeout=None, http1=http1, http2=http2)
+
+
+async def _http_request_async(
+        url: str,
+        method: str,
+        data: dict,
+        headers: dict,
+        client: httpx.AsyncClient,
+        files: dict = None,
+        retry: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+) -> dict:
+    headers = _idempotency_headers(headers, method, retry)
+    if files:
+        send = lambda: client.request(method.upper(), url, data=data, files=files, headers=headers)
+    elif isinstance(data, _JsonBody):
+        headers = {**headers, 'Content-Type': 'application/json', 'Content-Length': str(len(data))}
+        send = lambda: client.request(method.upper(), url, content=_stream(data), headers=headers)
+    else:
+        send = lambda: client.request(method.upper(), url, json=data, headers=headers)
+    response = await _send_async(send, method, retry, breaker)
+    return _check_response(response.status_code, _json_body(response))
+
+
+async def _stream(body: _JsonBody):
+    for chunk in body:
+        yield chunk
+
+
+async def _http_get_async(
+        url: str,
+        headers: dict,
+        client: httpx.AsyncClient,
+        retry: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+) -> bytes:
+    response = await _send_async(lambda: client.get(url, headers=headers), 'get', retry, breaker)
+    if response.status_code >= 400:
+        raise ServerError(f'Failed to download {url}', status=response.status_code)
+    return response.content
+
+
+async def _send_async(send, method: str, retry: RetryPolicy = None, breaker: CircuitBreaker = None) -> httpx.Response:
+    """Sends a request with send(), retrying failed attempts as allowed by the policy."""
+    retry = retry or RetryPolicy()
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            breaker.before()
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            if breaker is not None:
+                breaker.failure()
+            sent = not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            if not retry.shouldRetry(attempt, method, sent=sent):
+                raise ServerError(f'Request failed: {e}') from e
+            await asyncio.sleep(retry.delay(attempt))
+            continue
+        except asyncio.CancelledError:
+            # Says nothing about the server, and is an Exception before Python 3.8.
+            if breaker is not None:
+                breaker.abandon()
+            raise
+        except Exception:
+            if breaker is not None:
+                breaker.failure()
+            raise
+        except BaseException:
+            if breaker is not None:
+                breaker.abandon()
+            raise
+
+        if breaker is not None:
+            if _is_server_failure(response.status_code):
+                breaker.failure()
+            else:
+                breaker.success()
+        if not retry.shouldRetry(attempt, method, response.status_code):
+            return response
+        await asyncio.sleep(retry.delay(attempt, response.headers.get('Retry-After')))
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import typing
+
+from .types import TestRun, TestRunResponse, TestRunStatus, _image_buffer, _to_dict, _from_dict
+
+
+class ImageCache:
+    """
+    On-disk cache of the last image digest and server verdict per test run.
+
+    Entries are keyed by project, branch and the test run's name, os, browser,
+    viewport and device. The least recently used entries are evicted once
+    there are more than maxEntries.
+    """
+
+    def __init__(self, path: str, maxEntries: int = 1000):
+        """
+        Opens (or creates) the cache database
+
+        :param path: Path of the SQLite database file.
+        :param maxEntries: Max. number of entries to keep.
+        """
+        self.maxEntries = maxEntries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY,'
+                ' digest TEXT NOT NULL,'
+                ' response TEXT NOT NULL,'
+                ' lastUsed REAL NOT NULL'
+                ')'
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS entries_lastUsed ON entries (lastUsed)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS baselines ('
+                ' key TEXT PRIMARY KEY,'
+                ' baselineName TEXT NOT NULL,'
+                ' image BLOB NOT NULL'
+                ')'
+            )
+
+    def get(self, key: str, digest: str = None) -> typing.Optional[TestRunResponse]:
+        """Returns the cached response, if the image digest is unchanged or not given."""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT digest, response FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None or (digest is not None and row[0] != digest):
+                return None
+            self._connection.execute(
+                'UPDATE entries SET lastUsed = ? WHERE key = ?', (time.time(), key))
+        return _response_from_json(row[1])
+
+    def put(self, key: str, digest: str, response: TestRunResponse):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (key, digest, response, lastUsed) VALUES (?, ?, ?, ?)',
+                (key, digest, _response_to_json(response), time.time()))
+            self._connection.execute(
+                'DELETE FROM entries WHERE key NOT IN '
+                '(SELECT key FROM entries ORDER BY lastUsed DESC LIMIT ?)',
+                (self.maxEntries,))
+            self._connection.execute(
+                'DELETE FROM baselines WHERE key NOT IN (SELECT key FROM entries)')
+
+    def getBaseline(self, key: str) -> typing.Tuple[typing.Optional[str], typing.Optional[bytes]]:
+        """Returns the name and image of the last known baseline of a test run."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT baselineName, image FROM baselines WHERE key = ?', (key,)).fetchone()
+        return row if row is not None else (None, None)
+
+    def putBaseline(self, key: str, baselineName: str, image: bytes):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO baselines (key, baselineName, image) VALUES (?, ?, ?)',
+                (key, baselineName, image))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _lookup(cache: ImageCache, test: TestRun, project: str, branchName: str):
+    """
+    Looks up a test run in the cache.
+
+    :return: The cache key, the image digest and the cached response if the
+        image was approved before, otherwise None.
+    """
+    key = _cache_key(test, project, branchName)
+    digest = _image_digest(test)
+    response = cache.get(key, digest)
+    if response is not None and response.status != TestRunStatus.OK:
+        response = None
+    return key, digest, response
+
+
+def _predict(cache: ImageCache, key: str, test: TestRun):
+    """
+    Compares a test run with its last known baseline.
+
+    :return: The LocalDiff, or None without a known baseline, and the last
+        response if the test run is predicted to be OK.
+    """
+    from . import prediff
+
+    _, baseline = cache.getBaseline(key)
+    if baseline is None:
+        return None, None
+
+    localDiff = prediff.predict(test, baseline)
+    response = cache.get(key)
+    if localDiff.status != TestRunStatus.OK or response is None or response.status != TestRunStatus.OK:
+        response = None
+    return localDiff, response
+
+
+def _cache_key(test: TestRun, project: str, branchName: str) -> str:
+    return json.dumps([
+        project, branchName, test.name, test.os, test.browser, test.viewport, test.device,
+    ])
+
+
+def _image_digest(test: TestRun) -> str:
+    """Digest of the image and of the settings that influence its comparison."""
+    digest = hashlib.sha256()
+    with _image_buffer(test) as image:
+        digest.update(image)
+    digest.update(json.dumps([
+        test.diffTollerancePercent,
+        [_to_dict(area) for area in test.ignoreAreas or []],
+    ]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _response_to_json(response: TestRunResponse) -> str:
+    data = _to_dict(response)
+    data['status'] = response.status.value
+    return json.dumps(data)
+
+
+def _response_from_json(data: str) -> TestRunResponse:
+    result = json.loads(data)
+    result['status'] = TestRunStatus(result['status'])
+    return _from_dict(result, TestRunResponse)
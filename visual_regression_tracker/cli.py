@@ -0,0 +1,210 @@
+"""
+Command line interface, installed as `vrt`.
+
+    vrt upload DIRECTORY [--pattern PATTERN]
+    vrt replay SPOOL
+
+Both use the configuration of Config.default(), i.e. vrt.json or VRT_*
+environment variables.
+"""
+import argparse
+import dataclasses
+import os
+import re
+import sys
+import time
+import typing
+
+from .config import Config
+from .exceptions import VisualRegressionTrackerError
+from .types import TestRun, TestRunResult, TestRunStatus
+
+PATTERN_FIELDS = ('name', 'os', 'browser', 'viewport', 'device')
+DEFAULT_PATTERN = '{name}.png'
+
+EXIT_OK = 0
+EXIT_UNRESOLVED = 1
+EXIT_ERROR = 2
+
+
+def main(argv: typing.List[str] = None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_usage(sys.stderr)
+        return EXIT_ERROR
+    try:
+        return args.run(args)
+    except VisualRegressionTrackerError as e:
+        print('vrt:', *e.args, file=sys.stderr)
+        return EXIT_ERROR
+
+
+def _parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', help='path of the JSON config file, defaults to vrt.json')
+    common.add_argument('--max-concurrency', type=int, help='max. number of uploads in flight')
+
+    parser = argparse.ArgumentParser(prog='vrt', description='Visual Regression Tracker command line interface')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    upload = commands.add_parser(
+        'upload',
+        parents=[common],
+        help='upload a directory of images into a build',
+        description='Uploads every image in DIRECTORY that matches PATTERN as a test run of a new build. '
+                    'Exits with 1 if any test run is unresolved or failed.',
+    )
+    upload.add_argument('directory')
+    upload.add_argument(
+        '--pattern', default=DEFAULT_PATTERN,
+        help=f'path of the images relative to DIRECTORY, with the placeholders '
+             f'{", ".join("{" + field + "}" for field in PATTERN_FIELDS)}, '
+             f'default: {DEFAULT_PATTERN}')
+    upload.add_argument('--diff-tolerance', type=float, help='diff tolerance in percent')
+    upload.add_argument('--quiet', action='store_true', help='do not show progress')
+    upload.set_defaults(run=_upload)
+
+    replay = commands.add_parser(
+        'replay',
+        parents=[common],
+        help='upload the test runs of a spool',
+        description='Uploads the test runs spooled with Config.spoolPath. '
+                    'Exits with 1 if any test run is unresolved or failed.',
+    )
+    replay.add_argument('spool')
+    replay.set_defaults(run=_replay)
+    return parser
+
+
+def _config(args) -> Config:
+    config = Config.default(args.config)
+    if args.max_concurrency:
+        config.maxConcurrency = args.max_concurrency
+    # Unresolved test runs are reported at the end, instead of stopping the upload.
+    return dataclasses.replace(config, enableSoftAssert=True, spoolPath=None)
+
+
+def _upload(args) -> int:
+    from .visualRegressionTracker import VisualRegressionTracker
+
+    regex = _pattern_regex(args.pattern)
+    paths = list(_matching_paths(args.directory, regex))
+    if not paths:
+        print(f'vrt: no files matching {args.pattern} in {args.directory}', file=sys.stderr)
+        return EXIT_ERROR
+
+    sizes = {}
+
+    def tests():
+        for path, fields in paths:
+            sizes[path] = os.path.getsize(path)
+            yield TestRun(imagePath=path, diffTollerancePercent=args.diff_tolerance, **fields)
+
+    progress = Progress(len(paths), quiet=args.quiet)
+    with VisualRegressionTracker(_config(args)) as vrt:
+        for _, test, future in vrt._trackConcurrently(tests()):
+            if future.exception() is not None:
+                progress.failed(test, future.exception(), sizes[test.imagePath])
+            else:
+                progress.done(test, future.result(), sizes[test.imagePath])
+    return progress.report()
+
+
+def _replay(args) -> int:
+    from .spool import replay
+
+    start = time.perf_counter()
+    result = replay(args.spool, _config(args))
+    for error in result.errors:
+        print(f'Failed: {error}', file=sys.stderr)
+    print(
+        f'Uploaded {result.uploaded} test runs in {time.perf_counter() - start:.1f}s: '
+        f'{result.new} new, {result.unresolved} unresolved, {len(result.errors)} failed')
+    return EXIT_UNRESOLVED if result.unresolved or result.errors else EXIT_OK
+
+
+def _pattern_regex(pattern: str) -> typing.Pattern:
+    """
+    Converts a pattern like '{browser}/{viewport}/{name}.png' into a regex.
+
+    {name} may span directories, the other placeholders match one path segment.
+    """
+    parts = []
+    fields = set()
+    for literal, field in re.findall(r'([^{]*)(?:\{(\w*)\}|$)', pattern):
+        parts.append(re.escape(literal))
+        if not field:
+            continue
+        if field not in PATTERN_FIELDS or field in fields:
+            raise VisualRegressionTrackerError(f'Invalid placeholder {{{field}}} in pattern {pattern}')
+        fields.add(field)
+        parts.append(f'(?P<{field}>.+?)' if field == 'name' else f'(?P<{field}>[^/]+)')
+    if 'name' not in fields:
+        raise VisualRegressionTrackerError(f'Pattern {pattern} has no {{name}} placeholder')
+    return re.compile(''.join(parts))
+
+
+def _matching_paths(directory: str, regex: typing.Pattern) -> typing.Iterator[typing.Tuple[str, dict]]:
+    """Yields the path and the test run fields of the files in directory matching regex, sorted."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            match = regex.fullmatch(os.path.relpath(path, directory).replace(os.sep, '/'))
+            if match:
+                yield path, match.groupdict()
+
+
+class Progress:
+    """Counts completed uploads, and shows their progress and throughput on stderr."""
+
+    def __init__(self, total: int, quiet: bool = False, stream=None):
+        self.total = total
+        self.quiet = quiet
+        self.stream = stream or sys.stderr
+        self.completed = 0
+        self.bytes = 0
+        self.unresolved = []
+        self.new = 0
+        self.errors = []
+        self._start = time.perf_counter()
+
+    def done(self, test: TestRun, result: TestRunResult, size: int):
+        status = result.testRunResponse.status
+        if status == TestRunStatus.UNRESOLVED:
+            self.unresolved.append((test, result))
+        elif status == TestRunStatus.NEW:
+            self.new += 1
+        self._add(size)
+
+    def failed(self, test: TestRun, error: Exception, size: int):
+        self.errors.append((test, error))
+        self._add(size)
+
+    def _add(self, size: int):
+        self.completed += 1
+        self.bytes += size
+        if not self.quiet:
+            end = '\n' if self.completed == self.total or not self.stream.isatty() else ''
+            print(f'\r[{self.completed}/{self.total}] {self._throughput()}', end=end, file=self.stream, flush=True)
+
+    def _throughput(self) -> str:
+        seconds = max(time.perf_counter() - self._start, 1e-9)
+        return f'{self.completed / seconds:.1f} files/s, {self.bytes / seconds / 1e6:.1f} MB/s'
+
+    def report(self) -> int:
+        """Prints the summary, and returns the exit code."""
+        for test, error in self.errors:
+            print(f'Failed: {test.name}: {error}', file=sys.stderr)
+        for test, result in self.unresolved:
+            print(f'Unresolved: {test.name}: {result.testRunResponse.url}')
+        print(
+            f'Uploaded {self.completed} files ({self.bytes / 1e6:.1f} MB) in '
+            f'{time.perf_counter() - self._start:.1f}s, {self._throughput()}: '
+            f'{self.new} new, {len(self.unresolved)} unresolved, {len(self.errors)} failed')
+        return EXIT_UNRESOLVED if self.unresolved or self.errors else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
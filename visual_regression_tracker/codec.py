@@ -0,0 +1,290 @@
+"""
+Generated encoders and decoders for the dataclasses sent to and received from the server.
+
+dataclasses.asdict() deep-copies every value and dacite introspects the type
+hints on every call. Instead, registered classes get a plain function per
+class, generated once from their fields, which produces the same dicts and
+instances.
+
+Decoders check the types of values like dacite does, and raise the same
+dacite.WrongTypeError. Unlike with dacite, None is accepted for every field,
+as it is the default of the fields of the API classes.
+"""
+import collections.abc
+import copy
+import dataclasses
+import enum
+import sys
+import typing
+
+# Values that asdict() would return unchanged.
+_ATOMIC_TYPES = frozenset((type(None), bool, int, float, complex, str, bytes))
+
+_registered = set()
+_encoders = {}
+_decoders = {}
+
+
+def register(cls):
+    """
+    Class decorator, adding __slots__ to a dataclass and enabling generated codecs for it.
+
+    Must be applied on top of @dataclasses.dataclass.
+    """
+    cls = _with_slots(cls)
+    _registered.add(cls)
+    return cls
+
+
+def encoder(cls, exclude: typing.Tuple[str, ...] = ()) -> typing.Callable[[typing.Any], dict]:
+    """
+    Returns a function converting instances of cls into dicts without None values.
+
+    :param cls: The dataclass to convert.
+    :param exclude: Names of fields to leave out.
+    """
+    key = (cls, exclude)
+    function = _encoders.get(key)
+    if function is None:
+        if cls in _registered:
+            function = _compile_encoder(cls, exclude)
+        else:
+            function = _asdict_encoder(exclude)
+        _encoders[key] = function
+    return function
+
+
+def decoder(cls) -> typing.Callable[[dict], typing.Any]:
+    """Returns a function converting dicts into instances of cls, ignoring unknown keys."""
+    function = _decoders.get(cls)
+    if function is None:
+        if cls in _registered:
+            function = _compile_decoder(cls)
+        else:
+            function = _dacite_decoder(cls)
+        _decoders[cls] = function
+    return function
+
+
+def _dacite_decoder(cls):
+    import dacite  # only needed for unregistered classes, like Config
+
+    return lambda data: dacite.from_dict(cls, data)
+
+
+def _with_slots(cls):
+    """Recreates a dataclass with __slots__, like dataclass(slots=True) of Python 3.10."""
+    inherited = {name for base in cls.__mro__[1:] for name in getattr(base, '__slots__', ())}
+    names = tuple(f.name for f in dataclasses.fields(cls) if f.name not in inherited)
+    namespace = {
+        key: value for key, value in cls.__dict__.items()
+        if key not in names and key not in ('__dict__', '__weakref__')
+    }
+    namespace['__slots__'] = names
+    namespace['__qualname__'] = cls.__qualname__
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def _asdict_encoder(exclude):
+    def encode(obj):
+        data = dataclasses.asdict(obj, dict_factory=_dict_factory)
+        for name in exclude:
+            data.pop(name, None)
+        return data
+    return encode
+
+
+def _dict_factory(key_values):
+    return dict(kv for kv in key_values if kv[1] is not None)
+
+
+def _encode_value(value):
+    """Converts a value like asdict() does."""
+    if type(value) in _ATOMIC_TYPES or isinstance(value, enum.Enum):
+        return value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return encoder(type(value))(value)
+    if isinstance(value, tuple) and hasattr(value, '_fields'):
+        return type(value)(*[_encode_value(v) for v in value])
+    if isinstance(value, (list, tuple)):
+        return type(value)(_encode_value(v) for v in value)
+    if isinstance(value, dict):
+        return type(value)((_encode_value(k), _encode_value(v)) for k, v in value.items())
+    return copy.deepcopy(value)
+
+
+def _compile_encoder(cls, exclude):
+    hints = _type_hints(cls)
+    namespace = {'_encode_value': _encode_value}
+    lines = ['def encode(obj):', '    data = {}']
+    for field in dataclasses.fields(cls):
+        if field.name in exclude:
+            continue
+        lines.append(f'    value = obj.{field.name}')
+        lines.append('    if value is not None:')
+        fieldType = _optional(hints[field.name])
+        itemType = _list_item(fieldType)
+        if _is_atomic(fieldType):
+            lines.append('        if type(value) not in _ATOMIC_TYPES:')
+            lines.append('            value = _encode_value(value)')
+            namespace['_ATOMIC_TYPES'] = _ATOMIC_TYPES
+        elif itemType in _registered:
+            item = f'_encode_{itemType.__name__}'
+            namespace[item] = _LazyEncoder(itemType)
+            lines.append('        if type(value) is list:')
+            lines.append(f'            value = [{item}(v) if type(v) is {item}.cls else _encode_value(v) for v in value]')
+            lines.append('        else:')
+            lines.append('            value = _encode_value(value)')
+        else:
+            lines.append('        value = _encode_value(value)')
+        lines.append(f'        data[{field.name!r}] = value')
+    lines.append('    return data')
+    return _compile(cls, 'encode', lines, namespace)
+
+
+def _compile_decoder(cls):
+    hints = _type_hints(cls)
+    namespace = {'cls': cls, '_is_instance': _is_instance, '_wrong_type': _wrong_type}
+    lines = ['def decode(data):', '    kwargs = {}']
+    for field in dataclasses.fields(cls):
+        if not field.init:
+            continue
+        fieldType = _optional(hints[field.name])
+        itemType = _list_item(fieldType)
+        lines.append(f'    if {field.name!r} in data:')
+        lines.append(f'        value = data[{field.name!r}]')
+        hint = f'_type_{field.name}'
+        namespace[hint] = fieldType
+        if fieldType in _registered:
+            namespace[f'_decode_{fieldType.__name__}'] = _LazyDecoder(fieldType)
+            lines.append('        if value is not None:')
+            lines.append(f'            value = _decode_{fieldType.__name__}(value, {field.name!r})')
+        elif itemType in _registered:
+            namespace[f'_decode_{itemType.__name__}'] = _LazyDecoder(itemType)
+            lines.append('        if value is not None:')
+            lines.append('            if type(value) is not list:')
+            lines.append(f'                _wrong_type({hint}, value, {field.name!r})')
+            lines.append(f'            value = [_decode_{itemType.__name__}(v, {field.name!r}) for v in value]')
+        elif fieldType is not typing.Any:
+            types = _instance_types(fieldType)
+            if types is not None:
+                namespace[f'_types_{field.name}'] = types
+                check = f'isinstance(value, _types_{field.name})'
+            else:
+                check = f'_is_instance(value, {hint})'
+            lines.append(f'        if value is not None and not {check}:')
+            lines.append(f'            _wrong_type({hint}, value, {field.name!r})')
+        lines.append(f'        kwargs[{field.name!r}] = value')
+    lines.append('    return cls(**kwargs)')
+    return _compile(cls, 'decode', lines, namespace)
+
+
+def _compile(cls, name: str, lines: typing.List[str], namespace: dict):
+    exec('\n'.join(lines), namespace)
+    function = namespace[name]
+    function.__qualname__ = f'{cls.__qualname__}.{name}'
+    return function
+
+
+class _LazyEncoder:
+    """Compiles the encoder of a nested class on first use, so classes can refer to each other."""
+
+    def __init__(self, cls):
+        self.cls = cls
+        self._encode = None
+
+    def __call__(self, value):
+        if self._encode is None:
+            self._encode = encoder(self.cls)
+        return self._encode(value)
+
+
+class _LazyDecoder:
+    def __init__(self, cls):
+        self.cls = cls
+        self._decode = None
+
+    def __call__(self, value, path: str):
+        if isinstance(value, self.cls):
+            return value
+        if not isinstance(value, collections.abc.Mapping):
+            _wrong_type(self.cls, value, path)
+        if self._decode is None:
+            self._decode = decoder(self.cls)
+        try:
+            return self._decode(value)
+        except Exception as e:
+            dacite = sys.modules.get('dacite')
+            if dacite is not None and isinstance(e, dacite.DaciteFieldError):
+                e.update_path(path)
+            raise
+
+
+def _instance_types(hint):
+    """The types to check values of a field against with isinstance(), or None if that does not suffice."""
+    if hint in (float, complex):
+        # The numeric tower of PEP 484, like dacite.
+        return (int, float) if hint is float else (int, float, complex)
+    if hint in _ATOMIC_TYPES or hint in (dict, list) or (isinstance(hint, type) and issubclass(hint, enum.Enum)):
+        return hint
+    if getattr(hint, '__origin__', None) is typing.Union:
+        types = []
+        for arg in hint.__args__:
+            argTypes = _instance_types(arg)
+            if argTypes is None:
+                return None
+            types.extend(argTypes if isinstance(argTypes, tuple) else (argTypes,))
+        return tuple(types)
+    return None
+
+
+def _is_instance(value, hint) -> bool:
+    from dacite.types import is_instance  # only for types isinstance() cannot check, like Literal
+
+    return is_instance(value, hint)
+
+
+def _wrong_type(hint, value, path: str):
+    import dacite
+
+    raise dacite.WrongTypeError(field_type=hint, value=value, field_path=path)
+
+
+def _type_hints(cls) -> dict:
+    try:
+        return typing.get_type_hints(cls)
+    except NameError:
+        pass
+    # Some annotations refer to names only imported for type checkers, e.g. of
+    # optional dependencies. Resolve the others, and treat those as Any.
+    hints = {}
+    for base in reversed(cls.__mro__):
+        namespace = vars(sys.modules[base.__module__])
+        for name, annotation in vars(base).get('__annotations__', {}).items():
+            if isinstance(annotation, str):
+                try:
+                    annotation = eval(annotation, namespace)
+                except NameError:
+                    annotation = typing.Any
+            hints[name] = annotation
+    return hints
+
+
+def _optional(hint):
+    """Unwraps Optional[X] into X."""
+    if getattr(hint, '__origin__', None) is typing.Union:
+        args = [arg for arg in hint.__args__ if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return hint
+
+
+def _list_item(hint):
+    # __origin__ is typing.List before Python 3.7
+    if getattr(hint, '__origin__', None) in (list, typing.List) and getattr(hint, '__args__', None):
+        return _optional(hint.__args__[0])
+    return None
+
+
+def _is_atomic(hint) -> bool:
+    return hint in _ATOMIC_TYPES or (isinstance(hint, type) and issubclass(hint, enum.Enum))
@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import threading
+import time
+
+# Inside coroutines, get_event_loop() returns the running loop on Python 3.6.
+_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+async def _run_blocking(fn, *args):
+    """Calls fn(*args) in the default thread pool, so that the event loop keeps running meanwhile."""
+    return await _running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+
+class ByteBudget:
+    """
+    Limits the total size of the images that are being uploaded at once.
+
+    An image larger than the limit is admitted once nothing else is in
+    flight, so it waits instead of failing.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.inFlight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int):
+        """Blocks until size bytes fit into the budget, and takes them."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._fits(size))
+            self.inFlight += size
+
+    def release(self, size: int):
+        with self._condition:
+            self.inFlight -= size
+            self._condition.notify_all()
+
+    def _fits(self, size: int) -> bool:
+        return self.inFlight == 0 or self.inFlight + size <= self.limit
+
+
+class AsyncByteBudget(ByteBudget):
+    """Same as ByteBudget, but waits without blocking the event loop."""
+
+    def __init__(self, limit: int):
+        super().__init__(limit)
+        # Created on first use, asyncio primitives bind to the running loop.
+        self._condition = None
+
+    async def acquire(self, size: int):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._fits(size))
+            self.inFlight += size
+
+    async def release(self, size: int):
+        async with self._condition:
+            self.inFlight -= size
+            self._condition.notify_all()
+
+
+class AdaptiveLimiter:
+    """
+    Adapts the number of concurrent requests to how the server copes with them (AIMD).
+
+    The limit starts at minLimit and doubles every round trip until the
+    server shows overload. After that, each successful request raises it by
+    1/limit, i.e. by about one per round trip. An overloaded response (429,
+    5xx or a failed connection), or a latency above latencyTolerance times
+    the lowest latency seen, multiplies it by backoff, at most once per
+    round trip. Latencies below latencyFloor seconds count as the floor, so
+    that jitter of very fast requests does not look like congestion. The
+    limit stays between minLimit and maxLimit.
+    """
+
+    def __init__(
+            self,
+            minLimit: int = 1,
+            maxLimit: int = 4,
+            backoff: float = 0.5,
+            latencyTolerance: float = 2.0,
+            smoothing: float = 0.2,
+            latencyFloor: float = 0.01,
+    ):
+        if not 1 <= minLimit <= maxLimit:
+            raise ValueError(f'Invalid concurrency bounds {minLimit}..{maxLimit}.')
+        self.minLimit = minLimit
+        self.maxLimit = maxLimit
+        self.backoff = backoff
+        self.latencyTolerance = latencyTolerance
+        self.smoothing = smoothing
+        self.latencyFloor = latencyFloor
+        self.inFlight = 0
+        # Exponentially weighted moving average of the request latency, in seconds.
+        self.latency = None
+        self._limit = float(minLimit)
+        self._minLatency = None
+        self._slowStart = True
+        self._lastDecrease = None
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """The current max. number of requests in flight."""
+        return int(self._limit)
+
+    def acquire(self):
+        """Blocks until another request may be sent."""
+        with self._condition:
+            self._condition.wait_for(self._fits)
+            self.inFlight += 1
+
+    def release(self, latency: float = None, overloaded: bool = False):
+        """
+        Ends a request, and adapts the limit to its outcome.
+
+        :param latency: Seconds the request took, None if it failed.
+        :param overloaded: Whether the server was overloaded.
+        """
+        with self._condition:
+            self.inFlight -= 1
+            self._update(latency, overloaded)
+            self._condition.notify_all()
+
+    def _fits(self) -> bool:
+        return self.inFlight < self.limit
+
+    def _update(self, latency: float, overloaded: bool):
+        if latency is not None:
+            self.latency = latency if self.latency is None else self.latency + self.smoothing * (latency - self.latency)
+            self._minLatency = min(self._minLatency or self.latency, self.latency)
+            overloaded = overloaded or self.latency > self.latencyTolerance * max(self._minLatency, self.latencyFloor)
+        if overloaded:
+            self._decrease()
+        elif latency is not None:
+            self._limit = min(self._limit + (1 if self._slowStart else 1 / self._limit), self.maxLimit)
+
+    def _decrease(self):
+        now = time.monotonic()
+        # The requests in flight were sent at the previous limit, their outcome does not count.
+        if self._lastDecrease is not None and now - self._lastDecrease < (self.latency or 0):
+            return
+        self._lastDecrease = now
+        self._slowStart = False
+        self._limit = max(self._limit * self.backoff, self.minLimit)
+
+
+class AsyncAdaptiveLimiter(AdaptiveLimiter):
+    """Same as AdaptiveLimiter, but waits without blocking the event loop."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._condition = None
+        self._loop = None
+
+    def _getCondition(self) -> asyncio.Condition:
+        # asyncio primitives bind to the running loop, while the learned limit
+        # outlives it, e.g. across the event loops of several tests.
+        loop = _running_loop()
+        if self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def acquire(self):
+        condition = self._getCondition()
+        async with condition:
+            await condition.wait_for(self._fits)
+            self.inFlight += 1
+
+    async def release(self, latency: float = None, overloaded: bool = False):
+        async with self._getCondition():
+            self.inFlight -= 1
+            self._update(latency, overloaded)
+            self._condition.notify_all()
@@ -2,7 +2,6 @@ import dataclasses
 import typing
 import os
 import os.path
-import json
 import pathlib
 import sys
 
@@ -19,6 +18,26 @@ ENV_MAPPING = {
     'project': 'VRT_PROJECT',
     'apiKey': 'VRT_APIKEY',
     'enableSoftAssert': 'VRT_ENABLESOFTASSERT',
+    'httpPoolSize': 'VRT_HTTPPOOLSIZE',
+    'httpKeepAlive': 'VRT_HTTPKEEPALIVE',
+    'maxConcurrency': 'VRT_MAXCONCURRENCY',
+    'multipartUpload': 'VRT_MULTIPARTUPLOAD',
+    'cachePath': 'VRT_CACHEPATH',
+    'cacheMaxEntries': 'VRT_CACHEMAXENTRIES',
+    'enableLocalDiff': 'VRT_ENABLELOCALDIFF',
+    'pngCompressionLevel': 'VRT_PNGCOMPRESSIONLEVEL',
+    'retryMaxAttempts': 'VRT_RETRYMAXATTEMPTS',
+    'retryBackoff': 'VRT_RETRYBACKOFF',
+    'retryMaxBackoff': 'VRT_RETRYMAXBACKOFF',
+    'circuitBreakerThreshold': 'VRT_CIRCUITBREAKERTHRESHOLD',
+    'circuitBreakerResetTimeout': 'VRT_CIRCUITBREAKERRESETTIMEOUT',
+    'shareBuild': 'VRT_SHAREBUILD',
+    'sharedBuildPath': 'VRT_SHAREDBUILDPATH',
+    'spoolPath': 'VRT_SPOOLPATH',
+    'maxBytesInFlight': 'VRT_MAXBYTESINFLIGHT',
+    'adaptiveConcurrency': 'VRT_ADAPTIVECONCURRENCY',
+    'minConcurrency': 'VRT_MINCONCURRENCY',
+    'transport': 'VRT_TRANSPORT',
 }
 
 
@@ -30,6 +49,26 @@ class Config:
     project: str = None
     apiKey: str = None
     enableSoftAssert: bool = False
+    httpPoolSize: int = 10
+    httpKeepAlive: bool = True
+    maxConcurrency: int = 4
+    multipartUpload: bool = False
+    cachePath: str = None
+    cacheMaxEntries: int = 1000
+    enableLocalDiff: bool = False
+    pngCompressionLevel: int = None
+    retryMaxAttempts: int = 3
+    retryBackoff: float = 0.5
+    retryMaxBackoff: float = 30.0
+    circuitBreakerThreshold: int = 5
+    circuitBreakerResetTimeout: float = 30.0
+    shareBuild: bool = False
+    sharedBuildPath: str = None
+    spoolPath: str = None
+    maxBytesInFlight: int = None
+    adaptiveConcurrency: bool = False
+    minConcurrency: int = 1
+    transport: str = 'http1'
 
     @staticmethod
     def default(
@@ -60,6 +99,8 @@ class Config:
 
     @staticmethod
     def from_file(path: typing.Union[str, pathlib.Path]):
+        import json
+
         with open(path, 'r') as f:
             cfg = _from_dict(json.load(f), Config)
         return cfg
@@ -75,6 +116,10 @@ class Config:
                 pass
             elif field_type is bool:
                 val = val.lower() in ('true', '1')
+            elif field_type is int:
+                val = int(val)
+            elif field_type is float:
+                val = float(val)
             else:
                 raise Exception('Unsupported type')
             setattr(self, field_name, val)
@@ -0,0 +1,68 @@
+"""
+Local cropping of screenshots, for PlaywrightMixin.trackElements and tiled
+page screenshots.
+
+Requires Pillow, install with the crop extra.
+"""
+import concurrent.futures
+import io
+import typing
+
+from PIL import Image
+
+from .geometry import Box
+
+
+def crop(image: bytes, boxes: typing.List[Box], maxWorkers: int = None) -> typing.List[bytes]:
+    """
+    Crops boxes out of an encoded image, and encodes each of them as PNG.
+
+    The image is decoded once. The crops are encoded in a thread pool, as
+    Pillow releases the GIL while encoding.
+
+    :param image: The encoded image.
+    :param boxes: The boxes to crop, clipped to the image.
+    :param maxWorkers: Max. number of threads encoding crops.
+    :raises ValueError: If a box lies outside of the image.
+    """
+    with Image.open(io.BytesIO(image)) as decoded:
+        regions = [decoded.crop(_clip(box, decoded.size)) for box in boxes]
+    return _encode_all(regions, maxWorkers)
+
+
+def tile(image: bytes, tileHeight: int, maxWorkers: int = None) -> typing.List[typing.Tuple[Box, bytes]]:
+    """
+    Splits an encoded image into tiles of the full width, and encodes each of them as PNG.
+
+    :param image: The encoded image.
+    :param tileHeight: Height of the tiles in pixels, the last tile may be lower.
+    :param maxWorkers: Max. number of threads encoding tiles.
+    :return: The box of each tile in the image, and the tile, top to bottom.
+    """
+    if tileHeight <= 0:
+        raise ValueError(f'Invalid tile height {tileHeight}.')
+    with Image.open(io.BytesIO(image)) as decoded:
+        width, height = decoded.size
+        boxes = [(0, upper, width, min(upper + tileHeight, height)) for upper in range(0, height, tileHeight)]
+        regions = [decoded.crop(box) for box in boxes]
+    return list(zip(boxes, _encode_all(regions, maxWorkers)))
+
+
+def _encode_all(regions: typing.List[Image.Image], maxWorkers: int = None) -> typing.List[bytes]:
+    with concurrent.futures.ThreadPoolExecutor(maxWorkers) as executor:
+        return list(executor.map(_encode, regions))
+
+
+def _clip(box: Box, size: typing.Tuple[int, int]) -> Box:
+    left, upper, right, lower = box
+    width, height = size
+    clipped = (max(left, 0), max(upper, 0), min(right, width), min(lower, height))
+    if clipped[0] >= clipped[2] or clipped[1] >= clipped[3]:
+        raise ValueError(f'Box {box} lies outside of the image of {width}x{height} pixels.')
+    return clipped
+
+
+def _encode(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
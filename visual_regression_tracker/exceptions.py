@@ -10,11 +10,18 @@ class VisualRegressionTrackerError(Exception):
 class ServerError(VisualRegressionTrackerError):
     """An error occurred on the VisualRegressionTracker server."""
 
-    def __init__(self, *args):
+    def __init__(self, *args, status: int = None):
         """Initialises ServerError from server response."""
+        self.status = status
         super(ServerError, self).__init__(*args)
 
 
+class CircuitOpenError(ServerError):
+    """The server failed repeatedly, requests are not sent for a while."""
+
+    pass
+
+
 class TestRunError(VisualRegressionTrackerError):
     """A visual test failed."""
 
@@ -24,6 +31,16 @@ class TestRunError(VisualRegressionTrackerError):
         super(TestRunError, self).__init__(*args, status)
 
 
+class AggregateTrackError(VisualRegressionTrackerError):
+    """One or more test runs tracked in the background failed."""
+
+    def __init__(self, errors):
+        """Initialises AggregateTrackError from the collected errors."""
+        self.errors = errors
+        super(AggregateTrackError, self).__init__(
+            f'{len(errors)} test run(s) failed:\n' + '\n'.join(str(e) for e in errors))
+
+
 class MissingConfigurationError(VisualRegressionTrackerError):
     """VRT Configuration is incomplete."""
 
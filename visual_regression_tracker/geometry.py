@@ -0,0 +1,86 @@
+"""
+Rectangle arithmetic on ignore areas, in pixels of the screenshot.
+"""
+import typing
+
+from .types import IgnoreArea
+
+# (left, upper, right, lower) in pixels, right and lower exclusive.
+Box = typing.Tuple[int, int, int, int]
+
+
+def coalesce(areas: typing.List[IgnoreArea]) -> typing.List[IgnoreArea]:
+    """
+    Coalesces overlapping ignore areas into disjoint ones, covering the same pixels.
+
+    A sweep line over the left and right edges of the areas merges their
+    vertical intervals in each slab between two edges, and extends the
+    rectangles of the previous slab with the same interval. If that yields
+    more rectangles than the areas have, e.g. for crossing areas, the areas
+    are returned without the ones contained in others instead.
+
+    :param areas: The ignore areas, empty ones are dropped.
+    :return: The coalesced ignore areas, sorted top to bottom, left to right.
+    """
+    boxes = sorted({_box(area) for area in areas if area.width > 0 and area.height > 0})
+    edges = sorted({x for left, _, right, _ in boxes for x in (left, right)})
+
+    rectangles = []
+    started = {}
+    active = []
+    index = 0
+    for x in edges:
+        active = [box for box in active if box[2] > x]
+        while index < len(boxes) and boxes[index][0] == x:
+            active.append(boxes[index])
+            index += 1
+        intervals = _union(sorted((upper, lower) for _, upper, _, lower in active))
+        for interval in [interval for interval in started if interval not in intervals]:
+            rectangles.append((started.pop(interval), interval[0], x, interval[1]))
+        for interval in intervals:
+            started.setdefault(interval, x)
+
+    if len(rectangles) > len(boxes):
+        rectangles = [box for box in boxes if not any(_contains(other, box) for other in boxes if other != box)]
+    return [_area(box) for box in sorted(rectangles, key=lambda box: (box[1], box[0]))]
+
+
+def clip(areas: typing.List[IgnoreArea], box: Box) -> typing.List[IgnoreArea]:
+    """
+    Clips ignore areas to a box, and makes them relative to its upper left corner.
+
+    Areas outside of the box are dropped.
+    """
+    left, upper, right, lower = box
+    clipped = []
+    for area in areas:
+        areaLeft, areaUpper, areaRight, areaLower = _box(area)
+        intersection = (max(areaLeft, left), max(areaUpper, upper), min(areaRight, right), min(areaLower, lower))
+        if intersection[0] < intersection[2] and intersection[1] < intersection[3]:
+            clipped.append(_area((
+                intersection[0] - left, intersection[1] - upper, intersection[2] - left, intersection[3] - upper)))
+    return clipped
+
+
+def _union(intervals: typing.List[typing.Tuple[int, int]]) -> typing.List[typing.Tuple[int, int]]:
+    """Merges sorted intervals that overlap or touch."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _contains(outer: Box, inner: Box) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _box(area: IgnoreArea) -> Box:
+    return area.x, area.y, area.x + area.width, area.y + area.height
+
+
+def _area(box: Box) -> IgnoreArea:
+    left, upper, right, lower = box
+    return IgnoreArea(x=left, y=upper, width=right - left, height=lower - upper)
@@ -0,0 +1,95 @@
+"""
+HTTP/2 transport of VisualRegressionTracker, selected with Config.transport = 'http2'.
+
+Requires httpx with HTTP/2 support, install with the http2 extra.
+"""
+import asyncio
+import threading
+import typing
+
+import httpx
+import requests
+import urllib3.exceptions
+
+from .config import Config
+from .visualRegressionTracker import _JsonBody
+
+
+class Http2Session:
+    """
+    Sends the requests of a tracker as streams of one multiplexed HTTP/2 connection.
+
+    Implements the part of requests.Session the tracker uses, and raises the
+    exceptions of requests, so that failed requests are retried like with
+    the default session. Plain http:// servers are spoken to with HTTP/2
+    directly (prior knowledge), https:// servers negotiate it.
+
+    The synchronous HTTP/2 connection of httpx must not be shared between
+    threads, so requests are sent by an asynchronous client on an event loop
+    running in a thread of the session, and the calling threads wait for them.
+    """
+
+    def __init__(self, config: Config):
+        self._client = httpx.AsyncClient(
+            http1=not config.apiUrl.startswith('http://'),
+            http2=True,
+            limits=httpx.Limits(max_connections=config.httpPoolSize),
+            timeout=None,
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='vrt-http2', daemon=True)
+        self._thread.start()
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> httpx.Response:
+        return self.request('PATCH', url, **kwargs)
+
+    def request(
+            self,
+            method: str,
+            url: str,
+            json: dict = None,
+            data=None,
+            files: dict = None,
+            headers: dict = None,
+    ) -> httpx.Response:
+        kwargs = {'headers': headers}
+        if isinstance(data, _JsonBody):
+            # Streamed in DATA frames, the body is iterated anew on each attempt.
+            kwargs['content'] = _stream(data)
+            kwargs['headers'] = {**(headers or {}), 'Content-Length': str(len(data))}
+        elif data is not None or files is not None:
+            kwargs.update(data=data, files=files)
+        elif json is not None:
+            kwargs['json'] = json
+        future = asyncio.run_coroutine_threadsafe(self._client.request(method, url, **kwargs), self._loop)
+        try:
+            return future.result()
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(e) from e
+        except httpx.ConnectError as e:
+            # Raised like requests does, so that _is_connect_error() recognises it.
+            raise requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(
+                None, url, urllib3.exceptions.NewConnectionError(None, str(e)))) from e
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e) from e
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+async def _stream(body: typing.Iterable[bytes]) -> typing.AsyncIterator[bytes]:
+    for chunk in body:
+        yield chunk
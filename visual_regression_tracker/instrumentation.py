@@ -0,0 +1,74 @@
+import contextlib
+import dataclasses
+import logging
+import time
+import typing
+
+# Phases of a track call, in the order they happen:
+#   screenshot - taking the screenshot (Playwright only)
+#   crop - cropping elements out of a shared screenshot (Playwright only)
+#   spool - appending the test run to the offline spool
+#   cache - hashing the image and looking it up in the local cache
+#   localDiff - comparing the image with its cached baseline
+#   backpressure - waiting while Config.maxBytesInFlight or the adaptive concurrency limit is exhausted
+#   recompress - re-compressing the PNG image
+#   serialize - converting the test run into request fields
+#   encode - preparing the image for the request, or reading it for multipart uploads
+#   request - HTTP round-trip, including streaming the base64 encoded image of JSON uploads
+#   parse - converting the response into a TestRunResponse
+#   baseline - downloading a changed baseline into the local cache
+PHASES = (
+    'screenshot', 'crop', 'spool', 'cache', 'localDiff', 'backpressure', 'recompress',
+    'serialize', 'encode', 'request', 'parse', 'baseline',
+)
+
+
+@dataclasses.dataclass
+class Timings:
+    """
+    Durations and sizes of the phases of one track call.
+
+    Durations are measured with a monotonic clock, in seconds. Phases that
+    were skipped, e.g. the request for cached test runs, are missing.
+    """
+    phases: typing.Dict[str, float] = dataclasses.field(default_factory=dict)
+    bytes: typing.Dict[str, int] = dataclasses.field(default_factory=dict)
+    total: float = None
+    started: float = dataclasses.field(default_factory=time.perf_counter, repr=False)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Adds the time spent in the with block to the phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+
+class Listeners:
+    """Callbacks notified with the Timings of every track call."""
+
+    def __init__(self):
+        self._listeners = ()
+
+    def add(self, listener: typing.Callable):
+        self._listeners += (listener,)
+
+    def remove(self, listener: typing.Callable):
+        listeners = list(self._listeners)
+        listeners.remove(listener)
+        self._listeners = tuple(listeners)
+
+    def __bool__(self):
+        return bool(self._listeners)
+
+    def emit(self, test, timings: Timings, result=None):
+        for listener in self._listeners:
+            try:
+                listener(test, timings, result)
+            except Exception:
+                logging.getLogger(__name__).exception('Track listener %r failed.', listener)
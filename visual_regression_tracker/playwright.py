@@ -1,17 +1,35 @@
-import base64
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
 import dataclasses
+import functools
+import hashlib
+import inspect
+import logging
+import math
 import pathlib
+import time
 
-from typing import Union, List
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Union, List, Tuple
 from typing_extensions import Literal
-from playwright.sync_api import FloatRect
-from playwright import sync_api
-from playwright import async_api
 from visual_regression_tracker import \
-    Config, IgnoreArea, TestRun, VisualRegressionTracker
-from visual_regression_tracker.types import _to_dict
+    AggregateTrackError, Config, IgnoreArea, TestRun, VisualRegressionTracker
+from visual_regression_tracker.instrumentation import Timings
+from visual_regression_tracker import codec, geometry
+from visual_regression_tracker.types import Stabilization, TestRunResult, _image_buffer, _to_dict
+
+if TYPE_CHECKING:
+    # Only used in annotations, the Playwright APIs are imported by the caller anyway.
+    from playwright import sync_api
+    from playwright import async_api
+    from playwright.sync_api import FloatRect
+
+    # Literal areas, or CSS selectors and element handles whose boxes are ignored.
+    IgnoreAreaOrElement = Union[IgnoreArea, str, sync_api.ElementHandle, async_api.ElementHandle]
 
 
+@codec.register
 @dataclasses.dataclass
 class Agent:
     os: str = None
@@ -19,6 +37,7 @@ class Agent:
     viewport: str = None
 
 
+@codec.register
 @dataclasses.dataclass
 class ElementHandleScreenshotOptions:
     timeout: int = None
@@ -28,26 +47,40 @@ class ElementHandleScreenshotOptions:
     omit_background: bool = None
 
 
+@codec.register
 @dataclasses.dataclass
 class PageScreenshotOptions(ElementHandleScreenshotOptions):
     full_page: bool = None
     clip: FloatRect = None
 
 
+@codec.register
+@dataclasses.dataclass
+class StableCaptureOptions:
+    matches: int = 2
+    timeout: float = 5000
+    interval: float = 100
+
+
+@codec.register
 @dataclasses.dataclass
 class PageTrackOptions:
     diffTollerancePercent: float = None
-    ignoreAreas: List[IgnoreArea] = None
+    ignoreAreas: List[IgnoreAreaOrElement] = None
     screenshotOptions: PageScreenshotOptions = None
     agent: Agent = None
+    stableCapture: StableCaptureOptions = None
+    tileHeight: int = None
 
 
+@codec.register
 @dataclasses.dataclass
 class ElementHandleTrackOptions:
     diffTollerancePercent: float = None
-    ignoreAreas: List[IgnoreArea] = None
+    ignoreAreas: List[IgnoreAreaOrElement] = None
     screenshotOptions: ElementHandleScreenshotOptions = None
     agent: Agent = None
+    stableCapture: StableCaptureOptions = None
 
 
 class PlaywrightMixin:
@@ -62,20 +95,29 @@ class PlaywrightMixin:
             options: PageTrackOptions = None
     ):
         viewportSize = page.viewport_size
-        screenshotOptions = _to_dict(options.screenshotOptions) if options else {}
-        screenshot = page.screenshot(**screenshotOptions)
-        imageBase64 = base64.b64encode(screenshot).decode('ascii')
-
-        self.track(TestRun(
-            name,
-            imageBase64,
-            options.agent.os if options and options.agent else None,
-            self.browser.name,
-            f'{viewportSize["width"]}x{viewportSize["height"]}' if viewportSize else None,
-            options.agent.device if options and options.agent else None,
-            options.diffTollerancePercent if options else None,
-            options.ignoreAreas if options else None,
-        ))
+        screenshotOptions = _to_dict(options.screenshotOptions) if options and options.screenshotOptions else {}
+        query = _ignore_query(options, _page_origin(screenshotOptions))
+        timings = Timings()
+        with timings.phase('screenshot'):
+            layout = page.evaluate(_BOXES_SCRIPT, query) if query else None
+            screenshot, stabilization = _screenshot(functools.partial(page.screenshot, **screenshotOptions), options)
+        timings.bytes['screenshot'] = len(screenshot)
+
+        test = TestRun(
+            name=name,
+            os=options.agent.os if options and options.agent else None,
+            browser=self.browser.name,
+            viewport=f'{viewportSize["width"]}x{viewportSize["height"]}' if viewportSize else None,
+            device=options.agent.device if options and options.agent else None,
+            diffTollerancePercent=options.diffTollerancePercent if options else None,
+            ignoreAreas=_ignore_areas(options, layout, captured=_page_capture(screenshotOptions, viewportSize)),
+            **_image(screenshot, screenshotOptions),
+        )
+        del screenshot
+        if options and options.tileHeight:
+            results = self._trackAll(self._tiles(test, timings, options.tileHeight))
+            return [_stabilized(result, stabilization) for result in results]
+        return _stabilized(self.track(test, timings=timings), stabilization)
 
     async def trackPageAsync(
             self,
@@ -83,22 +125,104 @@ class PlaywrightMixin:
             name: str,
             options: PageTrackOptions = None
     ):
+        test, timings, stabilization = await self._capturePageAsync(page, name, options)
+        if options and options.tileHeight:
+            return await self._trackTilesAsync(test, timings, stabilization, options.tileHeight)
+        result = self.track(test, timings=timings)
+        if inspect.isawaitable(result):
+            result = await result
+        return _stabilized(result, stabilization)
+
+    async def _capturePageAsync(self, page: async_api.Page, name: str, options: PageTrackOptions = None):
         viewportSize = page.viewport_size
 
-        screenshotOptions = _to_dict(options.screenshotOptions) if options else {}
-        screenshot = await page.screenshot(**screenshotOptions)
-        imageBase64 = base64.b64encode(screenshot).decode('ascii')
-
-        self.track(TestRun(
-            name,
-            imageBase64,
-            options.agent.os if options and options.agent else None,
-            self.browser.name,
-            f'{viewportSize["width"]}x{viewportSize["height"]}' if viewportSize else None,
-            options.agent.device if options and options.agent else None,
-            options.diffTollerancePercent if options else None,
-            options.ignoreAreas if options else None,
-        ))
+        screenshotOptions = _to_dict(options.screenshotOptions) if options and options.screenshotOptions else {}
+        query = _ignore_query(options, _page_origin(screenshotOptions))
+        timings = Timings()
+        with timings.phase('screenshot'):
+            layout = await page.evaluate(_BOXES_SCRIPT, query) if query else None
+            screenshot, stabilization = await _screenshot_async(
+                functools.partial(page.screenshot, **screenshotOptions), options)
+        timings.bytes['screenshot'] = len(screenshot)
+
+        test = TestRun(
+            name=name,
+            os=options.agent.os if options and options.agent else None,
+            browser=self.browser.name,
+            viewport=f'{viewportSize["width"]}x{viewportSize["height"]}' if viewportSize else None,
+            device=options.agent.device if options and options.agent else None,
+            diffTollerancePercent=options.diffTollerancePercent if options else None,
+            ignoreAreas=_ignore_areas(options, layout, captured=_page_capture(screenshotOptions, viewportSize)),
+            **_image(screenshot, screenshotOptions),
+        )
+        return test, timings, stabilization
+
+    async def trackPageMatrix(
+            self,
+            pageFactory: Callable[[dict], Awaitable[async_api.Page]],
+            name: str,
+            viewports: List[Union[str, dict]] = None,
+            devices: Dict[str, dict] = None,
+            options: PageTrackOptions = None,
+            maxConcurrency: int = None,
+    ) -> list:
+        """
+        Tracks a page at several viewports and devices concurrently.
+
+        A page is opened per combination of viewport and device, all at once
+        or up to maxConcurrency. Each page's context is closed as soon as it
+        was captured, while its screenshot is uploaded.
+
+        :param pageFactory: Async callable receiving the options for
+            Browser.new_context(), and returning a page of a new context with
+            these options, ready to be captured.
+        :param name: Name of all the test runs.
+        :param viewports: Viewport sizes, like '1920x1080' or
+            {'width': 1920, 'height': 1080}.
+        :param devices: Playwright device descriptors by device name, e.g.
+            {'iPhone 11': playwright.devices['iPhone 11']}. Combined with each
+            viewport, if any, or at their own viewport otherwise.
+        :param options: Options of all the test runs. Agent.viewport and
+            Agent.device are filled in per page.
+        :param maxConcurrency: Max. number of pages open at once.
+        :return: The TestRunResults, one per combination, devices first. With
+            options.tileHeight, a list of the TestRunResults of the tiles each.
+        """
+        if not viewports and not devices:
+            raise ValueError('trackPageMatrix needs viewports or devices.')
+        if options and options.screenshotOptions and options.screenshotOptions.path:
+            raise ValueError('The pages of trackPageMatrix cannot share a screenshot path.')
+
+        matrix = [
+            (device, viewport)
+            for device in (devices or [None])
+            for viewport in (viewports or [None])
+        ]
+        semaphore = asyncio.Semaphore(maxConcurrency or len(matrix))
+
+        async def trackCell(device: str, viewport: Union[str, dict, None]):
+            contextOptions = dict(devices[device]) if device else {}
+            if viewport:
+                contextOptions['viewport'] = _viewport(viewport)
+            cellOptions = dataclasses.replace(
+                options or PageTrackOptions(),
+                agent=dataclasses.replace((options and options.agent) or Agent(), device=device),
+            )
+            async with semaphore:
+                page = await pageFactory(contextOptions)
+                try:
+                    test, timings, stabilization = await self._capturePageAsync(page, name, cellOptions)
+                finally:
+                    await page.context.close()
+            if cellOptions.tileHeight:
+                return await self._trackTilesAsync(test, timings, stabilization, cellOptions.tileHeight)
+            return _stabilized(await self._trackAsync(test, timings), stabilization)
+
+        results = await asyncio.gather(*[trackCell(*cell) for cell in matrix], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise AggregateTrackError(errors)
+        return results
 
     def trackElementHandle(
             self,
@@ -106,20 +230,27 @@ class PlaywrightMixin:
             name: str,
             options: ElementHandleTrackOptions = None
     ):
-        screenshotOptions = _to_dict(options.screenshotOptions) if options else {}
-        screenshot = elementHandle.screenshot(**screenshotOptions)
-        imageBase64 = base64.b64encode(screenshot).decode('ascii')
-
-        self.track(TestRun(
-            name,
-            imageBase64,
-            options.agent.os if options and options.agent else None,
-            self.browser.name,
-            options.agent.viewport if options and options.agent else None,
-            options.agent.device if options and options.agent else None,
-            options.diffTollerancePercent if options else None,
-            options.ignoreAreas if options else None,
-        ))
+        screenshotOptions = _to_dict(options.screenshotOptions) if options and options.screenshotOptions else {}
+        query = _ignore_query(options)
+        timings = Timings()
+        with timings.phase('screenshot'):
+            layout = elementHandle.evaluate(_BOXES_SCRIPT, query) if query else None
+            screenshot, stabilization = _screenshot(
+                functools.partial(elementHandle.screenshot, **screenshotOptions), options)
+        timings.bytes['screenshot'] = len(screenshot)
+
+        test = TestRun(
+            name=name,
+            os=options.agent.os if options and options.agent else None,
+            browser=self.browser.name,
+            viewport=options.agent.viewport if options and options.agent else None,
+            device=options.agent.device if options and options.agent else None,
+            diffTollerancePercent=options.diffTollerancePercent if options else None,
+            ignoreAreas=_ignore_areas(options, layout),
+            **_image(screenshot, screenshotOptions),
+        )
+        del screenshot
+        return _stabilized(self.track(test, timings=timings), stabilization)
 
     async def trackElementHandleAsync(
             self,
@@ -127,20 +258,365 @@ class PlaywrightMixin:
             name: str,
             options: ElementHandleTrackOptions = None
     ):
-        screenshotOptions = _to_dict(options.screenshotOptions) if options else {}
-        screenshot = await elementHandle.screenshot(**screenshotOptions)
-        imageBase64 = base64.b64encode(screenshot).decode('ascii')
-
-        self.track(TestRun(
-            name,
-            imageBase64,
-            options.agent.os if options and options.agent else None,
-            self.browser.name,
-            options.agent.viewport if options and options.agent else None,
-            options.agent.device if options and options.agent else None,
-            options.diffTollerancePercent if options else None,
-            options.ignoreAreas if options else None,
-        ))
+        screenshotOptions = _to_dict(options.screenshotOptions) if options and options.screenshotOptions else {}
+        query = _ignore_query(options)
+        timings = Timings()
+        with timings.phase('screenshot'):
+            layout = await elementHandle.evaluate(_BOXES_SCRIPT, query) if query else None
+            screenshot, stabilization = await _screenshot_async(
+                functools.partial(elementHandle.screenshot, **screenshotOptions), options)
+        timings.bytes['screenshot'] = len(screenshot)
+
+        test = TestRun(
+            name=name,
+            os=options.agent.os if options and options.agent else None,
+            browser=self.browser.name,
+            viewport=options.agent.viewport if options and options.agent else None,
+            device=options.agent.device if options and options.agent else None,
+            diffTollerancePercent=options.diffTollerancePercent if options else None,
+            ignoreAreas=_ignore_areas(options, layout),
+            **_image(screenshot, screenshotOptions),
+        )
+        del screenshot
+        result = self.track(test, timings=timings)
+        if inspect.isawaitable(result):
+            result = await result
+        return _stabilized(result, stabilization)
+
+    def trackElements(
+            self,
+            page: sync_api.Page,
+            elements: Dict[str, Union[str, sync_api.ElementHandle]],
+            options: ElementHandleTrackOptions = None,
+    ) -> Dict[str, TestRunResult]:
+        """
+        Tracks many elements of a page from a single screenshot.
+
+        The boxes of all elements are resolved in one page.evaluate() call,
+        the page is captured once, and the elements are cropped locally and
+        tracked concurrently. Requires Pillow.
+
+        :param page: The page to capture.
+        :param elements: Element handles or CSS selectors, by test run name.
+        :param options: Options of all the test runs.
+        :return: The TestRunResults by test run name.
+        """
+        screenshotOptions = _element_screenshot_options(options)
+        timings = Timings()
+        with timings.phase('screenshot'):
+            layout = page.evaluate(_BOXES_SCRIPT, _elements_query(elements, options))
+            screenshot, stabilization = _screenshot(
+                functools.partial(page.screenshot, full_page=True, **screenshotOptions), options)
+        tracked = self._cropElements(elements, layout, screenshot, timings, options)
+        del screenshot
+
+        results = self._trackAll(tracked)
+        return {test.name: _stabilized(result, stabilization) for (test, _), result in zip(tracked, results)}
+
+    async def trackElementsAsync(
+            self,
+            page: async_api.Page,
+            elements: Dict[str, Union[str, async_api.ElementHandle]],
+            options: ElementHandleTrackOptions = None,
+    ) -> Dict[str, TestRunResult]:
+        """Same as trackElements, with the async Playwright API."""
+        screenshotOptions = _element_screenshot_options(options)
+        timings = Timings()
+        with timings.phase('screenshot'):
+            layout = await page.evaluate(_BOXES_SCRIPT, _elements_query(elements, options))
+            screenshot, stabilization = await _screenshot_async(
+                functools.partial(page.screenshot, full_page=True, **screenshotOptions), options)
+        tracked = await asyncio.get_running_loop().run_in_executor(
+            None, self._cropElements, elements, layout, screenshot, timings, options)
+        del screenshot
+
+        results = await self._trackAllAsync(tracked)
+        return {test.name: _stabilized(result, stabilization) for (test, _), result in zip(tracked, results)}
+
+    def _cropElements(
+            self,
+            elements: dict,
+            layout: dict,
+            screenshot: bytes,
+            timings: Timings,
+            options: ElementHandleTrackOptions = None,
+    ) -> List[Tuple[TestRun, Timings]]:
+        """Crops the elements out of the screenshot, into a test run with its own Timings each."""
+        from visual_regression_tracker import crop
+
+        boxes = _element_boxes(list(elements), layout)
+        with timings.phase('crop'):
+            images = crop.crop(screenshot, boxes, self.config.maxConcurrency)
+        tracked = []
+        for name, box, image in zip(elements, layout['boxes'], images):
+            test = TestRun(
+                name=name,
+                os=options.agent.os if options and options.agent else None,
+                browser=self.browser.name,
+                viewport=options.agent.viewport if options and options.agent else None,
+                device=options.agent.device if options and options.agent else None,
+                diffTollerancePercent=options.diffTollerancePercent if options else None,
+                ignoreAreas=_ignore_areas(options, layout, captured=box),
+                imageBytes=image,
+            )
+            tracked.append((test, _crop_timings(timings, image)))
+        return tracked
+
+    def _tiles(self, test: TestRun, timings: Timings, tileHeight: int) -> List[Tuple[TestRun, Timings]]:
+        """Splits the image of a page's test run into tiles, with the ignore areas rebased into each tile."""
+        from visual_regression_tracker import crop
+
+        with timings.phase('crop'):
+            with _image_buffer(test) as image:
+                tiles = crop.tile(image, tileHeight, self.config.maxConcurrency)
+        tracked = []
+        for index, (box, image) in enumerate(tiles):
+            tile = dataclasses.replace(
+                test,
+                name=_tile_name(test.name, index),
+                imageBytes=image,
+                imagePath=None,
+                ignoreAreas=geometry.clip(test.ignoreAreas or [], box) or None,
+            )
+            tracked.append((tile, _crop_timings(timings, image)))
+        return tracked
+
+    async def _trackTilesAsync(
+            self, test: TestRun, timings: Timings, stabilization: Stabilization, tileHeight: int) -> list:
+        tracked = await asyncio.get_running_loop().run_in_executor(None, self._tiles, test, timings, tileHeight)
+        return [_stabilized(result, stabilization) for result in await self._trackAllAsync(tracked)]
+
+    def _trackAll(self, tracked: List[Tuple[TestRun, Timings]]) -> list:
+        """Tracks test runs concurrently, and raises their errors together."""
+        with concurrent.futures.ThreadPoolExecutor(self.config.maxConcurrency) as executor:
+            futures = [executor.submit(self.track, test, timings=timings) for test, timings in tracked]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise AggregateTrackError(errors)
+        return [future.result() for future in futures]
+
+    async def _trackAllAsync(self, tracked: List[Tuple[TestRun, Timings]]) -> list:
+        results = await asyncio.gather(
+            *[self._trackAsync(test, timings) for test, timings in tracked], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise AggregateTrackError(errors)
+        return results
+
+    async def _trackAsync(self, test: TestRun, timings: Timings):
+        if isinstance(self, VisualRegressionTracker):
+            # Upload in a thread, so that the event loop can capture meanwhile.
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.track, test, timings=timings))
+        return await self.track(test, timings=timings)
+
+
+class _Stabilizer:
+    """
+    Tells when consecutive screenshots settled, for PageTrackOptions.stableCapture.
+
+    Only the digest of the previous screenshot is kept, so each comparison
+    costs one hash of the new screenshot.
+    """
+
+    def __init__(self, options: StableCaptureOptions):
+        self.options = options
+        self.attempts = 0
+        self.matches = 0
+        self._digest = None
+        self._start = time.perf_counter()
+        self._deadline = self._start + options.timeout / 1000
+
+    def add(self, screenshot: bytes) -> bool:
+        """Adds the next screenshot, and returns whether capturing is done."""
+        digest = hashlib.blake2b(screenshot, digest_size=16).digest()
+        self.attempts += 1
+        self.matches = self.matches + 1 if digest == self._digest else 1
+        self._digest = digest
+        return self.stable or time.perf_counter() + self.delay > self._deadline
+
+    @property
+    def stable(self) -> bool:
+        return self.matches >= self.options.matches
+
+    @property
+    def delay(self) -> float:
+        return self.options.interval / 1000
+
+    def result(self) -> Stabilization:
+        stabilization = Stabilization(self.attempts, time.perf_counter() - self._start, self.stable)
+        if not stabilization.stable:
+            logging.getLogger(__name__).warning(
+                'Screenshot did not settle after %d attempts in %.1fs, tracking the last one.',
+                stabilization.attempts, stabilization.settleTime)
+        return stabilization
+
+
+def _screenshot(capture: Callable[[], bytes], options) -> Tuple[bytes, Stabilization]:
+    """Takes a screenshot, or screenshots until they settle if options.stableCapture is set."""
+    if not options or not options.stableCapture:
+        return capture(), None
+    stabilizer = _Stabilizer(options.stableCapture)
+    while True:
+        screenshot = capture()
+        if stabilizer.add(screenshot):
+            return screenshot, stabilizer.result()
+        del screenshot
+        time.sleep(stabilizer.delay)
+
+
+async def _screenshot_async(capture: Callable[[], Awaitable[bytes]], options) -> Tuple[bytes, Stabilization]:
+    if not options or not options.stableCapture:
+        return await capture(), None
+    stabilizer = _Stabilizer(options.stableCapture)
+    while True:
+        screenshot = await capture()
+        if stabilizer.add(screenshot):
+            return screenshot, stabilizer.result()
+        del screenshot
+        await asyncio.sleep(stabilizer.delay)
+
+
+def _tile_name(name: str, index: int) -> str:
+    return f'{name} [tile {index + 1}]'
+
+
+def _crop_timings(timings: Timings, image: bytes) -> Timings:
+    # The screenshot and cropping are shared, and part of the timings of every crop.
+    return Timings(phases=dict(timings.phases), bytes={'screenshot': len(image)})
+
+
+def _stabilized(result: TestRunResult, stabilization: Stabilization = None) -> TestRunResult:
+    if stabilization is not None and result is not None:
+        result.stabilization = stabilization
+    return result
+
+
+def _viewport(viewport: Union[str, dict]) -> dict:
+    if isinstance(viewport, str):
+        width, height = viewport.lower().split('x')
+        return {'width': int(width), 'height': int(height)}
+    return viewport
+
+
+# Resolves element handles and CSS selectors to their boxes in CSS pixels, in
+# one round trip. Called by page.evaluate() with the query only, the boxes are
+# relative to the document (as captured by full page screenshots) or to the
+# viewport. Called by elementHandle.evaluate(), they are relative to the element.
+_BOXES_SCRIPT = """(...args) => {
+    const query = args.pop();
+    let dx = 0, dy = 0, captured = null;
+    if (args.length) {
+        const rect = args[0].getBoundingClientRect();
+        dx = -rect.left;
+        dy = -rect.top;
+        captured = {x: 0, y: 0, width: rect.width, height: rect.height};
+    } else if (query.origin === 'document') {
+        dx = window.scrollX;
+        dy = window.scrollY;
+    }
+    const box = (element) => {
+        const rect = element.getBoundingClientRect();
+        return {x: rect.left + dx, y: rect.top + dy, width: rect.width, height: rect.height};
+    };
+    const findAll = (element) => typeof element === 'string' ? Array.from(document.querySelectorAll(element)) : [element];
+    return {
+        devicePixelRatio: window.devicePixelRatio,
+        captured,
+        boxes: query.elements.map((element) => {
+            element = typeof element === 'string' ? document.querySelector(element) : element;
+            return element ? box(element) : null;
+        }),
+        ignoreBoxes: query.ignore.flatMap((element) => findAll(element).map(box)),
+    };
+}"""
+
+
+def _page_origin(screenshotOptions: dict) -> str:
+    return 'document' if screenshotOptions.get('full_page') else 'viewport'
+
+
+def _page_capture(screenshotOptions: dict, viewportSize: dict = None) -> dict:
+    """Returns the box captured by page.screenshot() in CSS pixels, unless it is the full page."""
+    if screenshotOptions.get('clip'):
+        return screenshotOptions['clip']
+    if not screenshotOptions.get('full_page') and viewportSize:
+        return {'x': 0, 'y': 0, **viewportSize}
+    return None
+
+
+def _ignore_query(options, origin: str = None) -> dict:
+    """Returns the query of _BOXES_SCRIPT for the selectors and element handles in the ignore areas, if any."""
+    ignore = [area for area in (options.ignoreAreas if options else None) or [] if not isinstance(area, IgnoreArea)]
+    if not ignore:
+        return None
+    return {'origin': origin, 'elements': [], 'ignore': ignore}
+
+
+def _elements_query(elements: dict, options: ElementHandleTrackOptions = None) -> dict:
+    query = _ignore_query(options, 'document') or {'origin': 'document', 'ignore': []}
+    return {**query, 'elements': list(elements.values())}
+
+
+def _ignore_areas(options, layout: dict = None, captured: dict = None) -> List[IgnoreArea]:
+    """
+    Merges the literal ignore areas of options with the ignoreBoxes resolved by _BOXES_SCRIPT.
+
+    The boxes are scaled to pixels of the screenshot, clipped to and rebased
+    into the captured box in CSS pixels, if given or resolved relative to an
+    element, and coalesced with the literal ones.
+    """
+    ignoreAreas = options.ignoreAreas if options else None
+    if not ignoreAreas or not layout or all(isinstance(area, IgnoreArea) for area in ignoreAreas):
+        return ignoreAreas
+    scale = layout['devicePixelRatio'] or 1
+    resolved = [_pixel_area(box, scale) for box in layout['ignoreBoxes']]
+    captured = captured or layout.get('captured')
+    if captured:
+        resolved = geometry.clip(resolved, _pixel_box(captured, scale))
+    return geometry.coalesce([area for area in ignoreAreas if isinstance(area, IgnoreArea)] + resolved)
+
+
+def _element_boxes(names: List[str], layout: dict) -> List[geometry.Box]:
+    """Converts the element boxes of _BOXES_SCRIPT into pixel boxes of the screenshot."""
+    scale = layout['devicePixelRatio'] or 1
+    boxes = []
+    for name, box in zip(names, layout['boxes']):
+        if box is None:
+            raise ValueError(f'No element found for {name!r}.')
+        boxes.append(_pixel_box(box, scale))
+    return boxes
+
+
+def _pixel_box(box: dict, scale: float) -> geometry.Box:
+    """Scales a box in CSS pixels to the device pixels covering it."""
+    return (
+        math.floor(box['x'] * scale),
+        math.floor(box['y'] * scale),
+        math.ceil((box['x'] + box['width']) * scale),
+        math.ceil((box['y'] + box['height']) * scale),
+    )
+
+
+def _pixel_area(box: dict, scale: float) -> IgnoreArea:
+    left, upper, right, lower = _pixel_box(box, scale)
+    return IgnoreArea(x=left, y=upper, width=right - left, height=lower - upper)
+
+
+def _element_screenshot_options(options: ElementHandleTrackOptions = None) -> dict:
+    screenshotOptions = _to_dict(options.screenshotOptions) if options and options.screenshotOptions else {}
+    if screenshotOptions.get('path'):
+        raise ValueError('The elements are cropped from one screenshot, which cannot be saved to a path.')
+    return screenshotOptions
+
+
+def _image(screenshot: bytes, screenshotOptions: dict) -> dict:
+    # Prefer the file Playwright saved the screenshot to, so the bytes can be
+    # released (the track methods delete their reference) before the image is
+    # uploaded.
+    if screenshotOptions.get('path'):
+        return {'imagePath': screenshotOptions['path']}
+    return {'imageBytes': screenshot}
 
 
 class PlaywrightVisualRegressionTracker(PlaywrightMixin, VisualRegressionTracker):
@@ -153,3 +629,33 @@ class PlaywrightVisualRegressionTracker(PlaywrightMixin, VisualRegressionTracker
         """
         VisualRegressionTracker.__init__(self, config)
         PlaywrightMixin.__init__(self, browser)
+
+
+def __getattr__(name: str):
+    # The async tracker needs httpx, so it is only defined on first use.
+    if name != 'AsyncPlaywrightVisualRegressionTracker':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    global AsyncPlaywrightVisualRegressionTracker
+    AsyncPlaywrightVisualRegressionTracker = _define_async_tracker()
+    return AsyncPlaywrightVisualRegressionTracker
+
+
+def _define_async_tracker():
+    from visual_regression_tracker.asyncVisualRegressionTracker import AsyncVisualRegressionTracker
+
+    class AsyncPlaywrightVisualRegressionTracker(PlaywrightMixin, AsyncVisualRegressionTracker):
+        def __init__(self, browser: async_api.BrowserType, config: Config = None):
+            """
+            Creates a new AsyncPlaywrightVisualRegressionTracker
+
+            Uploads from trackPageAsync and trackElementHandleAsync do not block the
+            event loop, so many pages can be tracked concurrently.
+
+            :param config: The config to use.
+            :param browser: the browser type being used by Playwright.
+            """
+            AsyncVisualRegressionTracker.__init__(self, config)
+            PlaywrightMixin.__init__(self, browser)
+
+    AsyncPlaywrightVisualRegressionTracker.__qualname__ = AsyncPlaywrightVisualRegressionTracker.__name__
+    return AsyncPlaywrightVisualRegressionTracker
@@ -0,0 +1,49 @@
+import struct
+import typing
+import zlib
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def is_png(data) -> bool:
+    return bytes(data[:len(SIGNATURE)]) == SIGNATURE
+
+
+def read_chunks(data: bytes) -> typing.Iterator[typing.Tuple[bytes, bytes]]:
+    """Yields the (type, payload) of all chunks of a PNG image."""
+    if not is_png(data):
+        raise ValueError('Not a PNG image')
+    offset = len(SIGNATURE)
+    while offset < len(data):
+        length, chunkType = struct.unpack_from('>I4s', data, offset)
+        offset += 8
+        yield chunkType, data[offset:offset + length]
+        offset += length + 4
+
+
+def write_chunk(chunkType: bytes, payload: bytes) -> bytes:
+    crc = zlib.crc32(chunkType + payload) & 0xffffffff
+    return struct.pack('>I4s', len(payload), chunkType) + payload + struct.pack('>I', crc)
+
+
+def recompress(data: bytes, level: int = 9) -> bytes:
+    """
+    Re-compresses the image data of a PNG with the given zlib level.
+
+    Filtered scanlines are kept as they are, so the result is pixel-exact.
+    Returns data unchanged if re-compressing does not make it smaller.
+    """
+    chunks = list(read_chunks(data))
+    imageData = zlib.decompress(b''.join(payload for chunkType, payload in chunks if chunkType == b'IDAT'))
+    compressed = zlib.compress(imageData, level)
+
+    output = [SIGNATURE]
+    for chunkType, payload in chunks:
+        if chunkType != b'IDAT':
+            output.append(write_chunk(chunkType, payload))
+        elif compressed is not None:
+            output.append(write_chunk(b'IDAT', compressed))
+            compressed = None
+    result = b''.join(output)
+
+    return result if len(result) < len(data) else data
@@ -0,0 +1,48 @@
+import io
+import typing
+
+import numpy
+from PIL import Image
+
+from .types import IgnoreArea, LocalDiff, TestRun, TestRunStatus, _image_buffer
+
+
+def decode(image) -> numpy.ndarray:
+    """Decodes an encoded image into an RGBA array of shape (height, width, 4)."""
+    with Image.open(io.BytesIO(image)) as decoded:
+        return numpy.asarray(decoded.convert('RGBA'))
+
+
+def diff_percent(
+        image: numpy.ndarray,
+        baseline: numpy.ndarray,
+        ignoreAreas: typing.List[IgnoreArea] = None,
+) -> float:
+    """
+    Percentage of pixels that differ between image and baseline.
+
+    Pixels in ignoreAreas never count as different. Images of different size
+    differ completely.
+    """
+    if image.shape != baseline.shape:
+        return 100.0
+
+    # Compare RGBA pixels as single 32 bit words rather than per channel.
+    mismatch = _pixels(image) != _pixels(baseline)
+    for area in ignoreAreas or []:
+        x, y = area.x or 0, area.y or 0
+        mismatch[max(y, 0):max(y + (area.height or 0), 0), max(x, 0):max(x + (area.width or 0), 0)] = False
+
+    return float(numpy.count_nonzero(mismatch)) * 100 / mismatch.size
+
+
+def _pixels(image: numpy.ndarray) -> numpy.ndarray:
+    return numpy.ascontiguousarray(image).view(numpy.uint32)[:, :, 0]
+
+
+def predict(test: TestRun, baseline: bytes) -> LocalDiff:
+    """Predicts the server's verdict for a test run from its last known baseline."""
+    with _image_buffer(test) as image:
+        percent = diff_percent(decode(image), decode(baseline), test.ignoreAreas)
+    status = TestRunStatus.UNRESOLVED if percent > (test.diffTollerancePercent or 0) else TestRunStatus.OK
+    return LocalDiff(diffPercent=percent, status=status)
@@ -0,0 +1,125 @@
+import dataclasses
+import email.utils
+import random
+import threading
+import time
+import typing
+import uuid
+
+from .exceptions import CircuitOpenError
+
+# Methods that can safely be repeated, whatever happened to the first attempt.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'PATCH')
+# Responses after which an idempotent request is retried.
+RETRY_STATUSES = (429, 502, 503, 504)
+# Responses that guarantee the server did not process a request, so that
+# even a POST can be retried without creating a duplicate.
+REJECTED_STATUSES = (429, 503)
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    maxAttempts: int = 1
+    backoff: float = 0.5
+    maxBackoff: float = 30.0
+
+    def shouldRetry(self, attempt: int, method: str, status: int = None, sent: bool = True) -> bool:
+        """
+        Whether a failed attempt should be repeated.
+
+        :param attempt: Number of the failed attempt, starting at 1.
+        :param method: HTTP method of the request.
+        :param status: Response status, or None if the request failed without a response.
+        :param sent: Whether the request may have reached the server.
+        """
+        if attempt >= self.maxAttempts:
+            return False
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        if status is None:
+            return idempotent or not sent
+        return status in (RETRY_STATUSES if idempotent else REJECTED_STATUSES)
+
+    def delay(self, attempt: int, retryAfter: str = None) -> float:
+        """Seconds to wait before the next attempt: Retry-After if given, exponential backoff with full jitter otherwise."""
+        seconds = _parse_retry_after(retryAfter)
+        if seconds is None:
+            seconds = random.uniform(0, self.backoff * 2 ** (attempt - 1))
+        return min(seconds, self.maxBackoff)
+
+
+class CircuitBreaker:
+    """
+    Fails fast once the server is clearly down.
+
+    After failureThreshold consecutive failed requests, requests fail with a
+    CircuitOpenError for resetTimeout seconds. Then a single request is let
+    through, which closes the circuit again if it succeeds.
+    """
+
+    def __init__(self, failureThreshold: int = 5, resetTimeout: float = 30.0):
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self._failures = 0
+        self._openedAt = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def isOpen(self) -> bool:
+        return self._openedAt is not None
+
+    def before(self):
+        """Raises a CircuitOpenError unless a request may be sent."""
+        if not self.failureThreshold:
+            return
+        with self._lock:
+            if self._openedAt is None:
+                return
+            if not self._trial and time.monotonic() - self._openedAt >= self.resetTimeout:
+                self._trial = True
+                return
+        raise CircuitOpenError(
+            f'Server unavailable after {self._failures} consecutive failures, not sending request.')
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._openedAt = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.failureThreshold and (self._trial or self._failures >= self.failureThreshold):
+                self._openedAt = time.monotonic()
+            self._trial = False
+
+    def abandon(self):
+        """Lets another request through when the one allowed by before() was interrupted without an outcome."""
+        with self._lock:
+            self._trial = False
+
+
+def _is_server_failure(status: int) -> bool:
+    return status >= 500 or status == 429
+
+
+def _idempotency_headers(headers: dict, method: str, retry: RetryPolicy = None) -> dict:
+    """Adds an Idempotency-Key, shared by all attempts, to requests that may be retried."""
+    if retry is None or retry.maxAttempts <= 1 or method.upper() in IDEMPOTENT_METHODS:
+        return headers
+    return {**headers, 'Idempotency-Key': str(uuid.uuid4())}
+
+
+def _parse_retry_after(value: typing.Optional[str]) -> typing.Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
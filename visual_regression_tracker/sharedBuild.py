@@ -0,0 +1,140 @@
+import contextlib
+import dataclasses
+import json
+import os
+import tempfile
+import typing
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@dataclasses.dataclass
+class SharedBuildState:
+    key: str = None
+    run: str = None
+    buildId: str = None
+    projectId: str = None
+    # Number of attachments that did not stop yet, by worker id.
+    attached: typing.Dict[str, int] = dataclasses.field(default_factory=dict)
+
+    def reset(self, key: str = None, run: str = None):
+        self.key = key
+        self.run = run
+        self.buildId = None
+        self.projectId = None
+        self.attached = {}
+
+
+class SharedBuild:
+    """
+    One build shared by several processes, e.g. the workers of pytest-xdist.
+
+    The first process to start creates the build and publishes it in a
+    file-locked state file. The other processes attach to it without any
+    request, and the build is stopped whenever the last attached process
+    stops. Processes may start and stop several times.
+    """
+
+    def __init__(self, path: str, run: str = None, worker: str = None):
+        """
+        :param path: Path of the state file, the same for all processes.
+        :param run: Identifies the run of the processes, e.g. of pytest-xdist.
+            If given, processes of the run attaching after the build was
+            stopped reuse it, instead of creating a new build.
+        :param worker: Id of this process in the state file, defaults to its pid.
+        """
+        self.path = path
+        self.run = run
+        self.worker = worker or str(os.getpid())
+
+    @contextlib.contextmanager
+    def attach(self, key: str) -> typing.Iterator[SharedBuildState]:
+        """
+        Provides the shared build, while holding the lock on the state file.
+
+        If state.buildId is None, the caller must create the build and set
+        state.buildId and state.projectId. The process counts as attached
+        once the with block succeeds.
+
+        :param key: Identifies the build settings, state with another key or
+            of another run is discarded.
+        """
+        with self._locked() as state:
+            if state.key != key or state.run != self.run:
+                state.reset(key, self.run)
+            yield state
+            if state.buildId is None:
+                raise ValueError('The shared build was not created.')
+            state.attached[self.worker] = state.attached.get(self.worker, 0) + 1
+
+    def detach(self) -> bool:
+        """
+        Marks one attachment of this process as stopped.
+
+        :return: Whether no process is attached anymore, so that the build
+            must be stopped.
+        """
+        with self._locked() as state:
+            remaining = state.attached.pop(self.worker, 1) - 1
+            if remaining > 0:
+                state.attached[self.worker] = remaining
+            last = not state.attached
+            if last and self.run is None:
+                state.reset()
+        return last
+
+    @contextlib.contextmanager
+    def _locked(self) -> typing.Iterator[SharedBuildState]:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+') as f:
+            _lock(f)
+            try:
+                content = f.read()
+                state = SharedBuildState(**json.loads(content)) if content else SharedBuildState()
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(dataclasses.asdict(state)))
+                f.flush()
+            finally:
+                _unlock(f)
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _shared_build(path: str = None, environment: dict = None) -> typing.Optional[SharedBuild]:
+    """
+    Returns the SharedBuild of this process.
+
+    Without a path, the build is shared by the workers of the current
+    pytest-xdist run, if any.
+    """
+    environment = os.environ if environment is None else environment
+    testRunUid = environment.get('PYTEST_XDIST_TESTRUNUID')
+    if path is None:
+        if testRunUid is None:
+            return None
+        path = os.path.join(tempfile.gettempdir(), f'vrt-build-{testRunUid}.json')
+    return SharedBuild(path, testRunUid, environment.get('PYTEST_XDIST_WORKER'))
+
+
+def _build_key(apiUrl: str, project: str, branchName: str, ciBuildId: str) -> str:
+    return json.dumps([apiUrl, project, branchName, ciBuildId])
@@ -0,0 +1,228 @@
+"""
+Offline spool of test runs, uploaded to the server later by replay().
+"""
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import threading
+import typing
+
+from .types import \
+    TestRun, TestRunResponse, TestRunStatus, _image_buffer, _to_dict_without_image, _from_dict
+from .config import Config
+from .cache import _response_to_json
+
+
+@dataclasses.dataclass
+class SpooledBuild:
+    id: int = None
+    ciBuildId: str = None
+    branchName: str = None
+    project: str = None
+    buildId: str = None
+    projectId: str = None
+    finished: bool = False
+
+
+@dataclasses.dataclass
+class ReplayResult:
+    uploaded: int = 0
+    new: int = 0
+    unresolved: int = 0
+    errors: list = dataclasses.field(default_factory=list)
+
+
+class Spool:
+    """
+    Append-only SQLite spool of builds and their test runs.
+
+    In spool mode, trackers append test runs here, with their raw image,
+    instead of sending them to the server. Identical test runs of a build are
+    stored once. replay() uploads them later and marks each uploaded test
+    run, so an interrupted replay resumes where it stopped.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens (or creates) the spool database
+
+        :param path: Path of the SQLite database file.
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            # Appends must be cheap, the spool is written while tests are running.
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS builds ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' ciBuildId TEXT,'
+                ' branchName TEXT,'
+                ' project TEXT,'
+                ' buildId TEXT,'
+                ' projectId TEXT,'
+                ' finished INTEGER NOT NULL DEFAULT 0,'
+                ' stopped INTEGER NOT NULL DEFAULT 0'
+                ')'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS testRuns ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' build INTEGER NOT NULL,'
+                ' digest TEXT NOT NULL,'
+                ' test TEXT NOT NULL,'
+                ' image BLOB,'
+                ' response TEXT,'
+                ' UNIQUE (build, digest)'
+                ')'
+            )
+
+    def addBuild(self, ciBuildId: str, branchName: str, project: str) -> int:
+        """Adds a build, to be created on the server on replay, and returns its id in the spool."""
+        with self._lock, self._connection:
+            return self._connection.execute(
+                'INSERT INTO builds (ciBuildId, branchName, project) VALUES (?, ?, ?)',
+                (ciBuildId, branchName, project)).lastrowid
+
+    def finishBuild(self, build: int):
+        """Marks a build as complete, so replay() stops it once all its test runs are uploaded."""
+        with self._lock, self._connection:
+            self._connection.execute('UPDATE builds SET finished = 1 WHERE id = ?', (build,))
+
+    def append(self, build: int, test: TestRun) -> bool:
+        """
+        Appends a test run to a build.
+
+        :return: False if the same test run was appended to the build before.
+        """
+        data = json.dumps(_to_dict_without_image(test), sort_keys=True)
+        with _image_buffer(test) as image:
+            digest = hashlib.sha256(data.encode('utf-8'))
+            digest.update(image)
+            with self._lock, self._connection:
+                return self._connection.execute(
+                    'INSERT OR IGNORE INTO testRuns (build, digest, test, image) VALUES (?, ?, ?, ?)',
+                    (build, digest.hexdigest(), data, image)).rowcount > 0
+
+    def builds(self) -> typing.List[SpooledBuild]:
+        """Returns the builds that were not stopped on the server yet, oldest first."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, ciBuildId, branchName, project, buildId, projectId, finished'
+                ' FROM builds WHERE stopped = 0 ORDER BY id').fetchall()
+        return [SpooledBuild(*row[:6], finished=bool(row[6])) for row in rows]
+
+    def pending(self, build: int) -> typing.Iterator[typing.Tuple[int, TestRun]]:
+        """Yields the id and the test run of each test run of a build that was not uploaded yet."""
+        with self._lock:
+            ids = [row[0] for row in self._connection.execute(
+                'SELECT id FROM testRuns WHERE build = ? AND response IS NULL ORDER BY id', (build,))]
+        # Images are loaded one at a time, as they are uploaded.
+        for testRunId in ids:
+            with self._lock:
+                data, image = self._connection.execute(
+                    'SELECT test, image FROM testRuns WHERE id = ?', (testRunId,)).fetchone()
+            test = _from_dict(json.loads(data), TestRun)
+            test.imageBytes = image
+            yield testRunId, test
+
+    def setBuild(self, build: int, buildId: str, projectId: str):
+        """Records the server build created for a spooled build."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE builds SET buildId = ?, projectId = ? WHERE id = ?', (buildId, projectId, build))
+
+    def markUploaded(self, testRun: int, response: TestRunResponse):
+        """Records the server's response to a test run, and drops its image."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE testRuns SET response = ?, image = NULL WHERE id = ?',
+                (_response_to_json(response), testRun))
+
+    def markStopped(self, build: int):
+        with self._lock, self._connection:
+            self._connection.execute('UPDATE builds SET stopped = 1 WHERE id = ?', (build,))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def replay(path: str, config: Config = None, maxConcurrency: int = None) -> ReplayResult:
+    """
+    Uploads the test runs spooled at path.
+
+    Each spooled build is created on the server on its first replay, and
+    stopped once it was finished and all of its test runs are uploaded.
+    Uploaded test runs are marked in the spool, so replaying again, after a
+    crash or failed uploads, only sends the others.
+
+    :param path: Path of the spool database file.
+    :param config: The configuration to upload with, defaults to
+        Config.default(). Its ciBuildId, branchName and project are replaced
+        by the ones of each spooled build.
+    :param maxConcurrency: Max. number of uploads in flight, defaults to Config.maxConcurrency.
+    :return: The ReplayResult. Failed uploads are listed in errors.
+    """
+    config = config or Config.default()
+    result = ReplayResult()
+    spool = Spool(path)
+    try:
+        for build in spool.builds():
+            _replay_build(spool, build, config, maxConcurrency, result)
+    finally:
+        spool.close()
+    return result
+
+
+def _replay_build(spool: Spool, build: SpooledBuild, config: Config, maxConcurrency: int, result: ReplayResult):
+    from .visualRegressionTracker import VisualRegressionTracker
+
+    tracker = VisualRegressionTracker(dataclasses.replace(
+        config,
+        ciBuildId=build.ciBuildId,
+        branchName=build.branchName,
+        project=build.project,
+        enableSoftAssert=True,
+        shareBuild=False,
+        spoolPath=None,
+    ))
+    if build.buildId is None:
+        tracker.start()
+        spool.setBuild(build.id, tracker.buildId, tracker.projectId)
+    else:
+        tracker.buildId = build.buildId
+        tracker.projectId = build.projectId
+
+    ids = []
+
+    def tests():
+        for testRunId, test in spool.pending(build.id):
+            ids.append(testRunId)
+            yield test
+
+    failed = False
+    try:
+        for index, _, future in tracker._trackConcurrently(tests(), maxConcurrency):
+            if future.exception() is not None:
+                result.errors.append(future.exception())
+                failed = True
+                continue
+            response = future.result().testRunResponse
+            spool.markUploaded(ids[index], response)
+            result.uploaded += 1
+            if response.status == TestRunStatus.NEW:
+                result.new += 1
+            elif response.status == TestRunStatus.UNRESOLVED:
+                result.unresolved += 1
+    except BaseException:
+        tracker._close()
+        raise
+
+    if build.finished and not failed:
+        tracker.stop()
+        spool.markStopped(build.id)
+    else:
+        tracker._close()
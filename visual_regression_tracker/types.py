@@ -1,9 +1,17 @@
+import base64
+import contextlib
 import dataclasses
 import enum
+import mmap
+import os
+import pathlib
 import typing
-import dacite
 
+from . import codec
+from .instrumentation import Timings
 
+
+@codec.register
 @dataclasses.dataclass
 class IgnoreArea:
     x: int = None
@@ -12,6 +20,7 @@ class IgnoreArea:
     height: int  = None
 
 
+@codec.register
 @dataclasses.dataclass
 class TestRun:
     name: str = None
@@ -22,8 +31,14 @@ class TestRun:
     device: str = None
     diffTollerancePercent: float = None
     ignoreAreas: typing.List[IgnoreArea] = None
+    imageBytes: typing.Union[bytes, bytearray, memoryview] = None
+    imagePath: typing.Union[str, pathlib.Path] = None
+
 
+_IMAGE_FIELDS = ('imageBase64', 'imageBytes', 'imagePath')
 
+
+@codec.register
 @dataclasses.dataclass
 class Build:
     id: str = None
@@ -36,6 +51,7 @@ class TestRunStatus(enum.Enum):
     UNRESOLVED = 'unresolved'
 
 
+@codec.register
 @dataclasses.dataclass
 class TestRunResponse:
     id: str = None
@@ -50,34 +66,114 @@ class TestRunResponse:
     diffTollerancePercent: typing.Optional[float] = None
 
 
+@dataclasses.dataclass
+class LocalDiff:
+    diffPercent: float = None
+    status: TestRunStatus = None
+
+
+@dataclasses.dataclass
+class Recompression:
+    originalSize: int = None
+    size: int = None
+    seconds: float = None
+
+
+@dataclasses.dataclass
+class Stabilization:
+    attempts: int = None
+    settleTime: float = None
+    stable: bool = None
+
+
 @dataclasses.dataclass
 class TestRunResult:
     testRunResponse: TestRunResponse = None
     imageUrl: str = None
     diffUrl: str = None
     baselineUrl: str = None
-
-    def __init__(self, test_run_response: TestRunResponse, api_url: str):
+    cached: bool = False
+    localDiff: LocalDiff = None
+    recompression: Recompression = None
+    timings: Timings = None
+    spooled: bool = False
+    stabilization: Stabilization = None
+
+    def __init__(
+            self,
+            test_run_response: typing.Optional[TestRunResponse],
+            api_url: str,
+            cached: bool = False,
+            spooled: bool = False,
+    ):
         """
         Converts image names into urls
 
-        :param test_run_response: The response to convert.
+        :param test_run_response: The response to convert, None if the test
+            run was spooled.
         :param api_url: URL to use in image urls
+        :param cached: Whether the response was taken from the local image cache.
+        :param spooled: Whether the test run was spooled instead of uploaded.
         """
         self.testRunResponse = test_run_response
+        self.cached = cached
+        self.spooled = spooled
+        if test_run_response is None:
+            return
         self.imageUrl = f'{api_url}/{test_run_response.imageName}'
         self.diffUrl = test_run_response.diffName and f'{api_url}/{test_run_response.diffName}'
         self.baselineUrl = test_run_response.baselineName and f'{api_url}/{test_run_response.baselineName}'
 
 
 def _to_dict(obj):
-    def dict_factory(key_values):
-        return dict(kv for kv in key_values if kv[1] is not None)
-
-    data = dataclasses.asdict(obj, dict_factory=dict_factory)
+    data = codec.encoder(type(obj))(obj)
     return data
 
 
+def _to_dict_without_image(test: TestRun) -> dict:
+    return codec.encoder(TestRun, _IMAGE_FIELDS)(test)
+
+
+def _has_image(test: TestRun) -> bool:
+    return test.imageBase64 is not None or test.imageBytes is not None or test.imagePath is not None
+
+
+@contextlib.contextmanager
+def _image_buffer(test: TestRun):
+    """
+    Provides the raw image of a test run as a bytes-like object.
+
+    Image files are memory-mapped instead of being read into memory.
+    """
+    if test.imageBytes is not None:
+        yield test.imageBytes
+    elif test.imagePath is not None:
+        with open(test.imagePath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b''
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+                    yield image
+    else:
+        yield base64.b64decode(test.imageBase64 or '')
+
+
+def _image_size(test: TestRun) -> int:
+    """Size of the raw image of a test run, without reading image files."""
+    if test.imageBytes is not None:
+        return memoryview(test.imageBytes).nbytes
+    if test.imagePath is not None:
+        return os.path.getsize(test.imagePath)
+    return len(test.imageBase64 or '') * 3 // 4
+
+
+def _image_bytes(test: TestRun) -> bytes:
+    if isinstance(test.imageBytes, bytes):
+        return test.imageBytes
+    with _image_buffer(test) as image:
+        return bytes(image)
+
+
 def _from_dict(data, clazz):
-    obj = dacite.from_dict(clazz, data)
+    obj = codec.decoder(clazz)(data)
     return obj
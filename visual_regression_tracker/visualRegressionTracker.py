@@ -1,14 +1,39 @@
+import base64
+import concurrent.futures
+import contextlib
+import dataclasses
+import itertools
 import json
 import logging
+import os
+import re
+import threading
+import time
+
+import typing
 
 import requests
+import requests.adapters
+import urllib3.exceptions
 
 from .types import \
     Build, TestRun, TestRunResponse, TestRunStatus, \
-    _to_dict, _from_dict, TestRunResult
+    _from_dict, TestRunResult, Recompression, \
+    _to_dict_without_image, _has_image, _image_buffer, _image_bytes, _image_size
 from .exceptions import \
-    ServerError, TestRunError, VisualRegressionTrackerError
+    AggregateTrackError, CircuitOpenError, ServerError, TestRunError, VisualRegressionTrackerError
 from .config import Config
+from .cache import ImageCache, _lookup, _predict
+from .concurrency import AdaptiveLimiter, ByteBudget
+from .instrumentation import Listeners, Timings
+from .sharedBuild import _build_key, _shared_build
+from .spool import Spool
+from .retry import CircuitBreaker, RetryPolicy, _is_server_failure, _idempotency_headers
+from . import png
+
+
+# Responses of servers without the multipart endpoint.
+MULTIPART_UNSUPPORTED_STATUSES = (404, 405, 415)
 
 
 class VisualRegressionTracker:
@@ -16,6 +41,7 @@ class VisualRegressionTracker:
     buildId: str = None
     projectId: str = None
     headers: dict = None
+    limiter: AdaptiveLimiter = None
 
     def __init__(self, config: Config = None):
         """
@@ -29,40 +55,185 @@ class VisualRegressionTracker:
             'project': self.config.project
         }
         self.config.check_complete()
+        self._retry = RetryPolicy(
+            maxAttempts=self.config.retryMaxAttempts,
+            backoff=self.config.retryBackoff,
+            maxBackoff=self.config.retryMaxBackoff,
+        )
+        self._breaker = CircuitBreaker(
+            failureThreshold=self.config.circuitBreakerThreshold,
+            resetTimeout=self.config.circuitBreakerResetTimeout,
+        )
+        self._session = None
+        self._sessionPid = None
+        self._sessionLock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+        self._failed = []
+        self._pendingLock = threading.Lock()
+        self._queueSlots = threading.BoundedSemaphore(2 * self.config.maxConcurrency)
+        self._multipartSupported = True
+        self._cache = None
+        self._cacheLock = threading.Lock()
+        self._listeners = Listeners()
+        self._sharedBuild = _shared_build(self.config.sharedBuildPath) if self.config.shareBuild else None
+        self._spool = None
+        self._spoolBuild = None
+        self._byteBudget = ByteBudget(self.config.maxBytesInFlight) if self.config.maxBytesInFlight else None
+        self.limiter = AdaptiveLimiter(
+            self.config.minConcurrency, self.config.maxConcurrency) if self.config.adaptiveConcurrency else None
+
+    def addListener(self, listener: typing.Callable):
+        """
+        Registers a callback that is notified after every track call.
+
+        :param listener: Called with the TestRun, its Timings and the
+            TestRunResult, or None if tracking failed.
+        """
+        self._listeners.add(listener)
+
+    def removeListener(self, listener: typing.Callable):
+        self._listeners.remove(listener)
+
+    def _getSession(self) -> requests.Session:
+        """
+        Returns the pooled session shared by all requests of this tracker.
+
+        The session is created on first use and re-created in a forked child,
+        as pooled connections must not be shared between processes.
+        """
+        with self._sessionLock:
+            if self._session is None or self._sessionPid != os.getpid():
+                self._session = _create_session(self.config)
+                self._sessionPid = os.getpid()
+            return self._session
+
+    def _closeSession(self):
+        with self._sessionLock:
+            if self._session is not None and self._sessionPid == os.getpid():
+                self._session.close()
+            self._session = None
+            self._sessionPid = None
+
+    def _getCache(self) -> ImageCache:
+        """Returns the local image cache, or None if it is disabled."""
+        if not self.config.cachePath:
+            return None
+        with self._cacheLock:
+            if self._cache is None:
+                self._cache = ImageCache(self.config.cachePath, self.config.cacheMaxEntries)
+            return self._cache
+
+    def _closeCache(self):
+        with self._cacheLock:
+            if self._cache is not None:
+                self._cache.close()
+            self._cache = None
+
+    def _closeSpool(self):
+        if self._spool is not None:
+            self._spool.close()
+        self._spool = None
+        self._spoolBuild = None
+        self._byteBudget = ByteBudget(self.config.maxBytesInFlight) if self.config.maxBytesInFlight else None
+
+    def _close(self):
+        """Releases the connections and files of this tracker."""
+        self._closeSession()
+        self._closeCache()
+        self._closeSpool()
+
+    def _recompress(self, test: TestRun):
+        """
+        Re-compresses a PNG image with Config.pngCompressionLevel.
+
+        zlib releases the GIL, so test runs tracked by trackNowait() or
+        trackMany() are re-compressed in parallel by their worker threads.
+
+        :return: The test run with the re-compressed image and the Recompression
+            statistics, or the unchanged test run and None.
+        """
+        if self.config.pngCompressionLevel is None or not _has_image(test):
+            return test, None
+        image = _image_bytes(test)
+        if not png.is_png(image):
+            return test, None
+
+        start = time.perf_counter()
+        compressed = png.recompress(image, self.config.pngCompressionLevel)
+        recompression = Recompression(len(image), len(compressed), time.perf_counter() - start)
+        _log_recompression(test, recompression)
+        return _with_image(test, compressed), recompression
 
     def _isStarted(self):
-        return self.buildId is not None and self.projectId is not None
+        return self._spoolBuild is not None or (self.buildId is not None and self.projectId is not None)
 
     def start(self):
-        data = {
-            'ciBuildId': self.config.ciBuildId,
-            'branchName': self.config.branchName,
-            'project': self.config.project,
-        }
+        if self.config.spoolPath:
+            # Offline, the build is created on the server by replay().
+            self._spool = Spool(self.config.spoolPath)
+            self._spoolBuild = self._spool.addBuild(
+                self.config.ciBuildId, self.config.branchName, self.config.project)
+            return
+
+        if self._sharedBuild is None:
+            build = self._createBuild()
+            self.buildId = build.id
+            self.projectId = build.projectId
+            return
+
+        key = _build_key(self.config.apiUrl, self.config.project, self.config.branchName, self.config.ciBuildId)
+        with self._sharedBuild.attach(key) as state:
+            if state.buildId is None:
+                build = self._createBuild()
+                state.buildId = build.id
+                state.projectId = build.projectId
+        self.buildId = state.buildId
+        self.projectId = state.projectId
+
+    def _createBuild(self) -> Build:
         result = _http_request(
             f'{self.config.apiUrl}/builds',
             'post',
-            data,
-            self.headers
+            _build_data(self.config),
+            self.headers,
+            session=self._getSession(),
+            retry=self._retry,
+            breaker=self._breaker,
         )
-        build = _from_dict(result, Build)
-        self.buildId = build.id
-        self.projectId = build.projectId
+        return _from_dict(result, Build)
 
     def stop(self):
         if not self._isStarted():
             raise VisualRegressionTrackerError(
                 "Visual Regression Tracker has not been started")
 
-        _http_request(
-            f'{self.config.apiUrl}/builds/{self.buildId}',
-            'patch',
-            data={},
-            headers=self.headers
-        )
+        errors = self._drain()
+        try:
+            if self._spoolBuild is not None:
+                self._spool.finishBuild(self._spoolBuild)
+            # Only the last process stops a shared build.
+            elif self._sharedBuild is None or self._sharedBuild.detach():
+                _http_request(
+                    f'{self.config.apiUrl}/builds/{self.buildId}',
+                    'patch',
+                    data={},
+                    headers=self.headers,
+                    session=self._getSession(),
+                    retry=self._retry,
+                    breaker=self._breaker,
+                )
+        finally:
+            self._close()
         self.buildId = None
         self.projectId = None
 
+        if errors and self.config.enableSoftAssert:
+            for error in errors:
+                logging.getLogger(__name__).error('Background test run failed: %s', error)
+        elif errors:
+            raise AggregateTrackError(errors)
+
     def __enter__(self):
         """Start the build."""
         self.start()
@@ -72,60 +243,609 @@ class VisualRegressionTracker:
         """Stop the build."""
         self.stop()
 
-    def _submitTestResult(self, test: TestRun) -> TestRunResponse:
+    def _submitTestResult(self, test: TestRun, timings: Timings = None) -> TestRunResponse:
         if not self._isStarted():
             raise VisualRegressionTrackerError(
                 "Visual Regression Tracker has not been started")
+        timings = timings or Timings()
 
-        data = _to_dict(test)
-        data.update(
-            buildId=self.buildId,
-            projectId=self.projectId,
-            branchName=self.config.branchName,
-        )
+        if self.config.multipartUpload and self._multipartSupported:
+            fields, files = _test_run_multipart(test, self.config, self.buildId, self.projectId, timings)
+            try:
+                with timings.phase('request'):
+                    result = _http_request(
+                        f'{self.config.apiUrl}/test-runs/multipart',
+                        'post',
+                        fields,
+                        self.headers,
+                        session=self._getSession(),
+                        retry=self._retry,
+                        breaker=self._breaker,
+                        files=files,
+                    )
+            except ServerError as e:
+                if e.status not in MULTIPART_UNSUPPORTED_STATUSES:
+                    raise
+                _log_multipart_fallback(e)
+                self._multipartSupported = False
+            else:
+                with timings.phase('parse'):
+                    return _parse_test_run_response(result)
 
-        result = _http_request(
-            f'{self.config.apiUrl}/test-runs',
-            'post',
-            data,
-            self.headers
-        )
-        result['status'] = TestRunStatus(result['status'])
-        testRunResult = _from_dict(result, TestRunResponse)
+        data = _test_run_data(test, self.config, self.buildId, self.projectId, timings)
+        with timings.phase('request'):
+            result = _http_request(
+                f'{self.config.apiUrl}/test-runs',
+                'post',
+                data,
+                self.headers,
+                session=self._getSession(),
+                retry=self._retry,
+                breaker=self._breaker,
+            )
+        with timings.phase('parse'):
+            return _parse_test_run_response(result)
+
+    def track(self, test: TestRun, timings: Timings = None) -> TestRunResult:
+        """
+        Tracks a test run.
+
+        :param test: The test run to track.
+        :param timings: Timings to add the phases of this call to, e.g. with
+            the time spent taking the screenshot.
+        :return: The TestRunResult, with the Timings of this call.
+        """
+        timings = timings or Timings()
+        result = None
+        try:
+            result = self._track(test, timings)
+            return result
+        finally:
+            timings.finish()
+            self._listeners.emit(test, timings, result)
+
+    def _track(self, test: TestRun, timings: Timings) -> TestRunResult:
+        if self._spoolBuild is not None:
+            with timings.phase('spool'):
+                self._spool.append(self._spoolBuild, test)
+            result = TestRunResult(None, self.config.apiUrl, spooled=True)
+            result.timings = timings
+            return result
+
+        cache = self._getCache()
+        localDiff = None
+        if cache is not None:
+            with timings.phase('cache'):
+                key, digest, cached = _lookup(cache, test, self.config.project, self.config.branchName)
+            if cached is None and self.config.enableLocalDiff:
+                with timings.phase('localDiff'):
+                    localDiff, cached = _predict(cache, key, test)
+            if cached is not None:
+                result = TestRunResult(cached, self.config.apiUrl, cached=True)
+                result.localDiff = localDiff
+                result.timings = timings
+                return result
+
+        with self._bytesInFlight(test, timings):
+            submitted, recompression = self._recompress(test)
+            if recompression is not None:
+                timings.phases['recompress'] = recompression.seconds
+            with self._requestSlot(timings):
+                response = self._submitTestResult(submitted, timings)
+            del submitted
+        if cache is not None:
+            cache.put(key, digest, response)
+            if self.config.enableLocalDiff:
+                with timings.phase('baseline'):
+                    self._updateBaseline(cache, key, response)
+        result = _track_result(response, self.config)
+        result.localDiff = localDiff
+        result.recompression = recompression
+        result.timings = timings
+        return result
+
+    @contextlib.contextmanager
+    def _bytesInFlight(self, test: TestRun, timings: Timings):
+        """Holds the size of the test run's image in the Config.maxBytesInFlight budget."""
+        if self._byteBudget is None or not _has_image(test):
+            yield
+            return
+        size = _image_size(test)
+        with timings.phase('backpressure'):
+            self._byteBudget.acquire(size)
+        try:
+            yield
+        finally:
+            self._byteBudget.release(size)
+
+    @contextlib.contextmanager
+    def _requestSlot(self, timings: Timings):
+        """Holds a request slot of the adaptive concurrency limit, and reports the request's outcome to it."""
+        if self.limiter is None:
+            yield
+            return
+        with timings.phase('backpressure'):
+            self.limiter.acquire()
+        latency, overloaded = None, False
+        try:
+            before = timings.phases.get('request', 0.0)
+            yield
+            latency = timings.phases.get('request', 0.0) - before
+        except ServerError as e:
+            overloaded = _is_overload(e)
+            raise
+        finally:
+            self.limiter.release(latency, overloaded)
+
+    def _updateBaseline(self, cache: ImageCache, key: str, response: TestRunResponse):
+        """
+        Downloads the test run's baseline into the cache when it changed.
+
+        The test run is already tracked, so a failed download is only logged.
+        """
+        if response.baselineName and cache.getBaseline(key)[0] != response.baselineName:
+            try:
+                image = _http_get(
+                    f'{self.config.apiUrl}/{response.baselineName}',
+                    self.headers,
+                    session=self._getSession(),
+                    retry=self._retry,
+                    breaker=self._breaker,
+                )
+            except ServerError as e:
+                _log_baseline_failure(response, e)
+                return
+            cache.putBaseline(key, response.baselineName, image)
+
+    def trackNowait(self, test: TestRun) -> concurrent.futures.Future:
+        """
+        Tracks the test run in the background.
+
+        Blocks only while the submission queue is full. stop() waits for all
+        pending test runs, and raises an AggregateTrackError for the ones that
+        failed without their error being retrieved from the future, by
+        result() or exception(). With Config.enableSoftAssert, these errors
+        are logged instead.
+
+        :param test: The test run to track.
+        :return: A future resolving to the TestRunResult.
+        """
+        if not self._isStarted():
+            raise VisualRegressionTrackerError(
+                "Visual Regression Tracker has not been started")
+
+        self._queueSlots.acquire()
+        try:
+            with self._pendingLock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.config.maxConcurrency,
+                        thread_name_prefix='vrt',
+                    )
+                future = _TrackFuture()
+                self._executor.submit(_run_future, future, self.track, test)
+                self._pending.add(future)
+        except BaseException:
+            self._queueSlots.release()
+            raise
+        future.add_done_callback(self._onNowaitDone)
+        return future
+
+    def trackMany(
+            self,
+            tests: typing.Iterable[TestRun],
+            maxConcurrency: int = None,
+    ) -> typing.List[TestRunResult]:
+        """
+        Tracks many test runs concurrently over the shared connection pool.
+
+        Test runs are pulled lazily from tests, so it may be a generator.
+        Failed test runs are reported together in an AggregateTrackError once
+        all of them were submitted.
+
+        :param tests: The test runs to track.
+        :param maxConcurrency: Max. number of test runs in flight, defaults to Config.maxConcurrency.
+        :return: The results, in the same order as tests.
+        """
+        results = {}
+        errors = []
+        for index, _, future in self._trackConcurrently(tests, maxConcurrency):
+            if future.exception() is not None:
+                errors.append((index, future.exception()))
+            else:
+                results[index] = future.result()
+
+        if errors:
+            raise AggregateTrackError([error for _, error in sorted(errors, key=lambda e: e[0])])
+        return [results[index] for index in range(len(results))]
+
+    def trackManyAsCompleted(
+            self,
+            tests: typing.Iterable[TestRun],
+            maxConcurrency: int = None,
+    ) -> typing.Iterator[typing.Tuple[TestRun, TestRunResult]]:
+        """
+        Tracks many test runs concurrently, yielding results as they complete.
+
+        A failed test run raises its error when its result is reached.
+
+        :param tests: The test runs to track.
+        :param maxConcurrency: Max. number of test runs in flight, defaults to Config.maxConcurrency.
+        :return: An iterator of (test run, result) pairs, in completion order.
+        """
+        for _, test, future in self._trackConcurrently(tests, maxConcurrency):
+            yield test, future.result()
 
-        return testRunResult
+    def _trackConcurrently(self, tests: typing.Iterable[TestRun], maxConcurrency: int = None):
+        if not self._isStarted():
+            raise VisualRegressionTrackerError(
+                "Visual Regression Tracker has not been started")
+
+        maxConcurrency = maxConcurrency or self.config.maxConcurrency
+        indexed = enumerate(tests)
+        pending = {}
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=maxConcurrency,
+                thread_name_prefix='vrt',
+        ) as executor:
+            try:
+                for index, test in itertools.islice(indexed, maxConcurrency):
+                    pending[executor.submit(self.track, test)] = (index, test)
+
+                while pending:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        index, test = pending.pop(future)
+                        for nextIndex, nextTest in itertools.islice(indexed, 1):
+                            pending[executor.submit(self.track, nextTest)] = (nextIndex, nextTest)
+                        yield index, test, future
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _onNowaitDone(self, future: concurrent.futures.Future):
+        with self._pendingLock:
+            self._pending.discard(future)
+            if not future.cancelled() and future.peekException() is not None:
+                self._failed.append(future)
+        self._queueSlots.release()
+
+    def _drain(self) -> list:
+        """Waits for all background test runs and returns their errors the caller did not retrieve."""
+        with self._pendingLock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._pendingLock:
+            failed, self._failed = self._failed, []
+        return [future.peekException() for future in failed if not future.retrieved]
+
+
+class _TrackFuture(concurrent.futures.Future):
+    """Future of trackNowait(), remembers whether its outcome was retrieved."""
+
+    retrieved = False
+
+    def result(self, timeout=None):
+        self.retrieved = True
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        self.retrieved = True
+        return super().exception(timeout)
+
+    def peekException(self):
+        """The exception of the finished future, without marking it retrieved."""
+        return super().exception(0)
+
+
+def _run_future(future: concurrent.futures.Future, fn, *args):
+    """Resolves future with fn(*args), unless it was cancelled."""
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = fn(*args)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+def _build_data(config: Config) -> dict:
+    return {
+        'ciBuildId': config.ciBuildId,
+        'branchName': config.branchName,
+        'project': config.project,
+    }
+
+
+def _test_run_fields(test: TestRun, config: Config, buildId: str, projectId: str) -> dict:
+    data = _to_dict_without_image(test)
+    data.update(
+        buildId=buildId,
+        projectId=projectId,
+        branchName=config.branchName,
+    )
+    return data
+
+
+def _test_run_data(
+        test: TestRun, config: Config, buildId: str, projectId: str, timings: Timings = None) -> '_JsonBody':
+    timings = timings or Timings()
+    with timings.phase('serialize'):
+        data = _test_run_fields(test, config, buildId, projectId)
+    if not _has_image(test):
+        return _JsonBody(data)
+    with timings.phase('encode'):
+        body = _JsonBody(data, test)
+    timings.bytes['upload'] = body.imageLength
+    return body
+
+
+class _JsonBody:
+    """
+    JSON body of a test run, with the image base64 encoded while it is sent.
+
+    Neither the base64 string nor the JSON document of the whole image are
+    ever in memory, only one chunk at a time. The body can be iterated again,
+    e.g. to retry the request.
+    """
+
+    # A multiple of 3, so that chunks encode without padding.
+    CHUNK_SIZE = 3 * 64 * 1024
+
+    def __init__(self, fields: dict, test: TestRun = None):
+        """
+        :param fields: The JSON fields, except the image.
+        :param test: The test run to send the image of as imageBase64.
+        """
+        self.fields = fields
+        self.test = test
+        document = json.dumps(fields, allow_nan=False).encode('utf-8')
+        if test is None:
+            self._prefix, self._suffix = document, b''
+            self.imageLength = 0
+            return
+        separator = b', ' if fields else b''
+        self._prefix = document[:-1] + separator + b'"imageBase64": "'
+        self._suffix = b'"}'
+        if test.imageBase64 is not None:
+            self._imageBase64 = _json_string_content(test.imageBase64)
+            self.imageLength = len(self._imageBase64)
+        else:
+            self.imageLength = (_image_size(test) + 2) // 3 * 4
+
+    def __len__(self) -> int:
+        return len(self._prefix) + self.imageLength + len(self._suffix)
+
+    def __iter__(self) -> typing.Iterator[bytes]:
+        yield self._prefix
+        if self.test is not None and self.test.imageBase64 is not None:
+            for start in range(0, len(self._imageBase64), self.CHUNK_SIZE):
+                yield self._imageBase64[start:start + self.CHUNK_SIZE].encode('ascii')
+        elif self.test is not None:
+            with _image_buffer(self.test) as image, memoryview(image) as view, view.cast('B') as octets:
+                for start in range(0, len(octets), self.CHUNK_SIZE):
+                    yield base64.b64encode(octets[start:start + self.CHUNK_SIZE])
+        yield self._suffix
+
+    def __bytes__(self) -> bytes:
+        return b''.join(self)
+
+    def json(self) -> dict:
+        """The fields of the body, including the base64 encoded image."""
+        return json.loads(bytes(self))
+
+
+# Characters json.dumps() escapes in strings, never part of valid base64.
+_JSON_ESCAPED = re.compile(r'[\x00-\x1f"\\\x7f-\U0010ffff]')
 
-    def track(self, test: TestRun):
-        result = self._submitTestResult(test)
 
-        switcher = {
-            TestRunStatus.NEW: f'No baseline: {result.url}',
-            TestRunStatus.UNRESOLVED: f'Difference found: {result.url}'
+def _json_string_content(value: str) -> str:
+    """The value as it appears between the quotes of a JSON string, escaped like by json.dumps()."""
+    if _JSON_ESCAPED.search(value) is None:
+        return value
+    return json.dumps(value)[1:-1]
+
+
+def _test_run_multipart(test: TestRun, config: Config, buildId: str, projectId: str, timings: Timings = None):
+    """Splits a test run into multipart form fields and the raw image file."""
+    timings = timings or Timings()
+    with timings.phase('serialize'):
+        data = _test_run_fields(test, config, buildId, projectId)
+        fields = {
+            key: json.dumps(value) if isinstance(value, (list, dict)) else str(value)
+            for key, value in data.items()
         }
-        error_message = switcher.get(result.status, '')
+    with timings.phase('encode'):
+        image = _image_bytes(test)
+    timings.bytes['upload'] = len(image)
+    files = {'image': ('image.png', image, 'image/png')}
+    return fields, files
+
+
+def _with_image(test: TestRun, image: bytes) -> TestRun:
+    return dataclasses.replace(test, imageBase64=None, imageBytes=image, imagePath=None)
+
+
+def _log_recompression(test: TestRun, recompression: Recompression):
+    logging.getLogger(__name__).debug(
+        'Re-compressed %s from %d to %d bytes in %.3fs.', test.name,
+        recompression.originalSize, recompression.size, recompression.seconds)
+
+
+def _log_baseline_failure(response: TestRunResponse, error: ServerError):
+    logging.getLogger(__name__).warning(
+        'Failed to download baseline %s for the local diff: %s', response.baselineName, error)
+
+
+def _log_multipart_fallback(error: ServerError):
+    logging.getLogger(__name__).warning(
+        'Multipart upload is not supported by the server (%s), falling back to JSON.', error)
+
+
+def _parse_test_run_response(result: dict) -> TestRunResponse:
+    result['status'] = TestRunStatus(result['status'])
+    return _from_dict(result, TestRunResponse)
+
+
+def _track_result(result: TestRunResponse, config: Config) -> TestRunResult:
+    switcher = {
+        TestRunStatus.NEW: f'No baseline: {result.url}',
+        TestRunStatus.UNRESOLVED: f'Difference found: {result.url}'
+    }
+    error_message = switcher.get(result.status, '')
+
+    if error_message:
+        if config.enableSoftAssert:
+            logging.getLogger(__name__).error(error_message)
+        else:
+            raise TestRunError(result.status, error_message)
+
+    return TestRunResult(result, config.apiUrl)
+
+
+def _create_session(config: Config) -> requests.Session:
+    factory = TRANSPORTS.get(config.transport)
+    if factory is None:
+        raise VisualRegressionTrackerError(
+            f'Unknown transport {config.transport!r}, expected one of {", ".join(TRANSPORTS)}')
+    return factory(config)
 
-        if error_message:
-            if self.config.enableSoftAssert:
-                logging.getLogger(__name__).error(error_message)
+
+def _create_http1_session(config: Config) -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=config.httpPoolSize,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not config.httpKeepAlive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def _create_http2_session(config: Config):
+    from .http2 import Http2Session  # needs httpx and h2
+
+    return Http2Session(config)
+
+
+# Session factories by Config.transport. Sessions need the get(), post(),
+# patch() and close() methods of requests.Session, and raise its exceptions.
+TRANSPORTS = {
+    'http1': _create_http1_session,
+    'http2': _create_http2_session,
+}
+
+
+def _http_request(
+        url: str,
+        method: str,
+        data: dict,
+        headers: dict,
+        session: requests.Session = None,
+        files: dict = None,
+        retry: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+) -> dict:
+    request = getattr(session or requests, method.lower())
+    headers = _idempotency_headers(headers, method, retry)
+    if files:
+        response = _send(lambda: request(url, data=data, files=files, headers=headers), method, retry, breaker)
+    elif isinstance(data, _JsonBody):
+        headers = {**headers, 'Content-Type': 'application/json'}
+        response = _send(lambda: request(url, data=data, headers=headers), method, retry, breaker)
+    else:
+        response = _send(lambda: request(url, json=data, headers=headers), method, retry, breaker)
+    return _check_response(response.status_code, _json_body(response))
+
+
+def _http_get(
+        url: str,
+        headers: dict,
+        session: requests.Session = None,
+        retry: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+) -> bytes:
+    response = _send(lambda: (session or requests).get(url, headers=headers), 'get', retry, breaker)
+    if response.status_code >= 400:
+        raise ServerError(f'Failed to download {url}', status=response.status_code)
+    return response.content
+
+
+def _send(send, method: str, retry: RetryPolicy = None, breaker: CircuitBreaker = None) -> requests.Response:
+    """Sends a request with send(), retrying failed attempts as allowed by the policy."""
+    retry = retry or RetryPolicy()
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            breaker.before()
+        try:
+            response = send()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if breaker is not None:
+                breaker.failure()
+            if not retry.shouldRetry(attempt, method, sent=not _is_connect_error(e)):
+                raise ServerError(f'Request failed: {e}') from e
+            time.sleep(retry.delay(attempt))
+            continue
+        except Exception:
+            if breaker is not None:
+                breaker.failure()
+            raise
+        except BaseException:
+            if breaker is not None:
+                breaker.abandon()
+            raise
+
+        if breaker is not None:
+            if _is_server_failure(response.status_code):
+                breaker.failure()
             else:
-                raise TestRunError(result.status, error_message)
+                breaker.success()
+        if not retry.shouldRetry(attempt, method, response.status_code):
+            return response
+        time.sleep(retry.delay(attempt, response.headers.get('Retry-After')))
+
+
+def _is_overload(error: ServerError) -> bool:
+    """Whether a request failed because the server could not keep up, rather than because it was invalid."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    return error.status is None or _is_server_failure(error.status)
+
+
+def _is_connect_error(error: requests.exceptions.RequestException) -> bool:
+    """Whether the request failed while connecting, so it never reached the server."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
 
-        return TestRunResult(result, self.config.apiUrl)
 
+def _json_body(response):
+    try:
+        return response.json()
+    except ValueError:
+        if response.status_code < 400:
+            raise ServerError(
+                f'Invalid response from server: {response.text[:200]}', status=response.status_code)
+        return response.text
 
-def _http_request(url: str, method: str, data: dict, headers: dict) -> dict:
-    request = getattr(requests, method.lower())
-    response = request(url, json=data, headers=headers)
-    status = response.status_code
-    result = response.json()
 
+def _check_response(status: int, result) -> dict:
     if status == 401:
-        raise ServerError('Unauthorized')
+        raise ServerError('Unauthorized', status=status)
     if status == 403:
-        raise ServerError('Api key not authenticated')
+        raise ServerError('Api key not authenticated', status=status)
     if status == 404:
-        raise ServerError('Project not found')
+        raise ServerError('Project not found', status=status)
     if status >= 400:
-        raise ServerError(json.dumps(result, indent=2))
+        raise ServerError(json.dumps(result, indent=2), status=status)
 
     return result